@@ -7,12 +7,35 @@ Unified interface for Android emulator control with action-specific responses.
 import subprocess
 import json
 import argparse
-import xml.etree.ElementTree as ET
-from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+import base64
+import bisect
+import contextlib
+import fcntl
+import functools
+import hashlib
+import xml.parsers.expat as expat
+from array import array
+from dataclasses import MISSING, dataclass, field, fields, is_dataclass
+from typing import List, Optional, Dict, Any, Tuple, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import itertools
 import os
 import re
+import shlex
+import socket
+import threading
+import statistics
+import struct
+import sys
+import time
+import zlib
+from collections import Counter, deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Result Types
 @dataclass
@@ -29,6 +52,15 @@ class UIElement:
     y: int = 0
     width: int = 0
     height: int = 0
+    node_id: int = -1
+
+@dataclass
+class Span:
+    """Timing of one phase of an operation, with its nested phases"""
+    name: str
+    start_ms: float = 0.0
+    duration_ms: float = 0.0
+    children: List["Span"] = field(default_factory=list)
 
 @dataclass
 class BaseResult:
@@ -37,17 +69,32 @@ class BaseResult:
     timestamp: str
     errors: List[str] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
+    action_id: str = ""
+    timings: Optional[Span] = None
 
 @dataclass
 class ScreenshotResult(BaseResult):
     """Result from screenshot operation"""
     screenshot_path: str = ""
+    frame_id: str = ""
     ui_elements: List[UIElement] = field(default_factory=list)
     current_screen: str = "unknown"
     available_actions: List[str] = field(default_factory=list)
     input_fields: List[UIElement] = field(default_factory=list)
     buttons: List[UIElement] = field(default_factory=list)
 
+@dataclass
+class ChangeSummary:
+    """What changed between two snapshots"""
+    changed: bool = False
+    region: Optional[List[int]] = None
+    magnitude: float = 0.0
+    nodes_changed: int = 0
+    nodes_added: int = 0
+    nodes_removed: int = 0
+    pixel_magnitude: Optional[float] = None
+    pixel_region: Optional[List[int]] = None
+
 @dataclass
 class InteractionResult(BaseResult):
     """Result from UI interaction (tap, input, etc.)"""
@@ -56,6 +103,10 @@ class InteractionResult(BaseResult):
     ui_state_changed: bool = False
     new_screen_state: str = ""
     follow_up_suggestions: List[str] = field(default_factory=list)
+    settle_time_ms: float = 0.0
+    change: Optional[ChangeSummary] = None
+    input_method: str = ""
+    chars_per_second: float = 0.0
 
 @dataclass
 class UIStateResult(BaseResult):
@@ -74,12 +125,1692 @@ class MessageResult(BaseResult):
     chat_state: str = "unknown"
     backend_response: Optional[str] = None
     conversation_state: str = "unknown"
+    settle_time_ms: float = 0.0
+    chars_per_second: float = 0.0
+    time_to_first_token_ms: Optional[float] = None
+    time_to_complete_ms: Optional[float] = None
+
+@dataclass
+class WaitResult(BaseResult):
+    """Result from waiting on a UI condition"""
+    condition: str = ""
+    satisfied: bool = False
+    elapsed_ms: float = 0.0
+    polls: int = 0
+    tree_captures: int = 0
+    matched_element: Optional[UIElement] = None
+
+@dataclass
+class JankResult(BaseResult):
+    """Frame timing while scrolling a list, from `dumpsys gfxinfo <package> framestats`"""
+    target: Optional[UIElement] = None
+    swipes: int = 0
+    frames: int = 0
+    janky_frames: int = 0
+    janky_ratio: float = 0.0
+    frozen_frames: int = 0
+    frame_time_ms: Dict[str, float] = field(default_factory=dict)
+    ui_thread_ms: Dict[str, float] = field(default_factory=dict)
+    render_thread_ms: Dict[str, float] = field(default_factory=dict)
+    deadline_ms: float = 0.0
+    histogram_ms: Dict[str, int] = field(default_factory=dict)
+    janky_by_stage: Dict[str, int] = field(default_factory=dict)
+    reported: Dict[str, Any] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+
+@dataclass
+class BatchResult(BaseResult):
+    """Result from a batch of input actions sent in one round trip"""
+    actions_performed: List[str] = field(default_factory=list)
+    commands: List[str] = field(default_factory=list)
+    round_trips: int = 0
+    checkpoint_satisfied: bool = False
+    new_screen_state: str = ""
+    follow_up_suggestions: List[str] = field(default_factory=list)
+    settle_time_ms: float = 0.0
+
+@dataclass
+class Action:
+    """One step of an input batch; build with the classmethods"""
+    kind: str
+    args: Tuple = ()
+
+    @classmethod
+    def tap(cls, x: int, y: int) -> "Action":
+        return cls("tap", (x, y))
+
+    @classmethod
+    def swipe(cls, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> "Action":
+        return cls("swipe", (x1, y1, x2, y2, duration_ms))
+
+    @classmethod
+    def text(cls, value: str) -> "Action":
+        return cls("text", (value,))
+
+    @classmethod
+    def key(cls, code) -> "Action":
+        """Key event by number or name, e.g. 4, BACK or KEYCODE_BACK"""
+        return cls("key", (code,))
+
+    @classmethod
+    def tap_element(cls, selector: str) -> "Action":
+        return cls("tap_element", (selector,))
+
+    @classmethod
+    def pause(cls, ms: int) -> "Action":
+        return cls("pause", (ms,))
+
+    @classmethod
+    def from_spec(cls, spec: List[Any]) -> "Action":
+        """Build from a JSON-style list such as ["tap", 100, 200]"""
+        kind, *args = spec
+        builder = getattr(cls, kind, None)
+        if kind == "from_spec" or not callable(builder):
+            raise ValueError(f"Unknown batch action: {kind}")
+        return builder(*args)
+
+    def describe(self) -> str:
+        return f"{self.kind}({', '.join(repr(arg) for arg in self.args)})"
+
+DEFAULT_APP_PACKAGE = "ai.plusonelabs.app.dev.debug"
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+TEXT_CHUNK_SIZE = 1000
+
+# UI hierarchy store
+FLAG_CLICKABLE = 1
+FLAG_FOCUSED = 2
+FLAG_FOCUSABLE = 4
+FLAG_SCROLLABLE = 8
+FLAG_ENABLED = 16
+FLAG_SELECTED = 32
+FLAG_CHECKED = 64
+
+_BOUNDS_RE = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+
+
+class UIParseError(ValueError):
+    """Raised when a UI dump is not well-formed XML"""
+
+
+class UITree:
+    """Compact view hierarchy stored as parallel arrays indexed by node id.
+
+    Node ids follow document order, so a parent always has a lower id than its
+    children and a subtree occupies ids [node_id, subtree_end[node_id]).
+    `node_hash` covers a node's own attributes and `subtree_hash` folds in its
+    children; both use Python's process-local hash(). `UIElement` objects are
+    only built for nodes a caller asks for.
+    """
+
+    __slots__ = ("parent", "depth", "text", "content_desc", "resource_id", "class_name",
+                 "flags", "x1", "y1", "x2", "y2", "node_hash", "subtree_hash", "subtree_end",
+                 "_element_cache", "_kept", "_elements", "_spatial", "_text_index", "_children")
+
+    def __init__(self):
+        self.parent = array('i')
+        self.depth = array('i')
+        self.text: List[str] = []
+        self.content_desc: List[str] = []
+        self.resource_id: List[str] = []
+        self.class_name: List[str] = []
+        self.flags = array('i')
+        self.x1 = array('i')
+        self.y1 = array('i')
+        self.x2 = array('i')
+        self.y2 = array('i')
+        self.node_hash = array('q')
+        self.subtree_hash = array('q')
+        self.subtree_end = array('i')
+        self._element_cache: Dict[int, UIElement] = {}
+        self._kept: Optional[List[int]] = None
+        self._elements: Optional[List[UIElement]] = None
+        self._spatial: Optional["SpatialIndex"] = None
+        self._text_index: Optional["TextIndex"] = None
+        self._children: Optional[List[List[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def has_flag(self, node_id: int, flag: int) -> bool:
+        return bool(self.flags[node_id] & flag)
+
+    def rect(self, node_id: int) -> Tuple[int, int, int, int]:
+        return self.x1[node_id], self.y1[node_id], self.x2[node_id], self.y2[node_id]
+
+    def children(self, node_id: int) -> List[int]:
+        """Direct child ids in document order"""
+        if self._children is None:
+            self._children = [[] for _ in range(len(self))]
+            for child, parent in enumerate(self.parent):
+                if parent >= 0:
+                    self._children[parent].append(child)
+        return self._children[node_id]
+
+    def ancestors(self, node_id: int):
+        """Yield ancestor ids from the closest parent up to the root"""
+        parent = self.parent[node_id]
+        while parent >= 0:
+            yield parent
+            parent = self.parent[parent]
+
+    def is_kept(self, node_id: int) -> bool:
+        """Whether the node carries text, a description or a click handler"""
+        return bool(self.text[node_id] or self.content_desc[node_id] or self.flags[node_id] & FLAG_CLICKABLE)
+
+    @property
+    def spatial(self) -> "SpatialIndex":
+        """Hit-testing index, built on first use"""
+        if self._spatial is None:
+            self._spatial = SpatialIndex(self)
+        return self._spatial
+
+    @property
+    def text_index(self) -> "TextIndex":
+        """Selector lookup tables, built on first use"""
+        if self._text_index is None:
+            self._text_index = TextIndex(self)
+        return self._text_index
+
+    @property
+    def kept_ids(self) -> List[int]:
+        if self._kept is None:
+            self._kept = [i for i in range(len(self)) if self.is_kept(i)]
+        return self._kept
+
+    def element(self, node_id: int) -> UIElement:
+        """Materialize (and memoize) the UIElement for a node"""
+        element = self._element_cache.get(node_id)
+        if element is None:
+            x1, y1, x2, y2 = self.rect(node_id)
+            flags = self.flags[node_id]
+            element = UIElement(
+                text=self.text[node_id],
+                bounds=f"[{x1},{y1}][{x2},{y2}]" if x2 or y2 else "",
+                content_desc=self.content_desc[node_id],
+                resource_id=self.resource_id[node_id],
+                class_name=self.class_name[node_id],
+                clickable=bool(flags & FLAG_CLICKABLE),
+                focused=bool(flags & FLAG_FOCUSED),
+                x=(x1 + x2) // 2,
+                y=(y1 + y2) // 2,
+                width=x2 - x1,
+                height=y2 - y1,
+                node_id=node_id
+            )
+            self._element_cache[node_id] = element
+        return element
+
+    @property
+    def elements(self) -> List[UIElement]:
+        """UIElements for every kept node, in document order"""
+        if self._elements is None:
+            self._elements = [self.element(i) for i in self.kept_ids]
+        return self._elements
+
+
+class SpatialIndex:
+    """Multi-level grid over a UITree's node rectangles for hit-testing.
+
+    Level k has cells of `cell_size * 2**k`; each node is stored in the finest
+    level where it spans at most `max_cells` cells, so screen-sized containers
+    and long rows sit in a few coarse cells instead of being copied into many
+    fine ones, and a point query looks at one cell per level.
+    """
+
+    def __init__(self, tree: "UITree", cell_size: int = 0, max_cells: int = 16):
+        self.tree = tree
+        width = max(tree.x2, default=0)
+        height = max(tree.y2, default=0)
+        if not cell_size:
+            cell_size = int((max(width * height, 1) / max(len(tree), 1)) ** 0.5 * 4)
+            cell_size = min(max(cell_size, 32), 512)
+        self.cell_size = cell_size
+        # (size, columns, cells) per level, finest first; the last level holds the whole screen in one cell
+        self.levels: List[Tuple[int, int, Dict[int, List[int]]]] = []
+        size = cell_size
+        while True:
+            self.levels.append((size, width // size + 1, {}))
+            if size > max(width, height):
+                break
+            size *= 2
+        for node_id in range(len(tree)):
+            x1, y1, x2, y2 = tree.rect(node_id)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            for size, columns, cells in self.levels:
+                cx1, cy1 = max(x1, 0) // size, max(y1, 0) // size
+                cx2, cy2 = (x2 - 1) // size, (y2 - 1) // size
+                if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) <= max_cells:
+                    break
+            for cy in range(cy1, cy2 + 1):
+                for cx in range(cx1, cx2 + 1):
+                    cells.setdefault(cy * columns + cx, []).append(node_id)
+
+    def _candidates(self, x: int, y: int) -> Iterator[int]:
+        for size, columns, cells in self.levels:
+            if x // size < columns:
+                yield from cells.get((y // size) * columns + x // size, ())
+
+    def at_point(self, x: int, y: int) -> List[int]:
+        """Ids of all nodes containing the point, deepest first"""
+        if x < 0 or y < 0:
+            return []
+        tree = self.tree
+        x1, y1, x2, y2 = tree.x1, tree.y1, tree.x2, tree.y2
+        hits = [i for i in self._candidates(x, y) if x1[i] <= x < x2[i] and y1[i] <= y < y2[i]]
+        hits.sort(key=lambda i: (tree.depth[i], i), reverse=True)
+        return hits
+
+    def element_at(self, x: int, y: int, clickable: bool = False) -> Optional[int]:
+        """Deepest node (optionally clickable) under the point"""
+        if x < 0 or y < 0:
+            return None
+        tree = self.tree
+        x1, y1, x2, y2, depth, flags = tree.x1, tree.y1, tree.x2, tree.y2, tree.depth, tree.flags
+        best, best_key = None, None
+        for i in self._candidates(x, y):
+            if x1[i] <= x < x2[i] and y1[i] <= y < y2[i] and (not clickable or flags[i] & FLAG_CLICKABLE):
+                key = (depth[i], i)
+                if best_key is None or key > best_key:
+                    best, best_key = i, key
+        return best
+
+    def intersecting(self, x1: int, y1: int, x2: int, y2: int) -> List[int]:
+        """Ids of nodes overlapping the region, in document order"""
+        if x2 <= x1 or y2 <= y1:
+            return []
+        tree = self.tree
+        candidates = set()
+        for size, columns, cells in self.levels:
+            for cy in range(max(y1, 0) // size, (y2 - 1) // size + 1):
+                for cx in range(max(x1, 0) // size, min((x2 - 1) // size, columns - 1) + 1):
+                    candidates.update(cells.get(cy * columns + cx, ()))
+        return sorted(i for i in candidates
+                      if tree.x1[i] < x2 and x1 < tree.x2[i] and tree.y1[i] < y2 and y1 < tree.y2[i])
+
+    def clickable_container(self, node_id: int) -> Optional[int]:
+        """The node itself if clickable, else its closest clickable ancestor.
+
+        Falls back to the smallest clickable node whose bounds enclose the
+        target, for overlays that are not ancestors in the dump.
+        """
+        tree = self.tree
+        if tree.flags[node_id] & FLAG_CLICKABLE:
+            return node_id
+        for ancestor in tree.ancestors(node_id):
+            if tree.flags[ancestor] & FLAG_CLICKABLE:
+                return ancestor
+        x1, y1, x2, y2 = tree.rect(node_id)
+        best, best_area = None, None
+        for candidate in self.at_point((x1 + x2) // 2, (y1 + y2) // 2):
+            if not tree.flags[candidate] & FLAG_CLICKABLE:
+                continue
+            cx1, cy1, cx2, cy2 = tree.rect(candidate)
+            if cx1 <= x1 and cy1 <= y1 and x2 <= cx2 and y2 <= cy2:
+                area = (cx2 - cx1) * (cy2 - cy1)
+                if best_area is None or area < best_area:
+                    best, best_area = candidate, area
+        return best
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class TextIndex:
+    """Per-snapshot lookup tables: pre-lowered strings and an inverted token index"""
+
+    def __init__(self, tree: "UITree"):
+        self.text = [value.lower() for value in tree.text]
+        self.content_desc = [value.lower() for value in tree.content_desc]
+        self.tokens: Dict[str, List[int]] = {}
+        self.by_resource_id: Dict[str, List[int]] = {}
+        self.by_class: Dict[str, List[int]] = {}
+        for node_id in range(len(tree)):
+            words = set(_WORD_RE.findall(self.text[node_id]))
+            words.update(_WORD_RE.findall(self.content_desc[node_id]))
+            for word in words:
+                self.tokens.setdefault(word, []).append(node_id)
+            resource_id = tree.resource_id[node_id]
+            if resource_id:
+                self.by_resource_id.setdefault(resource_id, []).append(node_id)
+                self.by_resource_id.setdefault(resource_id.rsplit("/", 1)[-1], []).append(node_id)
+            class_name = tree.class_name[node_id]
+            self.by_class.setdefault(class_name, []).append(node_id)
+            self.by_class.setdefault(class_name.rsplit(".", 1)[-1], []).append(node_id)
+        self.results: Dict[str, List[int]] = {}
+
+    def with_tokens(self, words: List[str]) -> Optional[List[int]]:
+        """Nodes containing every word, or None when there is nothing to narrow on"""
+        if not words:
+            return None
+        postings = sorted((self.tokens.get(word, []) for word in set(words)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return sorted(candidates)
+
+
+_SELECTOR_FLAGS = {
+    "clickable": FLAG_CLICKABLE,
+    "focused": FLAG_FOCUSED,
+    "focusable": FLAG_FOCUSABLE,
+    "scrollable": FLAG_SCROLLABLE,
+    "enabled": FLAG_ENABLED,
+    "selected": FLAG_SELECTED,
+    "checked": FLAG_CHECKED,
+}
+
+_PREDICATE_RE = re.compile(
+    r'\s*(?:(?P<chain>\^)'
+    r'|(?P<key>text|desc|id|class|any)(?P<op>\*=|~=|=)(?:"(?P<dq>(?:[^"\\]|\\.)*)"|\'(?P<sq>(?:[^\'\\]|\\.)*)\'|(?P<bare>[^\s^]+))'
+    r'|(?P<neg>!?)(?P<flag>' + "|".join(_SELECTOR_FLAGS) + r')(?=[\s^]|$))'
+)
+
+
+@dataclass
+class SelectorPredicate:
+    """One `key op value` test, e.g. desc*="send" """
+    key: str
+    op: str
+    value: str
+    pattern: Optional[Any] = None
+
+    def __post_init__(self):
+        if self.op == "~=":
+            self.pattern = re.compile(self.value)
+        elif self.op == "*=":
+            self.value = self.value.lower()
+
+    def _strings(self, tree: "UITree", index: TextIndex, node_id: int) -> List[str]:
+        lowered = self.op == "*="
+        if self.key == "text":
+            return [index.text[node_id] if lowered else tree.text[node_id]]
+        if self.key == "desc":
+            return [index.content_desc[node_id] if lowered else tree.content_desc[node_id]]
+        if self.key == "any":
+            if lowered:
+                return [index.text[node_id], index.content_desc[node_id]]
+            return [tree.text[node_id], tree.content_desc[node_id]]
+        if self.key == "id":
+            value = tree.resource_id[node_id]
+            strings = [value, value.rsplit("/", 1)[-1]]
+        else:
+            value = tree.class_name[node_id]
+            strings = [value, value.rsplit(".", 1)[-1]]
+        return [string.lower() for string in strings] if lowered else strings
+
+    def matches(self, tree: "UITree", index: TextIndex, node_id: int) -> bool:
+        strings = self._strings(tree, index, node_id)
+        if self.op == "=":
+            return self.value in strings
+        if self.op == "*=":
+            return any(self.value in string for string in strings)
+        return any(self.pattern.search(string) for string in strings)
+
+    def candidates(self, index: TextIndex) -> Optional[List[int]]:
+        """Nodes that can possibly match, from the inverted index where possible"""
+        if self.op == "~=":
+            return None
+        if self.key == "id" and self.op == "=":
+            return index.by_resource_id.get(self.value, [])
+        if self.key == "class" and self.op == "=":
+            return index.by_class.get(self.value, [])
+        if self.key in ("text", "desc", "any"):
+            words = _WORD_RE.findall(self.value.lower())
+            if self.op == "=":
+                return index.with_tokens(words)
+            narrowed = index.with_tokens(words[1:-1])
+            if narrowed is not None:
+                return narrowed
+            value = self.value
+            texts = index.text if self.key != "desc" else ()
+            descs = index.content_desc if self.key != "text" else ()
+            return sorted({i for i, string in enumerate(texts) if value in string}
+                          | {i for i, string in enumerate(descs) if value in string})
+        return None
+
+
+@dataclass
+class SelectorStep:
+    """Predicates and flag tests that must all hold for one node"""
+    predicates: List[SelectorPredicate] = field(default_factory=list)
+    required_flags: int = 0
+    forbidden_flags: int = 0
+
+    def matches(self, tree: "UITree", index: TextIndex, node_id: int) -> bool:
+        flags = tree.flags[node_id]
+        if flags & self.required_flags != self.required_flags or flags & self.forbidden_flags:
+            return False
+        return all(predicate.matches(tree, index, node_id) for predicate in self.predicates)
+
+
+class Selector:
+    """Compiled element selector.
+
+    Grammar: predicates separated by spaces must all match one node;
+    ` ^ ` moves to the closest ancestor matching the next step.
+
+        text="Login"           exact text (desc=, id=, class=, any= likewise)
+        desc*="send"           case-insensitive substring
+        text~="^Session \\d+"  regular expression search
+        id=message_input       resource-id, full or after ':id/'
+        class=EditText         class name, full or simple
+        clickable !focused     state flags
+        desc="Send message" ^ clickable
+
+    Anything that does not parse is treated as a plain case-insensitive
+    substring of text or content-desc, which is how selectors behaved before.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        steps = self._parse(source)
+        self.is_plain = steps is None
+        self.steps = steps or [SelectorStep([SelectorPredicate("any", "*=", source)])]
+
+    @staticmethod
+    def _parse(source: str) -> Optional[List[SelectorStep]]:
+        steps = [SelectorStep()]
+        position = 0
+        while position < len(source.rstrip()):
+            match = _PREDICATE_RE.match(source, position)
+            if not match or match.end() == position:
+                return None
+            position = match.end()
+            step = steps[-1]
+            if match.group("chain"):
+                steps.append(SelectorStep())
+            elif match.group("flag"):
+                flag = _SELECTOR_FLAGS[match.group("flag")]
+                if match.group("neg"):
+                    step.forbidden_flags |= flag
+                else:
+                    step.required_flags |= flag
+            else:
+                value = match.group("dq")
+                if value is None:
+                    value = match.group("sq")
+                if value is None:
+                    value = match.group("bare")
+                elif match.group("op") != "~=":
+                    # Regex values keep their escapes (\d, \s, \.); literals only unescape quotes and backslashes
+                    value = re.sub(r"\\([\"'\\])", r"\1", value)
+                try:
+                    step.predicates.append(SelectorPredicate(match.group("key"), match.group("op"), value))
+                except re.error:
+                    return None
+        if any(not step.predicates and not step.required_flags and not step.forbidden_flags for step in steps):
+            return None
+        return steps
+
+    def find_all(self, tree: "UITree") -> List[int]:
+        """Ids of all matching nodes in document order; memoized per tree"""
+        index = tree.text_index
+        cached = index.results.get(self.source)
+        if cached is not None:
+            return cached
+        first = self.steps[0]
+        candidates = None
+        for predicate in first.predicates:
+            narrowed = predicate.candidates(index)
+            if narrowed is not None and (candidates is None or len(narrowed) < len(candidates)):
+                candidates = narrowed
+        if candidates is None:
+            candidates = range(len(tree))
+        matches = [i for i in candidates if first.matches(tree, index, i)]
+        for step in self.steps[1:]:
+            resolved = []
+            for node_id in matches:
+                for ancestor in tree.ancestors(node_id):
+                    if step.matches(tree, index, ancestor):
+                        resolved.append(ancestor)
+                        break
+            matches = sorted(set(resolved))
+        index.results[self.source] = matches
+        return matches
+
+    def first(self, tree: "UITree") -> Optional[int]:
+        matches = self.find_all(tree)
+        return matches[0] if matches else None
+
+
+def quote_selector_value(value: str) -> str:
+    """Quote a literal for use as a selector value"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+@functools.lru_cache(maxsize=256)
+def compile_selector(source: str) -> Selector:
+    """Compile (and cache) a selector string"""
+    return Selector(source)
+
+
+@dataclass(frozen=True)
+class ScreenSignature:
+    """Exact texts or content-descs that identify one of the app's screens.
+
+    A screen matches when every `all_of` marker and, if given, at least one
+    `any_of` marker is present; `hints` only add to the score.
+    """
+    name: str
+    all_of: Tuple[str, ...] = ()
+    any_of: Tuple[str, ...] = ()
+    hints: Tuple[str, ...] = ()
+
+    @property
+    def markers(self) -> Tuple[str, ...]:
+        return self.all_of + self.any_of + self.hints
+
+
+# The app's Compose screens expose no resource-ids (there are no testTags), so
+# signatures use the literal strings each screen renders.
+SCREEN_CATALOG = [
+    ScreenSignature("login", any_of=("Welcome Back!", "Forgot Password?", "Don't have an account?"),
+                    hints=("App Logo", "Email", "Password", "Sign In", "Sign Up")),
+    ScreenSignature("sign_up", any_of=("Create Account", "Sign Up Icon", "Confirm Password", "Already have an account?"),
+                    hints=("Email", "Password", "Sign Up", "Sign In", "Back")),
+    ScreenSignature("session_list", any_of=("Create session", "New Session", "No Active Sessions", "Create New Session",
+                                            "No CLI Manager Found", "Remove session"),
+                    hints=("Sessions", "Menu")),
+    ScreenSignature("session_chat", any_of=("Session Chat", "CLI Session"),
+                    hints=("Send message", "Chat with AI assistant...", "Type /claude or /cc for Claude Code...",
+                           "Try these examples:")),
+    ScreenSignature("chat", any_of=("OpenAI Chat", "Anthropic Chat", "Cue Chat"),
+                    hints=("Send message", "Type a message...", "Type a message", "Chats", "Sessions", "Menu")),
+    # RichTextField's placeholder has no ellipsis; the OpenAI/Anthropic screens' does
+    ScreenSignature("assistant_chat", all_of=("Chat", "Send message"), hints=("Type a message", "Menu")),
+    ScreenSignature("settings", any_of=("Account", "Configuration", "Appearance", "Access Token", "Color Scheme",
+                                        "Haptic Feedback", "Log out"),
+                    hints=("Settings", "API Keys", "About", "Version")),
+    ScreenSignature("api_keys", all_of=("API Keys", "Back"), hints=("OpenAI", "Anthropic", "Google Gemini")),
+    ScreenSignature("debug", any_of=("Debug Settings", "Current Configuration",
+                                     "Select which AI provider to use for chat responses"),
+                    hints=("AI Provider", "Back", "Selected")),
+]
+
+# Clickable markers (on the node or a clickable ancestor) and the action each enables
+ACTION_MARKERS = {
+    "Send message": "send_message",
+    "Sign In": "login",
+    "Sign Up": "sign_up",
+    "Menu": "open_menu",
+    "Back": "go_back",
+    "Create session": "create_session",
+    "Create New Session": "create_session",
+}
+ACTION_ORDER = ["send_message", "login", "sign_up", "open_menu", "go_back", "create_session", "input_text"]
+ALWAYS_AVAILABLE_ACTIONS = ["screenshot", "tap", "get_ui_state"]
+
+
+class ScreenClassifier:
+    """Names the current screen and its available actions in one pass over a UITree.
+
+    Every marker string in the catalog is compiled into a single lookup table,
+    so a tree is scanned once regardless of catalog size. Results are cached
+    by the root's subtree hash, so an unchanged tree classifies in O(1).
+    """
+
+    def __init__(self, catalog: Optional[List[ScreenSignature]] = None, cache_size: int = 256):
+        self.catalog = list(SCREEN_CATALOG if catalog is None else catalog)
+        self.cache_size = cache_size
+        self._cache: Dict[int, Tuple[str, Tuple[str, ...]]] = {}
+        markers = set(ACTION_MARKERS)
+        for signature in self.catalog:
+            markers.update(signature.markers)
+        self._markers = frozenset(markers)
+
+    def _present(self, tree: UITree) -> Tuple[set, List[str]]:
+        """Marker strings present in the tree, and the actions their clickable nodes enable"""
+        present, actions = set(), set()
+        is_marker = self._markers.__contains__
+        for column in (tree.text, tree.content_desc):
+            for node_id in itertools.compress(itertools.count(), map(is_marker, column)):
+                marker = column[node_id]
+                present.add(marker)
+                action = ACTION_MARKERS.get(marker)
+                if action and action not in actions and (
+                        tree.flags[node_id] & FLAG_CLICKABLE
+                        or any(tree.flags[ancestor] & FLAG_CLICKABLE for ancestor in tree.ancestors(node_id))):
+                    actions.add(action)
+        if any("EditText" in class_name for class_name in set(tree.class_name)):
+            actions.add("input_text")
+        return present, [action for action in ACTION_ORDER if action in actions]
+
+    def classify(self, tree: UITree) -> Tuple[str, List[str]]:
+        """(screen name or "unknown", available actions)"""
+        key = tree.subtree_hash[0] if len(tree) else 0
+        cached = self._cache.get(key)
+        if cached is None:
+            present, actions = self._present(tree)
+            screen, best = "unknown", 0
+            for signature in self.catalog:
+                if not all(marker in present for marker in signature.all_of):
+                    continue
+                if signature.any_of and not any(marker in present for marker in signature.any_of):
+                    continue
+                score = sum(marker in present for marker in signature.markers)
+                if score > best:
+                    screen, best = signature.name, score
+            if len(self._cache) >= self.cache_size:
+                del self._cache[next(iter(self._cache))]
+            cached = self._cache[key] = (screen, tuple(actions + ALWAYS_AVAILABLE_ACTIONS))
+        return cached[0], list(cached[1])
+
+
+class UITreeParser:
+    """Incremental uiautomator dump parser: feed() chunks as they arrive, then close().
+
+    Bytes before the first tag and anything after `</hierarchy>` (such as
+    uiautomator's status line) are ignored.
+    """
+
+    def __init__(self):
+        self.tree = tree = UITree()
+        self.done = False
+        self.started = False
+        stack: List[int] = []
+        interned: Dict[str, str] = {}
+        parent_ids, depths, flags_list = tree.parent, tree.depth, tree.flags
+        texts, descs, ids, classes = tree.text, tree.content_desc, tree.resource_id, tree.class_name
+        xs1, ys1, xs2, ys2 = tree.x1, tree.y1, tree.x2, tree.y2
+        node_hashes, subtree_hashes, subtree_ends = tree.node_hash, tree.subtree_hash, tree.subtree_end
+        accumulators: List[int] = []
+        match_bounds = _BOUNDS_RE.match
+
+        def start(name, attrs):
+            if name != "node":
+                return
+            get = attrs.get
+            parent_ids.append(stack[-1] if stack else -1)
+            depths.append(len(stack))
+            stack.append(len(texts))
+            text = get("text", "")
+            texts.append(text)
+            desc = get("content-desc", "")
+            descs.append(desc)
+            resource_id = get("resource-id", "")
+            resource_id = interned.setdefault(resource_id, resource_id)
+            ids.append(resource_id)
+            class_name = get("class", "")
+            class_name = interned.setdefault(class_name, class_name)
+            classes.append(class_name)
+            flags = ((get("clickable") == "true") * FLAG_CLICKABLE
+                     | (get("focused") == "true") * FLAG_FOCUSED
+                     | (get("focusable") == "true") * FLAG_FOCUSABLE
+                     | (get("scrollable") == "true") * FLAG_SCROLLABLE
+                     | (get("enabled") == "true") * FLAG_ENABLED
+                     | (get("selected") == "true") * FLAG_SELECTED
+                     | (get("checked") == "true") * FLAG_CHECKED)
+            flags_list.append(flags)
+            bounds = get("bounds", "")
+            match = match_bounds(bounds)
+            if match:
+                x1, y1, x2, y2 = match.groups()
+                xs1.append(int(x1))
+                ys1.append(int(y1))
+                xs2.append(int(x2))
+                ys2.append(int(y2))
+            else:
+                xs1.append(0)
+                ys1.append(0)
+                xs2.append(0)
+                ys2.append(0)
+            own = hash((text, desc, resource_id, class_name, flags, bounds))
+            node_hashes.append(own)
+            subtree_hashes.append(0)
+            subtree_ends.append(0)
+            accumulators.append(own)
+
+        def end(name):
+            if name == "node":
+                node_id = stack.pop()
+                subtree = accumulators.pop()
+                subtree_hashes[node_id] = subtree
+                subtree_ends[node_id] = len(texts)
+                if accumulators:
+                    accumulators[-1] = hash((accumulators[-1], subtree))
+            elif name == "hierarchy":
+                self.done = True
+
+        self._parser = expat.ParserCreate("UTF-8")
+        self._parser.StartElementHandler = start
+        self._parser.EndElementHandler = end
+
+    def feed(self, chunk) -> bool:
+        """Parse the next chunk (str or bytes); returns True once the hierarchy is complete"""
+        if self.done:
+            return True
+        if not self.started:
+            start = chunk.find("<" if isinstance(chunk, str) else b"<")
+            if start < 0:
+                return False
+            chunk, self.started = chunk[start:], True
+        try:
+            self._parser.Parse(chunk, False)
+        except expat.ExpatError as e:
+            if not self.done:
+                raise UIParseError(f"Malformed UI dump: {e}") from e
+        return self.done
+
+    def close(self) -> UITree:
+        """Finish parsing and return the tree"""
+        if not self.done:
+            try:
+                self._parser.Parse(b"", True)
+            except expat.ExpatError as e:
+                raise UIParseError(f"Malformed UI dump: {e}") from e
+        return self.tree
+
+
+def parse_ui_tree(source) -> UITree:
+    """Parse a uiautomator dump (str, bytes or an iterable of chunks) into a UITree"""
+    parser = UITreeParser()
+    if isinstance(source, (str, bytes)):
+        source = [source]
+    for chunk in source:
+        if parser.feed(chunk):
+            break
+    return parser.close()
+
+
+def _union_rect(region: Optional[List[int]], rect: Tuple[int, int, int, int]) -> Optional[List[int]]:
+    x1, y1, x2, y2 = rect
+    if x2 <= x1 or y2 <= y1:
+        return region
+    if region is None:
+        return [x1, y1, x2, y2]
+    return [min(region[0], x1), min(region[1], y1), max(region[2], x2), max(region[3], y2)]
+
+
+def diff_trees(old: UITree, new: UITree) -> ChangeSummary:
+    """Structural diff of two snapshots using subtree hashes.
+
+    Identical subtrees are skipped without descending; children are paired by
+    exact subtree hash first, then by position, so an inserted chat bubble
+    reports one added subtree rather than a changed list.
+    """
+    summary = ChangeSummary()
+    if not len(old) or not len(new):
+        summary.nodes_added, summary.nodes_removed = len(new), len(old)
+        summary.changed = len(old) != len(new)
+        summary.magnitude = 1.0 if summary.changed else 0.0
+        summary.region = _union_rect(None, new.rect(0)) if len(new) else None
+        return summary
+    region = None
+    pending = [(0, 0)]
+    while pending:
+        old_id, new_id = pending.pop()
+        if old.subtree_hash[old_id] == new.subtree_hash[new_id]:
+            continue
+        if old.node_hash[old_id] != new.node_hash[new_id]:
+            summary.nodes_changed += 1
+            region = _union_rect(_union_rect(region, old.rect(old_id)), new.rect(new_id))
+        old_children = old.children(old_id)
+        unmatched: Dict[int, List[int]] = {}
+        for child in old_children:
+            unmatched.setdefault(old.subtree_hash[child], []).append(child)
+        leftover_new = []
+        for child in new.children(new_id):
+            same = unmatched.get(new.subtree_hash[child])
+            if same:
+                same.pop(0)
+            else:
+                leftover_new.append(child)
+        remaining = set(itertools.chain.from_iterable(unmatched.values()))
+        leftover_old = [child for child in old_children if child in remaining]
+        for old_child, new_child in zip(leftover_old, leftover_new):
+            pending.append((old_child, new_child))
+        for old_child in leftover_old[len(leftover_new):]:
+            summary.nodes_removed += old.subtree_end[old_child] - old_child
+            region = _union_rect(region, old.rect(old_child))
+        for new_child in leftover_new[len(leftover_old):]:
+            summary.nodes_added += new.subtree_end[new_child] - new_child
+            region = _union_rect(region, new.rect(new_child))
+    total = summary.nodes_changed + summary.nodes_added + summary.nodes_removed
+    summary.changed = total > 0
+    summary.region = region
+    summary.magnitude = round(min(total / max(len(old), len(new)), 1.0), 4)
+    return summary
+
+
+def decode_raw_frame(raw: bytes) -> Tuple[int, int, memoryview]:
+    """Split raw `screencap` output into (width, height, RGBA pixel bytes)"""
+    if len(raw) < 12:
+        raise AdbError(f"screencap returned no framebuffer: {raw[:200].decode('utf-8', 'replace')}")
+    width, height, _ = struct.unpack_from("<III", raw)
+    header = len(raw) - width * height * 4
+    if header not in (12, 16):
+        raise AdbError(f"Unexpected framebuffer size {len(raw)} for {width}x{height}")
+    return width, height, memoryview(raw)[header:]
+
+
+def encode_png(raw: bytes, level: int = 6) -> bytes:
+    """Encode a raw RGBA_8888 `screencap` framebuffer as PNG"""
+    width, height, pixels = decode_raw_frame(raw)
+    stride = width * 4
+    rows: List[Any] = []
+    for offset in range(0, height * stride, stride):
+        rows.append(b"\x00")
+        rows.append(pixels[offset:offset + stride])
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), level))
+            + chunk(b"IEND", b""))
+
+
+def frame_blocks(raw: bytes, block: int = 16):
+    """Downscale a raw framebuffer to a grid of mean-luminance blocks (NumPy)"""
+    if np is None:
+        return None
+    width, height, pixels = decode_raw_frame(raw)
+    rgba = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+    luma = rgba[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    rows, columns = height // block, width // block
+    return luma[:rows * block, :columns * block].reshape(rows, block, columns, block).mean(axis=(1, 3))
+
+
+def diff_frame_blocks(old, new, block: int = 16, threshold: float = 8.0) -> Tuple[float, Optional[List[int]]]:
+    """Fraction of blocks whose mean luminance moved past `threshold`, and their bounding box"""
+    if old is None or new is None or old.shape != new.shape:
+        return 1.0, None
+    changed = np.abs(new - old) > threshold
+    if not changed.any():
+        return 0.0, None
+    rows = np.flatnonzero(changed.any(axis=1))
+    columns = np.flatnonzero(changed.any(axis=0))
+    region = [int(columns[0]) * block, int(rows[0]) * block, (int(columns[-1]) + 1) * block, (int(rows[-1]) + 1) * block]
+    return round(float(changed.mean()), 4), region
+
+
+_PROFILEDATA_RE = re.compile(r"---PROFILEDATA---\r?\n(.*?)---PROFILEDATA---", re.S)
+_GFX_SUMMARY_RE = re.compile(r"^(Total frames rendered|Janky frames|(?:50|90|95|99)th percentile): (\d+)", re.M)
+SLOW_FRAME_BUCKETS_MS = (8, 16, 24, 32, 50, 100, 250, 700)
+FROZEN_FRAME_MS = 700.0
+
+
+def parse_framestats(text: str) -> Dict[str, Any]:
+    """Columns of every PROFILEDATA table in a framestats dump, keyed by header name (ns).
+
+    Each table is converted in one pass: NumPy parses it straight into an
+    int64 matrix when available, else array('q') column slices are used.
+    """
+    merged: Dict[str, list] = {}
+    for block in _PROFILEDATA_RE.findall(text):
+        header, _, body = block.partition("\n")
+        names = [name.strip() for name in header.split(",") if name.strip()]
+        if not names:
+            continue
+        if np is not None:
+            values = np.fromstring(body.replace(",", " "), dtype=np.int64, sep=" ")
+        else:
+            values = array('q', map(int, body.replace(",", " ").split()))
+        usable = len(values) - len(values) % len(names)
+        if not usable:
+            continue
+        if np is not None:
+            table = values[:usable].reshape(-1, len(names))
+            columns = {name: table[:, index] for index, name in enumerate(names)}
+        else:
+            columns = {name: values[index:usable:len(names)] for index, name in enumerate(names)}
+        for name, column in columns.items():
+            merged.setdefault(name, []).append(column)
+    if np is not None:
+        return {name: np.concatenate(parts) for name, parts in merged.items()}
+    return {name: parts[0] if len(parts) == 1 else array('q', itertools.chain.from_iterable(parts))
+            for name, parts in merged.items()}
+
+
+def parse_gfxinfo_summary(text: str) -> Dict[str, Any]:
+    """The totals gfxinfo prints above the frame table: frame counts, janky frames, percentiles, histogram"""
+    summary: Dict[str, Any] = {}
+    for name, value in _GFX_SUMMARY_RE.findall(text):
+        key = f"p{name[:2]}_ms" if name[0].isdigit() else name.lower().replace(" ", "_")
+        summary[key] = int(value)
+    histogram = re.search(r"^HISTOGRAM: (.*)$", text, re.M)
+    if histogram:
+        summary["histogram"] = {bucket.split("=")[0]: int(bucket.split("=")[1])
+                                for bucket in histogram.group(1).split() if "=" in bucket}
+    return summary
+
+
+def _distribution(values) -> Dict[str, float]:
+    """Mean and nearest-rank percentiles (ms) of a sorted sequence"""
+    if not len(values):
+        return {}
+    stats = {f"p{q}": round(float(_percentile(values, q)), 2) for q in (50, 90, 95, 99)}
+    stats["max"] = round(float(values[-1]), 2)
+    stats["mean"] = round(float(sum(values) / len(values)), 2)
+    return stats
+
+
+class FrameStats:
+    """Per-frame timings accumulated over repeated framestats dumps.
+
+    A dump only holds the most recent frames (120 on most builds), so dumps
+    taken between gestures overlap; each dump contributes only the frames whose
+    IntendedVsync is newer than any seen so far. Rows with non-zero Flags
+    (first frame, window changes) are excluded from the report.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, Any] = {}
+        self.summary: Dict[str, Any] = {}
+        self.gaps = 0
+
+    def __len__(self) -> int:
+        return len(self.columns.get("IntendedVsync", ()))
+
+    def add_dump(self, text: str):
+        """Merge one `dumpsys gfxinfo <package> framestats` output"""
+        self.summary = parse_gfxinfo_summary(text) or self.summary
+        columns = parse_framestats(text)
+        vsyncs = columns.get("IntendedVsync")
+        if vsyncs is None or not len(vsyncs):
+            return
+        if not self.columns:
+            self.columns = columns
+            return
+        newest = max(self.columns["IntendedVsync"])
+        if min(vsyncs) > newest and len(vsyncs) >= 120:
+            self.gaps += 1
+        if np is not None:
+            keep = vsyncs > newest
+            self.columns = {name: np.concatenate((column, columns[name][keep]))
+                            for name, column in self.columns.items() if name in columns}
+        else:
+            keep = [position for position, vsync in enumerate(vsyncs) if vsync > newest]
+            self.columns = {name: column for name, column in self.columns.items() if name in columns}
+            for name, column in self.columns.items():
+                column.extend(columns[name][position] for position in keep)
+
+    def report(self, default_deadline_ms: float = 1000 / 60, frozen_ms: float = FROZEN_FRAME_MS) -> Dict[str, Any]:
+        """Frame-time distribution, jank counts and slow-frame histogram (ms)"""
+        c = self.columns
+        if not len(self):
+            return {"frames": 0}
+        edges = SLOW_FRAME_BUCKETS_MS
+        labels = [f"<={edges[0]}"] + [f"{low}-{high}" for low, high in zip(edges, edges[1:])] + [f">{edges[-1]}"]
+        if np is not None:
+            valid = (c["Flags"] == 0) & (c["FrameCompleted"] > c["IntendedVsync"])
+            start = c["IntendedVsync"][valid]
+            total = (c["FrameCompleted"][valid] - start) / 1e6
+            ui = (c["SyncQueued"][valid] - start) / 1e6 if "SyncQueued" in c else np.zeros_like(total)
+            render = total - ui
+            if "FrameDeadline" in c:
+                deadline = (c["FrameDeadline"][valid] - start) / 1e6
+            else:
+                deadline = np.full_like(total, default_deadline_ms)
+            janky = total > deadline
+            counts = np.bincount(np.searchsorted(edges, total, side="left"), minlength=len(labels)).tolist()
+            janky_frames, frozen = int(janky.sum()), int((total > frozen_ms).sum())
+            ui_bound = int((janky & (ui > deadline)).sum())
+            total, ui, render = np.sort(total).tolist(), np.sort(ui).tolist(), np.sort(render).tolist()
+            deadline_ms = float(np.median(deadline)) if len(deadline) else default_deadline_ms
+        else:
+            rows = [position for position, (flags, begin, end) in
+                    enumerate(zip(c["Flags"], c["IntendedVsync"], c["FrameCompleted"])) if flags == 0 and end > begin]
+            start = [c["IntendedVsync"][position] for position in rows]
+            total = [(c["FrameCompleted"][position] - begin) / 1e6 for position, begin in zip(rows, start)]
+            if "SyncQueued" in c:
+                ui = [(c["SyncQueued"][position] - begin) / 1e6 for position, begin in zip(rows, start)]
+            else:
+                ui = [0.0] * len(rows)
+            render = [frame - thread for frame, thread in zip(total, ui)]
+            if "FrameDeadline" in c:
+                deadline = [(c["FrameDeadline"][position] - begin) / 1e6 for position, begin in zip(rows, start)]
+            else:
+                deadline = [default_deadline_ms] * len(rows)
+            janky = [frame > limit for frame, limit in zip(total, deadline)]
+            counts = [0] * len(labels)
+            for frame in total:
+                counts[bisect.bisect_left(edges, frame)] += 1
+            janky_frames, frozen = sum(janky), sum(frame > frozen_ms for frame in total)
+            ui_bound = sum(slow and thread > limit for slow, thread, limit in zip(janky, ui, deadline))
+            total, ui, render = sorted(total), sorted(ui), sorted(render)
+            deadline_ms = statistics.median(deadline) if deadline else default_deadline_ms
+        frames = len(total)
+        return {
+            "frames": frames,
+            "janky_frames": janky_frames,
+            "janky_ratio": round(janky_frames / frames, 4) if frames else 0.0,
+            "frozen_frames": frozen,
+            "frame_time_ms": _distribution(total),
+            "ui_thread_ms": _distribution(ui),
+            "render_thread_ms": _distribution(render),
+            "deadline_ms": round(deadline_ms, 2),
+            "histogram_ms": dict(zip(labels, counts)),
+            "janky_by_stage": {"ui_thread": ui_bound, "render_thread": janky_frames - ui_bound},
+        }
+
+
+@dataclass
+class ScreenCapture:
+    """In-memory screen snapshot: optional raw framebuffer plus the UI hierarchy"""
+    frame: Optional[bytes]
+    ui_xml: str
+    captured_at: float
+    generation: int = 0
+    tree: UITree = field(default_factory=UITree)
+    saved_path: str = ""
+    frame_id: str = ""
+    _png: Optional[bytes] = field(default=None, repr=False)
+
+    @property
+    def elements(self) -> List[UIElement]:
+        return self.tree.elements
+
+    @property
+    def png(self) -> Optional[bytes]:
+        """PNG encoding of the frame, computed on first access"""
+        if self._png is None and self.frame is not None:
+            self._png = encode_png(self.frame)
+        return self._png
+
+
+class ScreenshotStore:
+    """Content-addressed screenshot store with ring-buffer retention.
+
+    Frames are stored once per content hash as zlib-compressed raw framebuffers
+    under `objects/`; PNGs are encoded into `png/` only when asked for.
+    `index.json` lists captures oldest first and maps action ids to captures,
+    so latest and per-action lookups don't scan the directory. The oldest
+    captures are dropped once `max_frames` or `max_bytes` is exceeded, and a
+    frame's files go with its last reference.
+
+    Several processes may share a store (CLI, daemon, pool workers): every
+    update holds an flock on `index.lock` and re-reads the index first.
+    """
+
+    VERSION = 1
+    _shared: Dict[str, "ScreenshotStore"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str, max_frames: int = 500, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.RLock()
+        self._index_stamp = None
+        self.index = self._load_index()
+
+    @classmethod
+    def open(cls, root: str, **kwargs) -> "ScreenshotStore":
+        """Store for `root`, shared by every emulator in the process"""
+        root = os.path.abspath(root)
+        with cls._shared_lock:
+            if root not in cls._shared:
+                cls._shared[root] = cls(root, **kwargs)
+            return cls._shared[root]
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self) -> Dict[str, Any]:
+        self._index_stamp = self._stamp()
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get("version") == self.VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"version": self.VERSION, "next_id": 0, "bytes": 0, "entries": [], "objects": {}, "by_action": {}}
+
+    def _refresh(self):
+        """Re-read the index if another process replaced it"""
+        if self._stamp() != self._index_stamp:
+            self.index = self._load_index()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Exclusive access to the index across threads and processes, with a fresh copy of it"""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, "index.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield self.index
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_index(self):
+        temp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+        self._index_stamp = self._stamp()
+
+    def _object_path(self, frame_id: str) -> str:
+        return os.path.join(self.root, "objects", f"{frame_id}.raw.z")
+
+    def png_file(self, frame_id: str) -> str:
+        return os.path.join(self.root, "png", f"{frame_id}.png")
+
+    @staticmethod
+    def frame_id(frame: bytes) -> str:
+        return hashlib.blake2b(frame, digest_size=16).hexdigest()
+
+    def put(self, frame: bytes, action_id: str = "", captured_at: Optional[float] = None,
+            frame_id: str = "", with_png: bool = False, png: Optional[bytes] = None) -> Dict[str, Any]:
+        """Record a capture, writing the frame only if its content is new.
+
+        With `with_png`, the PNG (`png`, or encoded from the frame) is written
+        under the same lock, before another process can evict the frame.
+        """
+        frame_id = frame_id or self.frame_id(frame)
+        with self._locked():
+            objects = self.index["objects"]
+            stored = objects.get(frame_id)
+            if stored is None:
+                width, height, _ = decode_raw_frame(frame)
+                data = zlib.compress(frame, 1)
+                os.makedirs(os.path.dirname(self._object_path(frame_id)), exist_ok=True)
+                with open(self._object_path(frame_id), "wb") as f:
+                    f.write(data)
+                stored = objects[frame_id] = {"refs": 0, "bytes": len(data), "png_bytes": 0,
+                                              "width": width, "height": height}
+                self.index["bytes"] += len(data)
+            stored["refs"] += 1
+            entry = {"id": self.index["next_id"], "frame": frame_id, "action": action_id,
+                     "captured_at": captured_at if captured_at is not None else time.time()}
+            self.index["next_id"] += 1
+            self.index["entries"].append(entry)
+            if action_id:
+                self.index["by_action"][action_id] = entry
+            if with_png:
+                self._write_png(frame_id, stored, png)
+            self._evict()
+            self._save_index()
+            return entry
+
+    def _evict(self):
+        entries = self.index["entries"]
+        while len(entries) > self.max_frames or (self.index["bytes"] > self.max_bytes and len(entries) > 1):
+            entry = entries.pop(0)
+            if self.index["by_action"].get(entry["action"], {}).get("id") == entry["id"]:
+                del self.index["by_action"][entry["action"]]
+            stored = self.index["objects"][entry["frame"]]
+            stored["refs"] -= 1
+            if stored["refs"] <= 0:
+                for path in (self._object_path(entry["frame"]), self.png_file(entry["frame"])):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                self.index["bytes"] -= stored["bytes"] + stored["png_bytes"]
+                del self.index["objects"][entry["frame"]]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            entries = self.index["entries"]
+            return entries[-1] if entries else None
+
+    def by_action(self, action_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self.index["by_action"].get(action_id)
+
+    def frame(self, frame_id: str) -> bytes:
+        """Raw framebuffer for a stored frame"""
+        with open(self._object_path(frame_id), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _write_png(self, frame_id: str, stored: Dict[str, Any], png: Optional[bytes]) -> bool:
+        path = self.png_file(frame_id)
+        if stored["png_bytes"] and os.path.exists(path):
+            return False
+        data = png if png is not None else encode_png(self.frame(frame_id))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.index["bytes"] += len(data) - stored["png_bytes"]
+        stored["png_bytes"] = len(data)
+        return True
+
+    def png_path(self, frame_id: str, png: Optional[bytes] = None) -> str:
+        """Path of the frame as PNG, encoding it on first request"""
+        with self._locked():
+            stored = self.index["objects"].get(frame_id)
+            if stored is None:
+                raise KeyError(f"Unknown frame {frame_id}")
+            if self._write_png(frame_id, stored, png):
+                self._evict()
+                self._save_index()
+        return self.png_file(frame_id)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(int(-(-q * len(values) // 100)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Tracer:
+    """Records nested timing spans across operations.
+
+    Each thread keeps its own span stack, so one tracer can be shared by the
+    emulators of a DevicePool. Completed spans are also kept as Chrome trace
+    events (bounded by `max_events`) for `write_chrome_trace`.
+    """
+
+    def __init__(self, max_events: int = 200000):
+        self.origin = time.perf_counter()
+        self.wall_origin = time.time()
+        self.events: deque = deque(maxlen=max_events)
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @property
+    def depth(self) -> int:
+        return len(self._stack())
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        """Time a block as a span nested under the current one"""
+        stack = self._stack()
+        start = time.perf_counter()
+        node = Span(name=name, start_ms=round((start - self.origin) * 1000, 3))
+        if stack:
+            stack[-1].children.append(node)
+        stack.append(node)
+        try:
+            yield node
+        finally:
+            elapsed = time.perf_counter() - start
+            node.duration_ms = round(elapsed * 1000, 3)
+            stack.pop()
+            self.events.append({"name": name, "ph": "X", "ts": round((start - self.origin) * 1e6, 1),
+                                "dur": round(elapsed * 1e6, 1), "pid": os.getpid(),
+                                "tid": threading.get_ident(), "args": args})
+
+    def phase_stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, total, p50 and p95 duration (ms) per span name"""
+        durations: Dict[str, List[float]] = {}
+        for event in self.events:
+            durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {"count": len(values), "total_ms": round(sum(values), 3),
+                           "p50_ms": round(_percentile(values, 50), 3), "p95_ms": round(_percentile(values, 95), 3)}
+        return stats
+
+    def write_chrome_trace(self, path: str):
+        """Write spans as a Chrome/Perfetto trace-event file, with per-phase stats"""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms",
+                       "otherData": {"phases": self.phase_stats(), "wall_origin": self.wall_origin}}, f)
+
+
+def traced(name: str):
+    """Run an AndroidEmulator method in a tracer span and attach the span to its result"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.tracer.depth == 0:
+                self.action_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}-{name}"
+            with self.tracer.span(name, device=self.device_id, action=self.action_id) as span:
+                result = method(self, *args, **kwargs)
+            if isinstance(result, BaseResult):
+                result.action_id = self.action_id
+                result.timings = span
+            return result
+        return wrapper
+    return decorate
+
+
+# Chat bubble metadata that appears with a sent message: "HH:mm" times and icon-only labels
+_REPLY_NOISE_RE = re.compile(r"^\s*(?:\d{1,2}:\d{2}(?::\d{2})?\s*(?:[AaPp][Mm])?|\W{1,3})\s*$")
+_REPLY_STATUS_RE = re.compile(r"^\W*(?:sending|sent|delivered|seen|failed to send|not sent|just now|"
+                              r"\d+\s*(?:s|sec|m|min|h|hr)s?\s+ago)\W*$", re.IGNORECASE)
+# Row icons of the app's status bubbles (MessageList.kt); their text is progress, not reply
+_STATUS_ICONS = frozenset(("📥", "✅", "⚙️", "✔️", "📋"))
+
+_COMPACT_FLAGS = (("clickable", FLAG_CLICKABLE), ("focused", FLAG_FOCUSED), ("scrollable", FLAG_SCROLLABLE),
+                  ("selected", FLAG_SELECTED), ("checked", FLAG_CHECKED))
+
+
+class CompactEncoder:
+    """Token-lean JSON encoding of results for agent consumers.
+
+    Each kept UI node becomes one element with a short id (`e1`, `e2`, ...)
+    that stays stable across snapshots for as long as the encoder lives, so
+    category lists and targets refer to ids instead of repeating elements. An
+    element's identity is its class, resource-id, description and, except for
+    editable fields, its text; repeats are told apart by occurrence order. In
+    delta mode only elements added, removed or changed since the previous
+    snapshot are reported. `state()` round-trips through JSON so a session can
+    outlive the process.
+
+    The id table keeps at most `max_ids` entries (or every node of the latest
+    tree, if more), dropping the least recently seen first. Only elements
+    absent from the latest snapshot are dropped, so deltas never refer to a
+    forgotten id; one that reappears later gets a fresh id and is reported as
+    added. Ids are never reused.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None, max_ids: int = 2000):
+        state = state or {}
+        self.max_ids = max_ids
+        self.ids: Dict[str, str] = state.get("ids", {})
+        self.next_id: int = state.get("next_id", 1)
+        self.sequence: int = state.get("sequence", 0)
+        self.previous: Optional[Dict[str, Dict[str, Any]]] = state.get("previous")
+
+    def state(self) -> Dict[str, Any]:
+        return {"ids": self.ids, "next_id": self.next_id, "sequence": self.sequence, "previous": self.previous}
+
+    @staticmethod
+    def _key(class_name: str, resource_id: str, content_desc: str, text: str) -> str:
+        return f"{class_name}|{resource_id}|{content_desc}|{'' if 'EditText' in class_name else text}"
+
+    def element_ids(self, tree: UITree) -> Dict[int, str]:
+        """Stable id for every kept node of a tree"""
+        result, seen = {}, {}
+        for node_id in tree.kept_ids:
+            key = self._key(tree.class_name[node_id], tree.resource_id[node_id], tree.content_desc[node_id],
+                            tree.text[node_id])
+            occurrence = seen[key] = seen.get(key, 0) + 1
+            if occurrence > 1:
+                key = f"{key}#{occurrence}"
+            element_id = self.ids.pop(key, None)
+            if element_id is None:
+                element_id = f"e{self.next_id}"
+                self.next_id += 1
+            self.ids[key] = result[node_id] = element_id
+        for key in list(itertools.islice(self.ids, max(0, len(self.ids) - max(self.max_ids, len(result))))):
+            del self.ids[key]
+        return result
+
+    @staticmethod
+    def element(tree: UITree, node_id: int, element_id: str = "") -> Dict[str, Any]:
+        """One node as a dict without empty fields"""
+        encoded: Dict[str, Any] = {"id": element_id} if element_id else {}
+        if tree.text[node_id]:
+            encoded["text"] = tree.text[node_id]
+        if tree.content_desc[node_id]:
+            encoded["desc"] = tree.content_desc[node_id]
+        if tree.resource_id[node_id]:
+            encoded["rid"] = tree.resource_id[node_id].rsplit("/", 1)[-1]
+        encoded["cls"] = tree.class_name[node_id].rsplit(".", 1)[-1]
+        encoded["b"] = list(tree.rect(node_id))
+        flags = [name for name, flag in _COMPACT_FLAGS if tree.flags[node_id] & flag]
+        if flags:
+            encoded["flags"] = flags
+        return encoded
+
+    def snapshot(self, tree: UITree, ids: Dict[int, str], delta: bool = False) -> Dict[str, Any]:
+        """The tree's elements, or with `delta` only what changed since the previous snapshot"""
+        current = {element_id: self.element(tree, node_id, element_id) for node_id, element_id in ids.items()}
+        previous, self.previous = self.previous, current
+        self.sequence += 1
+        if not delta or previous is None:
+            return {"snapshot": self.sequence, "elements": list(current.values())}
+        added, changed = [], []
+        for element_id, encoded in current.items():
+            before = previous.get(element_id)
+            if before is None:
+                added.append(encoded)
+            elif before != encoded:
+                update = {key: encoded.get(key) for key in before.keys() | encoded.keys()
+                          if before.get(key) != encoded.get(key)}
+                changed.append({"id": element_id, **update})
+        removed = [element_id for element_id in previous if element_id not in current]
+        encoded_delta: Dict[str, Any] = {"base": self.sequence - 1}
+        for name, values in (("added", added), ("removed", removed), ("changed", changed)):
+            if values:
+                encoded_delta[name] = values
+        return {"snapshot": self.sequence, "delta": encoded_delta}
+
+    def _value(self, value: Any, tree: Optional[UITree], ids: Dict[int, str]) -> Any:
+        if isinstance(value, UIElement):
+            node_id = value.node_id
+            if tree is not None and node_id in ids and tree._element_cache.get(node_id) is value:
+                return ids[node_id]
+            # An element from an earlier tree keeps its id if the same node is still on screen
+            key = self._key(value.class_name, value.resource_id, value.content_desc, value.text)
+            match = _BOUNDS_RE.match(value.bounds)
+            rect = tuple(int(number) for number in match.groups()) if match else (0, 0, 0, 0)
+            for candidate, element_id in ids.items():
+                if (tree is not None and tree.rect(candidate) == rect
+                        and self._key(tree.class_name[candidate], tree.resource_id[candidate],
+                                      tree.content_desc[candidate], tree.text[candidate]) == key):
+                    return element_id
+            encoded = {"text": value.text, "desc": value.content_desc, "rid": value.resource_id.rsplit("/", 1)[-1],
+                       "cls": value.class_name.rsplit(".", 1)[-1], "at": [value.x, value.y]}
+            return {key: item for key, item in encoded.items() if item}
+        if isinstance(value, Span):
+            return round(value.duration_ms, 1)
+        if isinstance(value, float):
+            return round(value, 2)
+        if isinstance(value, (list, tuple)):
+            return [self._value(item, tree, ids) for item in value]
+        if isinstance(value, dict):
+            return {key: self._value(item, tree, ids) for key, item in value.items()}
+        if is_dataclass(value):
+            return self._fields(value, tree, ids)
+        return value
+
+    def _fields(self, value: Any, tree: Optional[UITree], ids: Dict[int, str]) -> Dict[str, Any]:
+        """Dataclass fields, dropping those still at their default (except `success` and `changed`)"""
+        encoded = {}
+        for item in fields(value):
+            name, current = item.name, getattr(value, item.name)
+            if name in ("ui_elements", "text_content") and tree is not None:
+                continue
+            default = item.default_factory() if item.default_factory is not MISSING else item.default
+            if name not in ("success", "changed") and current == default:
+                continue
+            encoded["elapsed_ms" if name == "timings" else name] = self._value(current, tree, ids)
+        return encoded
+
+    def encode(self, result: Any, tree: Optional[UITree] = None, delta: bool = False) -> Dict[str, Any]:
+        """Encode a result, plus the elements of `tree` (the UI after the action) when given"""
+        ids = self.element_ids(tree) if tree is not None else {}
+        encoded = self._fields(result, tree, ids)
+        if tree is not None:
+            encoded.update(self.snapshot(tree, ids, delta))
+        return encoded
+
+
+class AdbError(Exception):
+    """Raised when the adb server rejects a request or the connection breaks"""
+
+
+class AdbTransport:
+    """Talks to the local adb server over its smart-socket protocol.
+
+    Shell commands share one long-lived `exec:sh` session, so an action costs a
+    write and a read instead of an `adb` process spawn. Binary output (files,
+    screencap) uses a short-lived `exec:` stream on the same server.
+    """
+
+    def __init__(self, serial: str, host: str = "127.0.0.1", port: Optional[int] = None, timeout: float = 30):
+        self.serial = serial
+        self.host = host
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+        self.timeout = timeout
+        self._shell_sock: Optional[socket.socket] = None
+        self._shell_buffer = b""
+        self._markers = itertools.count()
+        self._lock = threading.Lock()
+        self._server_started = False
+        self.round_trips = 0
+
+    def _connect(self) -> socket.socket:
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except ConnectionRefusedError:
+            if self._server_started:
+                raise AdbError(f"adb server not reachable on {self.host}:{self.port}")
+            self._server_started = True
+            subprocess.run(["adb", "start-server"], capture_output=True, timeout=self.timeout)
+            return self._connect()
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise AdbError("adb server closed the connection")
+            data += chunk
+        return data
+
+    def _request(self, sock: socket.socket, payload: str):
+        encoded = payload.encode("utf-8")
+        sock.sendall(b"%04x" % len(encoded) + encoded)
+        status = self._recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            length = int(self._recv_exact(sock, 4), 16)
+            raise AdbError(self._recv_exact(sock, length).decode("utf-8", "replace"))
+        raise AdbError(f"Unexpected adb status {status!r}")
+
+    def _open_service(self, service: str) -> socket.socket:
+        sock = self._connect()
+        try:
+            self._request(sock, f"host:transport:{self.serial}")
+            self._request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def devices(self) -> List[Tuple[str, str]]:
+        """List (serial, state) pairs known to the adb server"""
+        sock = self._connect()
+        try:
+            self._request(sock, "host:devices")
+            length = int(self._recv_exact(sock, 4), 16)
+            payload = self._recv_exact(sock, length).decode("utf-8", "replace")
+        finally:
+            sock.close()
+        return [tuple(line.split("\t", 1)) for line in payload.splitlines() if "\t" in line]
+
+    def exec_stream(self, command: str, chunk_size: int = 65536):
+        """Run a command and yield its raw stdout as it arrives"""
+        self.round_trips += 1
+        sock = self._open_service(f"exec:{command}")
+        try:
+            while True:
+                chunk = sock.recv(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            sock.close()
+
+    def exec_out(self, command: str) -> bytes:
+        """Run a command and return its raw stdout bytes"""
+        return b"".join(self.exec_stream(command))
+
+    def shell(self, command: str) -> Tuple[int, str]:
+        """Run a command in the persistent shell session and return (exit code, output).
+        
+        Only a failure to open the session or write the command is retried; once
+        the command is sent it may have run, so read errors close the session and raise.
+        """
+        self.round_trips += 1
+        with self._lock:
+            try:
+                try:
+                    marker = self._send_shell(command)
+                except (ConnectionError, AdbError):
+                    self._close_shell()
+                    marker = self._send_shell(command)
+                return self._read_shell(marker)
+            except (OSError, AdbError):
+                self._close_shell()
+                raise
+
+    def _shell_closed(self) -> bool:
+        """Whether the adb server has closed the idle shell session"""
+        self._shell_sock.setblocking(False)
+        try:
+            return self._shell_sock.recv(1, socket.MSG_PEEK) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            self._shell_sock.settimeout(self.timeout)
+
+    def _send_shell(self, command: str) -> bytes:
+        if self._shell_sock is not None and self._shell_closed():
+            self._close_shell()
+        if self._shell_sock is None:
+            self._shell_sock = self._open_service("exec:sh")
+            self._shell_buffer = b""
+        marker = f"__cue_done_{next(self._markers)}__".encode()
+        self._shell_sock.sendall(f"({command}) 2>&1; echo \"{marker.decode()}$?\"\n".encode("utf-8"))
+        return marker
+
+    def _read_shell(self, marker: bytes) -> Tuple[int, str]:
+        while True:
+            index = self._shell_buffer.find(marker)
+            if index >= 0:
+                end = self._shell_buffer.find(b"\n", index)
+                if end >= 0:
+                    output = self._shell_buffer[:index]
+                    code = int(self._shell_buffer[index + len(marker):end] or b"1")
+                    self._shell_buffer = self._shell_buffer[end + 1:]
+                    return code, output.decode("utf-8", "replace")
+            chunk = self._shell_sock.recv(65536)
+            if not chunk:
+                raise AdbError("adb shell session closed")
+            self._shell_buffer += chunk
+
+    def _close_shell(self):
+        if self._shell_sock is not None:
+            try:
+                self._shell_sock.close()
+            except OSError:
+                pass
+        self._shell_sock = None
+        self._shell_buffer = b""
+
+    def close(self):
+        """Close the persistent shell session"""
+        with self._lock:
+            self._close_shell()
+
 
 class AndroidEmulator:
     """Unified Android emulator interface"""
     
-    def __init__(self, device_id: str = "emulator-5554", project_root: str = None):
+    def __init__(self, device_id: str = "emulator-5554", project_root: str = None, save_captures: bool = True,
+                 package: str = DEFAULT_APP_PACKAGE, tracer: Optional[Tracer] = None,
+                 store: Optional[ScreenshotStore] = None):
         self.device_id = device_id
+        self.package = package
+        self.transport = AdbTransport(device_id)
+        self.save_captures = save_captures
+        self.last_capture: Optional[ScreenCapture] = None
+        self.generation = 0
+        self.tracer = tracer or Tracer()
+        self.action_id = ""
+        self._store = store
+        self._ime_active: Optional[bool] = None
+        self.classifier = ScreenClassifier()
+        self.encoder = CompactEncoder()
         # Auto-detect project root if not provided
         if project_root is None:
             script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -89,168 +1820,292 @@ class AndroidEmulator:
         self.scripts_dir = os.path.join(self.project_root, "scripts")
         self.logs_dir = os.path.join(self.project_root, "logs")
     
-    def _run_command(self, command: List[str], capture_output: bool = True) -> subprocess.CompletedProcess:
-        """Run shell command and return result"""
+    @property
+    def store(self) -> ScreenshotStore:
+        """Screenshot store under logs/screenshots, opened on first save"""
+        if self._store is None:
+            self._store = ScreenshotStore.open(os.path.join(self.logs_dir, "screenshots"))
+        return self._store
+    
+    def _adb_shell(self, command: str) -> subprocess.CompletedProcess:
+        """Run a device shell command over the adb transport"""
         try:
-            result = subprocess.run(
-                command, 
-                capture_output=capture_output, 
-                text=True, 
-                cwd=self.project_root,
-                timeout=30
-            )
-            return result
-        except subprocess.TimeoutExpired:
+            with self.tracer.span("adb.shell"):
+                code, output = self.transport.shell(command)
+            if code != 0:
+                return subprocess.CompletedProcess(command, code, output, output.strip())
+            return subprocess.CompletedProcess(command, 0, output, "")
+        except socket.timeout:
+            self.transport.close()
             return subprocess.CompletedProcess(command, 1, "", "Command timed out")
         except Exception as e:
             return subprocess.CompletedProcess(command, 1, "", str(e))
     
-    def _get_timestamp(self) -> str:
-        """Get current timestamp"""
-        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def _adb_exec_out(self, command: str) -> bytes:
+        """Run a device command and return its raw stdout"""
+        with self.tracer.span("adb.exec_out"):
+            return self.transport.exec_out(command)
     
-    def _parse_ui_dump(self, xml_content: str) -> List[UIElement]:
-        """Parse UI dump XML and extract relevant elements"""
-        elements = []
+    def _capture_frame(self) -> bytes:
+        """Stream the raw framebuffer off adb stdout; PNG encoding is left to the host, on demand"""
+        with self.tracer.span("capture.frame"):
+            frame = self._adb_exec_out("screencap")
+            decode_raw_frame(frame)
+            return frame
+    
+    def _capture_ui(self) -> Tuple[str, UITree]:
+        """Stream the uiautomator hierarchy off adb stdout, parsing it as it arrives"""
+        with self.tracer.span("capture.ui"):
+            parser = UITreeParser()
+            received: List[bytes] = []
+            for chunk in self.transport.exec_stream("uiautomator dump /dev/tty"):
+                received.append(chunk)
+                if parser.feed(chunk):
+                    break
+            return self._ui_xml_from_output(b"".join(received)), parser.close()
+    
+    @staticmethod
+    def _ui_xml_from_output(output: bytes) -> str:
+        """Trim a `uiautomator dump /dev/tty` output down to the XML document"""
+        text = output.decode("utf-8", "replace")
+        end = text.rfind("</hierarchy>")
+        if end < 0:
+            raise AdbError(f"UI dump returned no hierarchy: {text.strip()[:200]}")
+        return text[text.find("<"):end + len("</hierarchy>")]
+    
+    def _save_capture(self, capture: ScreenCapture) -> str:
+        """Record a capture in the screenshot store once and return its PNG path"""
+        if capture.saved_path or capture.frame is None:
+            return capture.saved_path
+        with self.tracer.span("save"):
+            entry = self.store.put(capture.frame, action_id=self.action_id, captured_at=capture.captured_at,
+                                   with_png=True, png=capture._png)
+            capture.frame_id = entry["frame"]
+            capture.saved_path = self.store.png_file(capture.frame_id)
+            with open(os.path.join(self.logs_dir, "ui_dump.xml"), 'w') as f:
+                f.write(capture.ui_xml)
+        return capture.saved_path
+    
+    def invalidate(self):
+        """Mark the cached snapshot stale; input actions call this automatically"""
+        self.generation += 1
+    
+    def _adb_input(self, args: str) -> subprocess.CompletedProcess:
+        """Send an `input` command and invalidate the snapshot"""
+        return self._adb_input_script(f"input {args}")
+    
+    def _adb_input_script(self, script: str) -> subprocess.CompletedProcess:
+        """Run a shell script that injects input and invalidate the snapshot"""
         try:
-            root = ET.fromstring(xml_content)
-            for node in root.iter('node'):
-                text = node.get('text', '')
-                content_desc = node.get('content-desc', '')
-                bounds = node.get('bounds', '')
-                resource_id = node.get('resource-id', '')
-                class_name = node.get('class', '')
-                clickable = node.get('clickable', 'false') == 'true'
-                focused = node.get('focused', 'false') == 'true'
-                
-                # Skip empty or irrelevant elements
-                if not text and not content_desc and not clickable:
-                    continue
-                
-                # Parse bounds to get coordinates
-                x, y, width, height = 0, 0, 0, 0
-                if bounds:
-                    match = re.match(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]', bounds)
-                    if match:
-                        x1, y1, x2, y2 = map(int, match.groups())
-                        x, y = (x1 + x2) // 2, (y1 + y2) // 2
-                        width, height = x2 - x1, y2 - y1
-                
-                element = UIElement(
-                    text=text,
-                    bounds=bounds,
-                    content_desc=content_desc,
-                    resource_id=resource_id,
-                    class_name=class_name,
-                    clickable=clickable,
-                    focused=focused,
-                    x=x,
-                    y=y,
-                    width=width,
-                    height=height
-                )
-                elements.append(element)
-        except Exception as e:
-            # Return empty list if parsing fails
-            pass
-        
-        return elements
-    
-    def _analyze_screen_state(self, elements: List[UIElement]) -> str:
-        """Analyze UI elements to determine current screen state"""
-        # Look for key indicators
-        texts = [elem.text.lower() for elem in elements if elem.text]
-        content_descs = [elem.content_desc.lower() for elem in elements if elem.content_desc]
-        all_text = texts + content_descs
-        
-        if any('login' in text or 'sign in' in text for text in all_text):
-            return "login"
-        elif any('home' in text for text in all_text):
-            return "home"
-        elif any('chat' in text or 'message' in text for text in all_text):
-            return "chat"
-        elif any('settings' in text for text in all_text):
-            return "settings"
-        else:
-            return "unknown"
+            with self.tracer.span("input"):
+                return self._adb_shell(script)
+        finally:
+            self.invalidate()
     
-    def _get_available_actions(self, elements: List[UIElement], screen_state: str) -> List[str]:
-        """Determine available actions based on current state"""
-        actions = []
-        
-        # Check for clickable elements
-        clickable_elements = [elem for elem in elements if elem.clickable]
-        
-        if any(elem.content_desc == "Send message" for elem in clickable_elements):
-            actions.append("send_message")
-        
-        if any("login" in elem.text.lower() or "sign in" in elem.text.lower() for elem in clickable_elements):
-            actions.append("login")
-        
-        if any("menu" in elem.content_desc.lower() for elem in clickable_elements):
-            actions.append("open_menu")
+    def snapshot(self, tree_only: bool = False) -> ScreenCapture:
+        """Return the current snapshot, capturing only when the generation moved on"""
+        cached = self.last_capture
+        if cached is not None and cached.generation == self.generation:
+            if cached.frame is None and not tree_only:
+                cached.frame = self._capture_frame()
+            return cached
+        frame = None if tree_only else self._capture_frame()
+        ui_xml, tree = self._capture_ui()
+        capture = ScreenCapture(
+            frame=frame,
+            ui_xml=ui_xml,
+            captured_at=time.time(),
+            generation=self.generation,
+            tree=tree
+        )
+        self.last_capture = capture
+        return capture
+    
+    def _idle_signature(self) -> str:
+        """Cheap UI activity probe: focused window plus the app's rendered frame count"""
+        probe = self._adb_shell(
+            "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'; "
+            f"dumpsys gfxinfo {self.package} | grep 'Total frames rendered'"
+        )
+        return probe.stdout
+    
+    @traced("wait_until_idle")
+    def wait_until_idle(self, timeout: float = 5.0, quiet_period: float = 0.3,
+                        initial_interval: float = 0.05, max_interval: float = 0.5) -> WaitResult:
+        """Wait until the focused window is stable and the app stops rendering frames.
         
-        # Check for input fields
-        input_fields = [elem for elem in elements if 'EditText' in elem.class_name]
-        if input_fields:
-            actions.append("input_text")
+        Falls back to comparing tree-only dumps when the app's frame counter
+        is not available (e.g. another app is in front).
+        """
+        result = WaitResult(success=False, timestamp=self._get_timestamp(), condition="idle")
+        start = time.monotonic()
+        interval = initial_interval
+        last_signature = None
+        stable_since = start
+        try:
+            while True:
+                signature = self._idle_signature()
+                if "Total frames rendered" not in signature:
+                    self.invalidate()
+                    signature += self.snapshot(tree_only=True).ui_xml
+                    result.tree_captures += 1
+                result.polls += 1
+                now = time.monotonic()
+                if signature != last_signature:
+                    last_signature = signature
+                    stable_since = now
+                elif now - stable_since >= quiet_period:
+                    result.satisfied = True
+                    break
+                if now - start >= timeout:
+                    result.warnings.append(f"UI did not settle within {timeout}s")
+                    break
+                time.sleep(min(interval, max(timeout - (now - start), 0)))
+                interval = min(interval * 1.5, max_interval)
+            result.success = True
+        except Exception as e:
+            result.errors.append(f"Wait until idle failed: {str(e)}")
+        result.elapsed_ms = (time.monotonic() - start) * 1000
+        return result
+    
+    @traced("wait_for")
+    def wait_for(self, condition, timeout: float = 10.0, initial_interval: float = 0.05,
+                 max_interval: float = 0.5) -> WaitResult:
+        """Wait until a selector matches or a predicate on the snapshot returns True.
         
-        # Always available
-        actions.extend(["screenshot", "tap", "get_ui_state"])
+        The tree is only re-dumped when the idle probe reports new activity, so
+        polling a quiet screen costs one shell round trip per poll.
+        """
+        label = condition if isinstance(condition, str) else getattr(condition, "__name__", "predicate")
+        result = WaitResult(success=False, timestamp=self._get_timestamp(), condition=label)
+        start = time.monotonic()
+        interval = initial_interval
+        last_signature = None
+        try:
+            while True:
+                signature = self._idle_signature()
+                result.polls += 1
+                if signature != last_signature or "Total frames rendered" not in signature:
+                    last_signature = signature
+                    self.invalidate()
+                    capture = self.snapshot(tree_only=True)
+                    result.tree_captures += 1
+                    if isinstance(condition, str):
+                        node_id = compile_selector(condition).first(capture.tree)
+                        if node_id is not None:
+                            result.matched_element = capture.tree.element(node_id)
+                            result.satisfied = True
+                    elif condition(capture):
+                        result.satisfied = True
+                    if result.satisfied:
+                        break
+                now = time.monotonic()
+                if now - start >= timeout:
+                    result.errors.append(f"Condition '{label}' not met within {timeout}s")
+                    break
+                time.sleep(min(interval, max(timeout - (now - start), 0)))
+                interval = min(interval * 1.5, max_interval)
+            result.success = result.satisfied
+        except Exception as e:
+            result.errors.append(f"Wait for '{label}' failed: {str(e)}")
+        result.elapsed_ms = (time.monotonic() - start) * 1000
+        return result
+    
+    def capture_frame_blocks(self, block: int = 16):
+        """Raw framebuffer reduced to mean-luminance blocks; None without NumPy"""
+        if np is None:
+            return None
+        return frame_blocks(self._capture_frame(), block)
+    
+    @traced("detect_change")
+    def detect_change(self, reference: ScreenCapture, reference_blocks=None, block: int = 16) -> ChangeSummary:
+        """Compare a fresh tree-only dump (and, given reference blocks, the framebuffer) against a reference.
         
-        return actions
+        Cheap enough to poll: no PNG encoding, and the tree diff only descends
+        into subtrees whose hashes differ.
+        """
+        self.invalidate()
+        summary = diff_trees(reference.tree, self.snapshot(tree_only=True).tree)
+        if reference_blocks is not None:
+            summary.pixel_magnitude, summary.pixel_region = diff_frame_blocks(
+                reference_blocks, self.capture_frame_blocks(block), block)
+            summary.changed = summary.changed or summary.pixel_magnitude > 0
+        return summary
     
-    def screenshot(self) -> ScreenshotResult:
-        """Take screenshot and analyze UI state"""
-        result = ScreenshotResult(
-            success=False,
-            timestamp=self._get_timestamp()
-        )
+    def _escape_input_text(self, text: str) -> str:
+        """Escape text for `input text`"""
+        return shlex.quote(text.replace(" ", "%s"))
+    
+    def _adb_keyboard_active(self) -> bool:
+        """Whether the ADB keyboard IME is the current input method (checked once)"""
+        if self._ime_active is None:
+            probe = self._adb_shell("settings get secure default_input_method")
+            self._ime_active = probe.returncode == 0 and probe.stdout.strip() == ADB_KEYBOARD_IME
+        return self._ime_active
+    
+    def _text_commands(self, text: str, method: str = "auto", chunk_size: int = TEXT_CHUNK_SIZE) -> Tuple[str, List[str]]:
+        """Shell commands that type `text` into the focused field, and the channel they use.
         
-        try:
-            # Take screenshot
-            screenshot_cmd = [os.path.join(self.scripts_dir, "screenshot.sh")]
-            screenshot_result = self._run_command(screenshot_cmd)
-            
-            if screenshot_result.returncode != 0:
-                result.errors.append(f"Screenshot failed: {screenshot_result.stderr}")
-                return result
-            
-            # Get UI dump
-            ui_dump_cmd = [os.path.join(self.scripts_dir, "interact.sh"), "ui-dump"]
-            ui_result = self._run_command(ui_dump_cmd)
-            
-            if ui_result.returncode != 0:
-                result.errors.append(f"UI dump failed: {ui_result.stderr}")
-                return result
-            
-            # Parse UI elements
-            ui_dump_path = os.path.join(self.logs_dir, "ui_dump.xml")
-            if os.path.exists(ui_dump_path):
-                with open(ui_dump_path, 'r') as f:
-                    xml_content = f.read()
-                elements = self._parse_ui_dump(xml_content)
-            else:
-                elements = []
-                result.warnings.append("UI dump file not found")
-            
-            # Find latest screenshot
-            screenshots_dir = os.path.join(self.logs_dir, "screenshots")
-            if os.path.exists(screenshots_dir):
-                screenshots = [f for f in os.listdir(screenshots_dir) if f.endswith('.png')]
-                if screenshots:
-                    latest_screenshot = max(screenshots, key=lambda f: os.path.getctime(os.path.join(screenshots_dir, f)))
-                    result.screenshot_path = os.path.join(screenshots_dir, latest_screenshot)
+        With the ADB keyboard IME active ("auto") or requested ("ime"), chunks go
+        out as base64 broadcasts, which carry any Unicode and newlines in one
+        call each. Otherwise `input text` is used: shell-quoted, spaces sent as
+        %s, a literal "%s" split in two so it isn't typed as a space, and
+        newlines sent as Enter.
+        """
+        if method == "ime" or (method == "auto" and self._adb_keyboard_active()):
+            return "ime", [
+                f"am broadcast -a ADB_INPUT_B64 --es msg {base64.b64encode(text[i:i + chunk_size].encode()).decode()}"
+                for i in range(0, len(text), chunk_size)
+            ]
+        commands = []
+        for line_number, line in enumerate(text.split("\n")):
+            if line_number:
+                commands.append("input keyevent KEYCODE_ENTER")
+            for segment in re.split(r"(?<=%)(?=s)", line):
+                commands.extend(f"input text {self._escape_input_text(segment[i:i + chunk_size])}"
+                                for i in range(0, len(segment), chunk_size))
+        return "input", commands
+    
+    def _get_timestamp(self) -> str:
+        """Get current timestamp"""
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    def _parse_ui_dump(self, xml_content: str) -> List[UIElement]:
+        """Parse UI dump XML and extract relevant elements"""
+        return parse_ui_tree(xml_content).elements
+    
+    def _analyze_capture(self, result: ScreenshotResult, capture: ScreenCapture):
+        """Fill a ScreenshotResult's analysis fields from a snapshot"""
+        with self.tracer.span("analyze"):
+            elements = capture.elements
             
             # Analyze state
-            result.current_screen = self._analyze_screen_state(elements)
-            result.available_actions = self._get_available_actions(elements, result.current_screen)
+            result.current_screen, result.available_actions = self.classifier.classify(capture.tree)
             
             # Categorize elements
             result.ui_elements = elements
             result.input_fields = [elem for elem in elements if 'EditText' in elem.class_name]
             result.buttons = [elem for elem in elements if elem.clickable and ('Button' in elem.class_name or elem.content_desc)]
+    
+    @traced("screenshot")
+    def screenshot(self, save: Optional[bool] = None, tree_only: bool = False) -> ScreenshotResult:
+        """Take screenshot and analyze UI state; `save` overrides `save_captures`"""
+        result = ScreenshotResult(
+            success=False,
+            timestamp=self._get_timestamp()
+        )
+        
+        try:
+            try:
+                capture = self.snapshot(tree_only=tree_only)
+            except Exception as e:
+                result.errors.append(f"Capture failed: {e}")
+                return result
             
+            if save if save is not None else self.save_captures:
+                result.screenshot_path = self._save_capture(capture)
+                result.frame_id = capture.frame_id
+            self._analyze_capture(result, capture)
             result.success = True
             
         except Exception as e:
@@ -258,6 +2113,7 @@ class AndroidEmulator:
         
         return result
     
+    @traced("tap")
     def tap(self, x: int, y: int) -> InteractionResult:
         """Tap at specific coordinates"""
         result = InteractionResult(
@@ -268,33 +2124,31 @@ class AndroidEmulator:
         
         try:
             # Get initial state
-            initial_screenshot = self.screenshot()
+            initial_screenshot = self.screenshot(tree_only=True)
             initial_state = initial_screenshot.current_screen
+            initial_tree = self.snapshot(tree_only=True).tree
             
             # Perform tap
-            tap_cmd = [os.path.join(self.scripts_dir, "interact.sh"), "tap", str(x), str(y)]
-            tap_result = self._run_command(tap_cmd)
+            tap_result = self._adb_input(f"tap {x} {y}")
             
             if tap_result.returncode != 0:
                 result.errors.append(f"Tap failed: {tap_result.stderr}")
                 return result
             
-            # Get new state
-            import time
-            time.sleep(1)  # Brief pause for UI to update
-            new_screenshot = self.screenshot()
+            # Get new state once the UI settles
+            result.settle_time_ms = self.wait_until_idle().elapsed_ms
+            new_screenshot = self.screenshot(tree_only=True)
             new_state = new_screenshot.current_screen
             
-            result.ui_state_changed = (initial_state != new_state)
+            with self.tracer.span("diff"):
+                result.change = diff_trees(initial_tree, self.snapshot(tree_only=True).tree)
+            result.ui_state_changed = result.change.changed or initial_state != new_state
             result.new_screen_state = new_state
             
             # Find what was tapped
-            for element in initial_screenshot.ui_elements:
-                if (element.clickable and 
-                    abs(element.x - x) < element.width // 2 and 
-                    abs(element.y - y) < element.height // 2):
-                    result.target_element = element
-                    break
+            tapped = initial_tree.spatial.element_at(x, y, clickable=True)
+            if tapped is not None:
+                result.target_element = initial_tree.element(tapped)
             
             # Suggest follow-up actions
             result.follow_up_suggestions = new_screenshot.available_actions
@@ -306,8 +2160,31 @@ class AndroidEmulator:
         
         return result
     
+    def _resolve_target(self, tree: UITree, selector: str) -> Optional[UIElement]:
+        """Resolve a selector to the clickable element a tap should hit"""
+        compiled = compile_selector(selector)
+        if compiled.is_plain:
+            # Plain text: prefer a clickable match, then a content-desc match inside a clickable container
+            quoted = quote_selector_value(selector)
+            node_id = compile_selector(f"any*={quoted} clickable").first(tree)
+            if node_id is None:
+                node_id = compile_selector(f"desc*={quoted}").first(tree)
+        else:
+            node_id = compiled.first(tree)
+        if node_id is None:
+            return None
+        container = tree.spatial.clickable_container(node_id)
+        return tree.element(container) if container is not None else None
+    
+    @traced("find_elements")
+    def find_elements(self, selector: str) -> List[UIElement]:
+        """All elements on the current snapshot matching a selector (see Selector)"""
+        tree = self.snapshot(tree_only=True).tree
+        return [tree.element(node_id) for node_id in compile_selector(selector).find_all(tree)]
+    
+    @traced("tap_element")
     def tap_element(self, selector: str) -> InteractionResult:
-        """Tap element by text or content description"""
+        """Tap element by text, content description or Selector expression"""
         result = InteractionResult(
             success=False,
             timestamp=self._get_timestamp(),
@@ -316,42 +2193,12 @@ class AndroidEmulator:
         
         try:
             # Get current UI state
-            screenshot_result = self.screenshot()
+            screenshot_result = self.screenshot(tree_only=True)
             if not screenshot_result.success:
                 result.errors.extend(screenshot_result.errors)
                 return result
             
-            # Find element - first try direct clickable match
-            target_element = None
-            for element in screenshot_result.ui_elements:
-                if (element.clickable and 
-                    (selector.lower() in element.text.lower() or 
-                     selector.lower() in element.content_desc.lower())):
-                    target_element = element
-                    break
-            
-            # If not found, try to find by content-desc and look for clickable parent
-            if not target_element:
-                for element in screenshot_result.ui_elements:
-                    if (selector.lower() in element.content_desc.lower()):
-                        # Try to find clickable parent by using the coordinates of this element
-                        # Look for clickable elements that contain this element's coordinates
-                        for clickable_elem in screenshot_result.ui_elements:
-                            if (clickable_elem.clickable and 
-                                element.bounds and clickable_elem.bounds):
-                                # Parse bounds to check if clickable element contains the target
-                                target_match = re.match(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]', element.bounds)
-                                clickable_match = re.match(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]', clickable_elem.bounds)
-                                if target_match and clickable_match:
-                                    tx1, ty1, tx2, ty2 = map(int, target_match.groups())
-                                    cx1, cy1, cx2, cy2 = map(int, clickable_match.groups())
-                                    # Check if target is within clickable bounds
-                                    if (cx1 <= tx1 <= cx2 and cy1 <= ty1 <= cy2 and
-                                        cx1 <= tx2 <= cx2 and cy1 <= ty2 <= cy2):
-                                        target_element = clickable_elem
-                                        break
-                        if target_element:
-                            break
+            target_element = self._resolve_target(self.snapshot(tree_only=True).tree, selector)
             
             if not target_element:
                 result.errors.append(f"Element '{selector}' not found or not clickable")
@@ -365,14 +2212,20 @@ class AndroidEmulator:
             result.ui_state_changed = tap_result.ui_state_changed
             result.new_screen_state = tap_result.new_screen_state
             result.follow_up_suggestions = tap_result.follow_up_suggestions
+            result.settle_time_ms = tap_result.settle_time_ms
+            result.change = tap_result.change
             
         except Exception as e:
             result.errors.append(f"Tap element operation failed: {str(e)}")
         
         return result
     
-    def input_text(self, text: str) -> InteractionResult:
-        """Input text into focused field"""
+    @traced("input_text")
+    def input_text(self, text: str, method: str = "auto") -> InteractionResult:
+        """Input text into the focused field, focusing the first text field if none is.
+        
+        `method` picks the channel (see _text_commands): "auto", "ime" or "input".
+        """
         result = InteractionResult(
             success=False,
             timestamp=self._get_timestamp(),
@@ -380,19 +2233,35 @@ class AndroidEmulator:
         )
         
         try:
-            # Input text
-            input_cmd = [os.path.join(self.scripts_dir, "interact.sh"), "text", text]
-            input_result = self._run_command(input_cmd)
+            # Reuse a focused field, otherwise focus the first text field
+            current = self.screenshot(tree_only=True)
+            initial_tree = self.snapshot(tree_only=True).tree
+            input_fields = current.input_fields
+            commands = []
+            if input_fields and not any(field.focused for field in input_fields):
+                commands.append(f"input tap {input_fields[0].x} {input_fields[0].y}")
+            
+            # Input text: focus tap and every chunk in one round trip
+            result.input_method, text_commands = self._text_commands(text, method)
+            if result.input_method == "input" and not text.isascii():
+                result.warnings.append("Non-ASCII text needs the ADB keyboard IME; `input text` may drop it")
+            commands.extend(text_commands)
+            start = time.monotonic()
+            input_result = self._adb_input_script(" && ".join(commands) or "true")
+            elapsed = time.monotonic() - start
             
             if input_result.returncode != 0:
                 result.errors.append(f"Text input failed: {input_result.stderr}")
                 return result
+            result.chars_per_second = round(len(text) / elapsed, 1) if elapsed > 0 else 0.0
             
-            # Get updated state
-            import time
-            time.sleep(0.5)  # Brief pause for text to register
-            new_screenshot = self.screenshot()
+            # Get updated state once the UI settles
+            result.settle_time_ms = self.wait_until_idle().elapsed_ms
+            new_screenshot = self.screenshot(tree_only=True)
             
+            with self.tracer.span("diff"):
+                result.change = diff_trees(initial_tree, self.snapshot(tree_only=True).tree)
+            result.ui_state_changed = result.change.changed
             result.new_screen_state = new_screenshot.current_screen
             result.follow_up_suggestions = new_screenshot.available_actions
             result.success = True
@@ -402,8 +2271,96 @@ class AndroidEmulator:
         
         return result
     
-    def send_message(self, message: str) -> MessageResult:
-        """Send a message in chat interface"""
+    @staticmethod
+    def _conversation_texts(tree: UITree) -> "Counter[str]":
+        """Texts on screen outside editable fields"""
+        return Counter(text for text, class_name in zip(tree.text, tree.class_name)
+                       if text and "EditText" not in class_name)
+    
+    @staticmethod
+    def _reply_text(tree: UITree, baseline: "Counter[str]", message: str) -> str:
+        """Text that appeared since `baseline`, minus the sent bubble and status/timestamp nodes.
+        
+        The sent bubble is the first new node, in list order, whose text matches
+        the message after collapsing whitespace (the app may trim, linkify or
+        truncate it with an ellipsis).
+        """
+        new = AndroidEmulator._conversation_texts(tree) - baseline
+        sent = " ".join(message.split()).casefold()
+        status_end, sent_found, parts = -1, False, []
+        for node_id, text in enumerate(tree.text):
+            if text.strip() in _STATUS_ICONS:
+                # The icon's row holds the status text and its time
+                parent = tree.parent[node_id]
+                status_end = max(status_end, tree.subtree_end[parent] if parent >= 0 else node_id + 1)
+            if new[text] <= 0:
+                continue
+            new[text] -= 1
+            if (node_id < status_end or _REPLY_NOISE_RE.match(text) or _REPLY_STATUS_RE.match(text)
+                    or text.lstrip().startswith(tuple(_STATUS_ICONS))):
+                continue
+            shown = " ".join(text.split()).casefold()
+            stem = shown.rstrip(".…").rstrip()
+            truncated = stem != shown and len(stem) >= 3 and sent.startswith(stem)
+            if not sent_found and (shown == sent or truncated):
+                sent_found = True
+                continue
+            parts.append(text)
+        return "\n".join(parts)
+    
+    def _await_reply(self, result: MessageResult, baseline: "Counter[str]", sent_at: float,
+                     timeout: float, quiet_period: float):
+        """Watch the conversation after a send until a reply appears and stops changing.
+        
+        Reply text is whatever non-editable text appeared since `baseline`, minus
+        the sent message, status bubbles and bubble metadata (times, icons,
+        "Sending…"), so the first-token timer starts with the reply itself. The
+        reply is complete once it has not changed for `quiet_period` seconds and
+        no progress indicator is showing. The UI is re-dumped only when the idle
+        probe shows the app rendered since the last poll.
+        """
+        deadline = sent_at + timeout
+        interval, probe, reply, loading = 0.05, None, "", None
+        first_token_at = changed_at = None
+        with self.tracer.span("reply"):
+            while True:
+                now = time.monotonic()
+                signature = self._idle_signature()
+                if signature != probe:
+                    probe = signature
+                    self.invalidate()
+                    tree = self.snapshot(tree_only=True).tree
+                    candidate = self._reply_text(tree, baseline, result.message_content)
+                    spinner = any("ProgressBar" in class_name for class_name in set(tree.class_name))
+                    if candidate and first_token_at is None:
+                        first_token_at = now
+                    if (candidate, spinner) != (reply, loading):
+                        reply, loading, changed_at = candidate, spinner, now
+                        interval = 0.05
+                if first_token_at is not None and not loading and now - changed_at >= quiet_period:
+                    break
+                if now >= deadline:
+                    break
+                time.sleep(min(interval, max(deadline - now, 0)))
+                interval = min(interval * 1.5, 0.25)
+        result.backend_response = reply or None
+        if first_token_at is not None:
+            result.time_to_first_token_ms = round((first_token_at - sent_at) * 1000, 1)
+        if first_token_at is not None and not loading and time.monotonic() - changed_at >= quiet_period:
+            result.time_to_complete_ms = round((changed_at - sent_at) * 1000, 1)
+            result.conversation_state = "reply_complete"
+        else:
+            result.conversation_state = "reply_streaming" if first_token_at is not None else "awaiting_reply"
+            result.errors.append(f"No complete reply within {timeout:g}s")
+    
+    @traced("send_message")
+    def send_message(self, message: str, method: str = "auto", wait_reply: bool = False,
+                     reply_timeout: float = 60.0, quiet_period: float = 1.0) -> MessageResult:
+        """Send a message in chat interface.
+        
+        With `wait_reply`, also wait for the assistant's reply and report
+        time-to-first-token and time-to-complete, measured from the send tap.
+        """
         result = MessageResult(
             success=False,
             timestamp=self._get_timestamp(),
@@ -412,10 +2369,32 @@ class AndroidEmulator:
         
         try:
             # Input the message
-            input_result = self.input_text(message)
+            input_result = self.input_text(message, method=method)
+            result.warnings.extend(input_result.warnings)
             if not input_result.success:
                 result.errors.extend(input_result.errors)
                 return result
+            result.chars_per_second = input_result.chars_per_second
+            
+            if wait_reply:
+                # Tap without waiting for the UI to settle: the reply keeps it busy
+                tree = self.snapshot(tree_only=True).tree
+                baseline = self._conversation_texts(tree)
+                target = self._resolve_target(tree, "Send message")
+                if target is None:
+                    result.errors.append("Element 'Send message' not found or not clickable")
+                    return result
+                send = self._adb_input(f"tap {target.x} {target.y}")
+                sent_at = time.monotonic()
+                if send.returncode != 0:
+                    result.errors.append(f"Tap failed: {send.stderr}")
+                    return result
+                result.message_sent = True
+                result.chat_state = "message_sent"
+                self._await_reply(result, baseline, sent_at, reply_timeout, quiet_period)
+                result.settle_time_ms = input_result.settle_time_ms
+                result.success = not result.errors
+                return result
             
             # Tap send button
             send_result = self.tap_element("Send message")
@@ -423,6 +2402,7 @@ class AndroidEmulator:
                 result.errors.extend(send_result.errors)
                 return result
             
+            result.settle_time_ms = input_result.settle_time_ms + send_result.settle_time_ms
             result.message_sent = True
             result.chat_state = "message_sent"
             result.success = True
@@ -432,6 +2412,92 @@ class AndroidEmulator:
         
         return result
     
+    def _batch_command(self, action: Action, tree: Optional[UITree]) -> str:
+        """Translate one batch action into a device shell command"""
+        if action.kind == "tap":
+            return "input tap %d %d" % action.args
+        if action.kind == "swipe":
+            return "input swipe %d %d %d %d %d" % action.args
+        if action.kind == "text":
+            return " && ".join(self._text_commands(action.args[0])[1]) or "true"
+        if action.kind == "key":
+            code = action.args[0]
+            if isinstance(code, str) and not code.isdigit() and not code.startswith("KEYCODE_"):
+                code = f"KEYCODE_{code.upper()}"
+            return f"input keyevent {code}"
+        if action.kind == "pause":
+            return f"sleep {action.args[0] / 1000:.3f}"
+        if action.kind == "tap_element":
+            target = self._resolve_target(tree, action.args[0])
+            if target is None:
+                raise ValueError(f"Element '{action.args[0]}' not found or not clickable")
+            return f"input tap {target.x} {target.y}"
+        raise ValueError(f"Unknown batch action: {action.kind}")
+    
+    @traced("batch")
+    def batch(self, actions: List[Action], expect: Optional[str] = None, timeout: float = 10.0) -> BatchResult:
+        """Run several input actions in a single shell round trip.
+        
+        `tap_element` targets are resolved against one snapshot taken before
+        the batch, so split batches at screen transitions or use `expect`.
+        After the batch, waits for `expect` to match, or for the UI to idle.
+        """
+        result = BatchResult(success=False, timestamp=self._get_timestamp())
+        round_trips_before = self.transport.round_trips
+        
+        try:
+            tree = None
+            if any(action.kind == "tap_element" for action in actions):
+                tree = self.snapshot(tree_only=True).tree
+            try:
+                result.commands = [self._batch_command(action, tree) for action in actions]
+            except ValueError as e:
+                result.errors.append(str(e))
+                return result
+            
+            if result.commands:
+                batch_result = self._adb_input_script(" && ".join(result.commands))
+                if batch_result.returncode != 0:
+                    result.errors.append(f"Batch failed: {batch_result.stderr}")
+                    return result
+            result.actions_performed = [action.describe() for action in actions]
+            
+            # Single checkpoint at the end
+            if expect:
+                checkpoint = self.wait_for(expect, timeout=timeout)
+                result.checkpoint_satisfied = checkpoint.satisfied
+                result.errors.extend(checkpoint.errors)
+            else:
+                checkpoint = self.wait_until_idle(timeout=timeout)
+                result.checkpoint_satisfied = checkpoint.satisfied
+                result.warnings.extend(checkpoint.warnings)
+            result.settle_time_ms = checkpoint.elapsed_ms
+            
+            final = self.screenshot(tree_only=True)
+            result.new_screen_state = final.current_screen
+            result.follow_up_suggestions = final.available_actions
+            result.success = not result.errors
+            
+        except Exception as e:
+            result.errors.append(f"Batch operation failed: {str(e)}")
+        
+        result.round_trips = self.transport.round_trips - round_trips_before
+        return result
+    
+    def _summarize_ui_state(self, result: UIStateResult, screenshot_result: ScreenshotResult):
+        """Fill a UIStateResult from an analyzed screenshot"""
+        result.current_screen = screenshot_result.current_screen
+        result.interactive_elements = [elem for elem in screenshot_result.ui_elements if elem.clickable]
+        result.input_fields = screenshot_result.input_fields
+        result.text_content = [elem.text for elem in screenshot_result.ui_elements if elem.text]
+        
+        # Find focused element
+        for element in screenshot_result.ui_elements:
+            if element.focused:
+                result.focused_element = element
+                break
+    
+    @traced("get_ui_state")
     def get_ui_state(self) -> UIStateResult:
         """Get detailed UI state information"""
         result = UIStateResult(
@@ -440,87 +2506,406 @@ class AndroidEmulator:
         )
         
         try:
-            screenshot_result = self.screenshot()
+            screenshot_result = self.screenshot(tree_only=True)
             if not screenshot_result.success:
                 result.errors.extend(screenshot_result.errors)
                 return result
             
-            result.current_screen = screenshot_result.current_screen
-            result.interactive_elements = [elem for elem in screenshot_result.ui_elements if elem.clickable]
-            result.input_fields = screenshot_result.input_fields
-            result.text_content = [elem.text for elem in screenshot_result.ui_elements if elem.text]
-            
-            # Find focused element
-            for element in screenshot_result.ui_elements:
-                if element.focused:
-                    result.focused_element = element
-                    break
-            
+            self._summarize_ui_state(result, screenshot_result)
             result.success = True
             
         except Exception as e:
             result.errors.append(f"Get UI state operation failed: {str(e)}")
         
         return result
+    
+    @traced("scroll_benchmark")
+    def scroll_benchmark(self, selector: str = "scrollable", swipes: int = 10, duration_ms: int = 200,
+                         distance: float = 0.6, direction: str = "up", pause_ms: int = 300) -> JankResult:
+        """Swipe a list repeatedly and report frame timing from `dumpsys gfxinfo <package> framestats`.
+        
+        Frame stats are reset first, then each swipe, its settle pause and the
+        framestats dump share one shell round trip. `direction` "up" moves the
+        finger up (scrolls towards later items), "both" alternates. `distance`
+        is the fraction of the target's height covered by each swipe.
+        """
+        result = JankResult(success=False, timestamp=self._get_timestamp())
+        start = time.monotonic()
+        
+        try:
+            tree = self.snapshot(tree_only=True).tree
+            node_id = compile_selector(selector).first(tree)
+            if node_id is None:
+                result.errors.append(f"No element matches '{selector}'")
+                return result
+            result.target = target = tree.element(node_id)
+            span = int(target.height * min(max(distance, 0.05), 0.95) / 2)
+            x, middle = target.x, target.y
+            
+            self._adb_shell(f"dumpsys gfxinfo {self.package} reset")
+            stats = FrameStats()
+            for swipe in range(swipes):
+                upward = direction == "up" or (direction == "both" and swipe % 2 == 0)
+                begin, end = (middle + span, middle - span) if upward else (middle - span, middle + span)
+                dump = self._adb_input_script(
+                    f"input swipe {x} {begin} {x} {end} {duration_ms}; sleep {pause_ms / 1000:.3f}; "
+                    f"dumpsys gfxinfo {self.package} framestats"
+                )
+                if dump.returncode != 0:
+                    result.errors.append(f"Swipe {swipe + 1} failed: {dump.stderr}")
+                    return result
+                stats.add_dump(dump.stdout)
+                result.swipes += 1
+            
+            for name, value in stats.report().items():
+                setattr(result, name, value)
+            result.reported = stats.summary
+            if stats.gaps:
+                result.warnings.append(f"{stats.gaps} framestats dumps did not overlap the previous one; "
+                                       "frames were lost, lower pause_ms or duration_ms")
+            if not result.frames:
+                result.errors.append(f"No frame stats reported for {self.package}")
+            result.success = not result.errors
+            
+        except Exception as e:
+            result.errors.append(f"Scroll benchmark failed: {str(e)}")
+        
+        result.elapsed_ms = (time.monotonic() - start) * 1000
+        return result
+    
+    def compact(self, result: Any, delta: bool = False) -> Dict[str, Any]:
+        """Compact encoding of a result with the latest UI tree; `delta` reports only changes since the last call"""
+        capture = self.last_capture
+        return self.encoder.encode(result, capture.tree if capture is not None else None, delta=delta)
 
-def main():
-    """CLI interface for AndroidEmulator"""
-    parser = argparse.ArgumentParser(description="Android Emulator Interface")
+@dataclass
+class DeviceRunResult:
+    """Everything one device produced during a pool run"""
+    serial: str
+    success: bool = False
+    elapsed_ms: float = 0.0
+    results: List[Any] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+@dataclass
+class PoolResult(BaseResult):
+    """Aggregated result of a scenario fanned out across devices"""
+    devices: List[str] = field(default_factory=list)
+    device_results: List[DeviceRunResult] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+@dataclass
+class LoadTestResult(BaseResult):
+    """Chat latency and throughput over a batch of prompts sent with send_message(wait_reply=True)"""
+    prompts: int = 0
+    completed: int = 0
+    failed: int = 0
+    elapsed_ms: float = 0.0
+    replies_per_minute: float = 0.0
+    latency_ms: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    per_device: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+def _latency_stats(values: List[float]) -> Dict[str, float]:
+    """Count, mean and nearest-rank percentiles (ms) of a list of latencies"""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    stats = {"count": len(values), "mean": round(statistics.mean(values), 1)}
+    for q in (50, 90, 95, 99):
+        stats[f"p{q}"] = round(_percentile(values, q), 1)
+    stats["max"] = round(values[-1], 1)
+    return stats
+
+class DevicePool:
+    """Drives several devices in parallel, one AndroidEmulator (and adb session) per serial"""
+    
+    def __init__(self, serials: Optional[List[str]] = None, max_workers: Optional[int] = None, **emulator_kwargs):
+        self.serials = serials if serials is not None else self.discover()
+        self.max_workers = max_workers or max(len(self.serials), 1)
+        self.emulators = {serial: AndroidEmulator(device_id=serial, **emulator_kwargs) for serial in self.serials}
+    
+    @staticmethod
+    def discover() -> List[str]:
+        """Serials of all devices the adb server reports as online"""
+        return [serial for serial, state in AdbTransport("").devices() if state == "device"]
+    
+    def _execute(self, work: Dict[str, List[Callable[[AndroidEmulator], Any]]]) -> PoolResult:
+        result = PoolResult(success=False, timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            devices=list(self.serials))
+        if not self.serials:
+            result.errors.append("No online devices")
+            return result
+        
+        def run_device(serial: str) -> DeviceRunResult:
+            device_result = DeviceRunResult(serial=serial)
+            start = time.monotonic()
+            for job in work.get(serial, []):
+                try:
+                    outcome = job(self.emulators[serial])
+                except Exception as e:
+                    device_result.errors.append(str(e))
+                    continue
+                device_result.results.append(outcome)
+                if outcome is not None and not getattr(outcome, "success", True):
+                    device_result.errors.extend(getattr(outcome, "errors", []))
+            device_result.elapsed_ms = (time.monotonic() - start) * 1000
+            device_result.success = not device_result.errors
+            return device_result
+        
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            result.device_results = list(executor.map(run_device, self.serials))
+        result.elapsed_ms = (time.monotonic() - start) * 1000
+        for device_result in result.device_results:
+            result.errors.extend(f"{device_result.serial}: {error}" for error in device_result.errors)
+        result.success = not result.errors
+        return result
+    
+    def run(self, scenario: Callable[[AndroidEmulator], Any]) -> PoolResult:
+        """Run the same scenario on every device concurrently"""
+        return self._execute({serial: [scenario] for serial in self.serials})
+    
+    def shard(self, items: List[Any], scenario: Callable[[AndroidEmulator, Any], Any]) -> PoolResult:
+        """Split items round-robin across devices; each device works through its share in order"""
+        work: Dict[str, List[Callable[[AndroidEmulator], Any]]] = {serial: [] for serial in self.serials}
+        for position, item in enumerate(items):
+            serial = self.serials[position % len(self.serials)]
+            work[serial].append(lambda emulator, item=item: scenario(emulator, item))
+        return self._execute(work)
+    
+    def load_test(self, prompts: List[str], count: Optional[int] = None, method: str = "auto",
+                  reply_timeout: float = 60.0, quiet_period: float = 1.0) -> LoadTestResult:
+        """Send `count` prompts (cycling through `prompts`) across the devices, waiting for each reply"""
+        count = len(prompts) if count is None else count
+        items = [prompts[position % len(prompts)] for position in range(count)] if prompts else []
+        run = self.shard(items, lambda emulator, prompt: emulator.send_message(
+            prompt, method=method, wait_reply=True, reply_timeout=reply_timeout, quiet_period=quiet_period))
+        result = LoadTestResult(success=False, timestamp=run.timestamp, errors=run.errors, prompts=len(items),
+                                elapsed_ms=round(run.elapsed_ms, 1))
+        first_token, complete, total = [], [], []
+        for device_result in run.device_results:
+            replies = [outcome for outcome in device_result.results if isinstance(outcome, MessageResult)]
+            done = [outcome.time_to_complete_ms for outcome in replies if outcome.time_to_complete_ms is not None]
+            first_token.extend(outcome.time_to_first_token_ms for outcome in replies
+                               if outcome.time_to_first_token_ms is not None)
+            complete.extend(done)
+            total.extend(outcome.timings.duration_ms for outcome in replies if outcome.timings is not None)
+            result.per_device[device_result.serial] = {
+                "sent": sum(outcome.message_sent for outcome in replies), "completed": len(done),
+                "p50_complete_ms": _latency_stats(done).get("p50", 0.0)}
+        result.completed = len(complete)
+        result.failed = result.prompts - result.completed
+        result.latency_ms = {"first_token": _latency_stats(first_token), "complete": _latency_stats(complete),
+                             "send_and_reply": _latency_stats(total)}
+        if run.elapsed_ms:
+            result.replies_per_minute = round(result.completed / (run.elapsed_ms / 60000), 2)
+        result.success = bool(items) and not result.errors
+        return result
+    
+    def close(self):
+        for emulator in self.emulators.values():
+            emulator.transport.close()
+
+def _build_action(args) -> Callable[[AndroidEmulator], BaseResult]:
+    """Validate CLI arguments and return a callable that runs the action on one emulator"""
+    if args.action == "screenshot":
+        return lambda emulator: emulator.screenshot(tree_only=args.tree_only)
+    if args.action == "tap":
+        if args.x is None or args.y is None:
+            raise ValueError("--x and --y are required for tap action")
+        return lambda emulator: emulator.tap(args.x, args.y)
+    if args.action == "ui-state":
+        return lambda emulator: emulator.get_ui_state()
+    if args.action == "wait-idle":
+        return lambda emulator: emulator.wait_until_idle(timeout=args.timeout)
+    if args.action == "batch":
+        if not args.actions:
+            raise ValueError("--actions is required for batch action")
+        try:
+            actions = [Action.from_spec(spec) for spec in json.loads(args.actions)]
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"invalid --actions: {e}")
+        return lambda emulator: emulator.batch(actions, expect=args.expect, timeout=args.timeout)
+    if args.action == "scroll-bench":
+        return lambda emulator: emulator.scroll_benchmark(args.text or "scrollable", swipes=args.swipes,
+                                                          duration_ms=args.swipe_ms, distance=args.distance,
+                                                          direction=args.direction)
+    if not args.text:
+        raise ValueError(f"--text is required for {args.action} action")
+    if args.action == "tap-element":
+        return lambda emulator: emulator.tap_element(args.text)
+    if args.action == "input-text":
+        return lambda emulator: emulator.input_text(args.text, method=args.input_method)
+    if args.action == "send-message":
+        return lambda emulator: emulator.send_message(args.text, method=args.input_method, wait_reply=args.wait_reply,
+                                                      reply_timeout=args.reply_timeout)
+    return lambda emulator: emulator.wait_for(args.text, timeout=args.timeout)
+
+def build_parser(parser_class=argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Command line shared by the CLI and the daemon"""
+    parser = parser_class(description="Android Emulator Interface")
     parser.add_argument("action", choices=[
-        "screenshot", "tap", "tap-element", "input-text", "send-message", "ui-state"
+        "screenshot", "tap", "tap-element", "input-text", "send-message", "ui-state", "wait-for", "wait-idle", "batch",
+        "load-test", "scroll-bench"
     ], help="Action to perform")
     parser.add_argument("--x", type=int, help="X coordinate for tap")
     parser.add_argument("--y", type=int, help="Y coordinate for tap")
     parser.add_argument("--text", help="Text to input or element to find")
     parser.add_argument("--device", default="emulator-5554", help="Device ID")
+    parser.add_argument("--package", default=DEFAULT_APP_PACKAGE, help="App package used for idle detection")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Timeout in seconds for wait actions")
+    parser.add_argument("--actions", help='JSON list of batch actions, e.g. \'[["tap", 500, 1000], ["text", "hi"], ["key", "BACK"]]\'')
+    parser.add_argument("--expect", help="Selector that must match after a batch")
+    parser.add_argument("--input-method", choices=["auto", "ime", "input"], default="auto",
+                        help="Text channel: ADB keyboard IME broadcast when active (auto), always (ime), or `input text`")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--compact", action="store_true",
+                        help="Compact JSON: elements once with stable ids, categories as id lists, UI tree after actions")
+    parser.add_argument("--delta", action="store_true",
+                        help="Compact JSON with only the elements changed since this device's previous --delta call")
+    parser.add_argument("--no-save", action="store_true", help="Keep captures in memory instead of writing them to logs/")
+    parser.add_argument("--tree-only", action="store_true", help="Capture only the UI hierarchy, skipping the PNG")
     
-    args = parser.parse_args()
+    parser.add_argument("--devices", help="Run on several devices in parallel: 'all' or comma-separated serials")
+    parser.add_argument("--messages-file",
+                        help="send-message/load-test: file with one message per line, sharded across devices")
+    parser.add_argument("--wait-reply", action="store_true",
+                        help="send-message: wait for the reply and report time to first token and to completion")
+    parser.add_argument("--reply-timeout", type=float, default=60.0, help="Seconds to wait for each reply")
+    parser.add_argument("--count", type=int, help="load-test: number of prompts to send, cycling through the file")
+    parser.add_argument("--swipes", type=int, default=10, help="scroll-bench: number of swipes (--text selects the list)")
+    parser.add_argument("--swipe-ms", type=int, default=200, help="scroll-bench: duration of each swipe; lower is faster")
+    parser.add_argument("--distance", type=float, default=0.6, help="scroll-bench: swipe length as a fraction of the list height")
+    parser.add_argument("--direction", choices=["up", "down", "both"], default="up",
+                        help="scroll-bench: finger direction; up scrolls towards the end of the list")
+    parser.add_argument("--profile", help="Write a Chrome/Perfetto trace of the run to this file and print per-phase p50/p95")
+    return parser
+
+def target_serials(args) -> List[str]:
+    """Devices a parsed command line runs on"""
+    if args.devices == "all":
+        return DevicePool.discover()
+    if args.devices:
+        return args.devices.split(",")
+    return [args.device]
+
+def run_cli(args, emulator_for: Optional[Callable[[str], AndroidEmulator]] = None,
+            out=None, err=None, persist_delta: bool = True) -> int:
+    """Run a parsed command line and print its output; `emulator_for` supplies long-lived emulators"""
+    out = out or sys.stdout
+    err = err or sys.stderr
+    if args.messages_file and args.action not in ("send-message", "load-test"):
+        print("Error: --messages-file is only supported for send-message and load-test actions", file=out)
+        return 1
+    if args.action == "load-test" and not args.messages_file:
+        print("Error: --messages-file is required for load-test action", file=out)
+        return 1
+    pooled = bool(args.devices or args.messages_file)
+    if pooled and args.delta:
+        print("Error: --delta needs a single device session; use --compact with --devices or --messages-file",
+              file=out)
+        return 1
+    try:
+        run = None if args.messages_file else _build_action(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=out)
+        return 1
     
-    emulator = AndroidEmulator(device_id=args.device)
-    result = None
+    tracer = Tracer()
     
-    if args.action == "screenshot":
-        result = emulator.screenshot()
-    elif args.action == "tap":
-        if args.x is None or args.y is None:
-            print("Error: --x and --y are required for tap action")
-            return 1
-        result = emulator.tap(args.x, args.y)
-    elif args.action == "tap-element":
-        if not args.text:
-            print("Error: --text is required for tap-element action")
-            return 1
-        result = emulator.tap_element(args.text)
-    elif args.action == "input-text":
-        if not args.text:
-            print("Error: --text is required for input-text action")
-            return 1
-        result = emulator.input_text(args.text)
-    elif args.action == "send-message":
-        if not args.text:
-            print("Error: --text is required for send-message action")
-            return 1
-        result = emulator.send_message(args.text)
-    elif args.action == "ui-state":
-        result = emulator.get_ui_state()
+    def prepare(serial: str) -> AndroidEmulator:
+        emulator = emulator_for(serial)
+        emulator.save_captures = not args.no_save
+        emulator.package = args.package
+        emulator.tracer = tracer
+        return emulator
+    
+    if pooled:
+        pool = DevicePool(target_serials(args), save_captures=not args.no_save, package=args.package, tracer=tracer)
+        if emulator_for is not None:
+            pool.emulators = {serial: prepare(serial) for serial in pool.serials}
+        if args.messages_file:
+            with open(args.messages_file) as f:
+                messages = [line.rstrip("\n") for line in f if line.strip()]
+            if args.action == "load-test":
+                result = pool.load_test(messages, count=args.count, method=args.input_method,
+                                        reply_timeout=args.reply_timeout)
+            else:
+                result = pool.shard(messages, lambda emulator, message: emulator.send_message(
+                    message, method=args.input_method, wait_reply=args.wait_reply, reply_timeout=args.reply_timeout))
+        else:
+            result = pool.run(run)
+        if emulator_for is None:
+            pool.close()
+    else:
+        if emulator_for is not None:
+            emulator = prepare(args.device)
+        else:
+            emulator = AndroidEmulator(device_id=args.device, save_captures=not args.no_save, package=args.package,
+                                       tracer=tracer)
+        session_path = os.path.join(emulator.logs_dir, ".compact", f"{args.device}.json")
+        if args.delta and persist_delta and os.path.exists(session_path):
+            with open(session_path) as f:
+                emulator.encoder = CompactEncoder(json.load(f))
+        result = run(emulator)
+    
+    if args.profile:
+        tracer.write_chrome_trace(args.profile)
+        print(f"Profile written to {args.profile}", file=err)
+        for name, stats in sorted(tracer.phase_stats().items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"  {name:<16} n={stats['count']:<5} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                  f"total={stats['total_ms']:.0f}ms", file=err)
     
     if result:
-        if args.json:
+        if args.compact or args.delta:
+            if pooled:
+                print(json.dumps(CompactEncoder().encode(result), separators=(",", ":"), ensure_ascii=False), file=out)
+            else:
+                print(json.dumps(emulator.compact(result, delta=args.delta), separators=(",", ":"), ensure_ascii=False),
+                      file=out)
+                if args.delta and persist_delta:
+                    os.makedirs(os.path.dirname(session_path), exist_ok=True)
+                    with open(session_path, "w") as f:
+                        json.dump(emulator.encoder.state(), f, separators=(",", ":"))
+        elif args.json:
             # Convert dataclass to dict for JSON serialization
             import dataclasses
             result_dict = dataclasses.asdict(result)
-            print(json.dumps(result_dict, indent=2))
+            print(json.dumps(result_dict, indent=2), file=out)
         else:
-            print(f"Success: {result.success}")
+            print(f"Success: {result.success}", file=out)
             if result.errors:
-                print(f"Errors: {result.errors}")
+                print(f"Errors: {result.errors}", file=out)
             if hasattr(result, 'current_screen'):
-                print(f"Screen: {result.current_screen}")
+                print(f"Screen: {result.current_screen}", file=out)
             if hasattr(result, 'available_actions'):
-                print(f"Available actions: {result.available_actions}")
+                print(f"Available actions: {result.available_actions}", file=out)
+            if isinstance(result, MessageResult) and result.time_to_first_token_ms is not None:
+                print(f"Time to first token: {result.time_to_first_token_ms:.0f}ms, "
+                      f"to complete: {result.time_to_complete_ms or 0:.0f}ms", file=out)
+            if isinstance(result, LoadTestResult):
+                print(f"Prompts: {result.prompts} completed={result.completed} failed={result.failed} "
+                      f"elapsed={result.elapsed_ms / 1000:.1f}s replies/min={result.replies_per_minute}", file=out)
+                for name, stats in result.latency_ms.items():
+                    print(f"  {name:<15} " + " ".join(f"{key}={value}" for key, value in stats.items()), file=out)
+            if isinstance(result, JankResult) and result.frames:
+                print(f"Frames: {result.frames} janky={result.janky_frames} ({result.janky_ratio:.1%}) "
+                      f"frozen={result.frozen_frames} deadline={result.deadline_ms}ms", file=out)
+                for name in ("frame_time_ms", "ui_thread_ms", "render_thread_ms"):
+                    print(f"  {name:<17} " + " ".join(f"{key}={value}" for key, value in getattr(result, name).items()),
+                          file=out)
+                print("  histogram_ms      " + " ".join(f"{key}:{value}" for key, value in result.histogram_ms.items()),
+                      file=out)
+            if isinstance(result, PoolResult):
+                for device_result in result.device_results:
+                    print(f"  {device_result.serial}: success={device_result.success} "
+                          f"runs={len(device_result.results)} elapsed={device_result.elapsed_ms:.0f}ms", file=out)
     
     return 0 if result and result.success else 1
 
+def main():
+    """CLI interface for AndroidEmulator"""
+    return run_cli(build_parser().parse_args())
+
 if __name__ == "__main__":
     exit(main())
\ No newline at end of file
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+AsyncAndroidEmulator
+asyncio-native counterpart of AndroidEmulator for embedding in async agent loops.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from android_emulator import (
+    ADB_KEYBOARD_IME,
+    AdbError,
+    AndroidEmulator,
+    DEFAULT_APP_PACKAGE,
+    InteractionResult,
+    MessageResult,
+    ScreenCapture,
+    ScreenshotResult,
+    UIStateResult,
+    UITreeParser,
+    WaitResult,
+    decode_raw_frame,
+    diff_trees,
+)
+
+
+class AsyncAdbTransport:
+    """asyncio version of AdbTransport: smart-socket protocol over asyncio streams"""
+
+    def __init__(self, serial: str, host: str = "127.0.0.1", port: Optional[int] = None):
+        self.serial = serial
+        self.host = host
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+        self._shell: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._shell_buffer = b""
+        self._markers = itertools.count()
+        self._lock = asyncio.Lock()
+        self.round_trips = 0
+
+    async def _request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: str):
+        encoded = payload.encode("utf-8")
+        writer.write(b"%04x" % len(encoded) + encoded)
+        await writer.drain()
+        try:
+            status = await reader.readexactly(4)
+            if status == b"OKAY":
+                return
+            if status == b"FAIL":
+                length = int(await reader.readexactly(4), 16)
+                raise AdbError((await reader.readexactly(length)).decode("utf-8", "replace"))
+        except asyncio.IncompleteReadError:
+            raise AdbError("adb server closed the connection")
+        raise AdbError(f"Unexpected adb status {status!r}")
+
+    async def _open_service(self, service: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            raise AdbError(f"adb server not reachable on {self.host}:{self.port}: {e}")
+        try:
+            await self._request(reader, writer, f"host:transport:{self.serial}")
+            await self._request(reader, writer, service)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def devices(self) -> List[Tuple[str, str]]:
+        """List (serial, state) pairs known to the adb server"""
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            raise AdbError(f"adb server not reachable on {self.host}:{self.port}: {e}")
+        try:
+            await self._request(reader, writer, "host:devices")
+            length = int(await reader.readexactly(4), 16)
+            payload = (await reader.readexactly(length)).decode("utf-8", "replace")
+        finally:
+            writer.close()
+        return [tuple(line.split("\t", 1)) for line in payload.splitlines() if "\t" in line]
+
+    async def exec_stream(self, command: str, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+        """Run a command and yield its raw stdout as it arrives; usable for log tails"""
+        self.round_trips += 1
+        reader, writer = await self._open_service(f"exec:{command}")
+        try:
+            while True:
+                chunk = await reader.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            writer.close()
+
+    async def exec_out(self, command: str) -> bytes:
+        """Run a command and return its raw stdout bytes"""
+        return b"".join([chunk async for chunk in self.exec_stream(command)])
+
+    async def shell(self, command: str) -> Tuple[int, str]:
+        """Run a command in the persistent shell session and return (exit code, output)"""
+        self.round_trips += 1
+        async with self._lock:
+            try:
+                try:
+                    marker = await self._send_shell(command)
+                except (ConnectionError, AdbError):
+                    # Nothing reached the device yet, so resending cannot run the command twice
+                    await self._close_shell()
+                    marker = await self._send_shell(command)
+                return await self._read_shell(marker)
+            except BaseException:
+                # A cancelled, timed-out or broken read leaves unread output behind
+                await self._close_shell()
+                raise
+
+    async def _send_shell(self, command: str) -> bytes:
+        if self._shell is not None and (self._shell[0].at_eof() or self._shell[1].is_closing()):
+            await self._close_shell()
+        if self._shell is None:
+            self._shell = await self._open_service("exec:sh")
+            self._shell_buffer = b""
+        writer = self._shell[1]
+        marker = f"__cue_done_{next(self._markers)}__".encode()
+        writer.write(f"({command}) 2>&1; echo \"{marker.decode()}$?\"\n".encode("utf-8"))
+        await writer.drain()
+        return marker
+
+    async def _read_shell(self, marker: bytes) -> Tuple[int, str]:
+        reader = self._shell[0]
+        while True:
+            index = self._shell_buffer.find(marker)
+            if index >= 0:
+                end = self._shell_buffer.find(b"\n", index)
+                if end >= 0:
+                    output = self._shell_buffer[:index]
+                    code = int(self._shell_buffer[index + len(marker):end] or b"1")
+                    self._shell_buffer = self._shell_buffer[end + 1:]
+                    return code, output.decode("utf-8", "replace")
+            chunk = await reader.read(65536)
+            if not chunk:
+                raise AdbError("adb shell session closed")
+            self._shell_buffer += chunk
+
+    async def _close_shell(self):
+        if self._shell is not None:
+            self._shell[1].close()
+        self._shell = None
+        self._shell_buffer = b""
+
+    async def close(self):
+        """Close the persistent shell session"""
+        await self._close_shell()
+
+
+class AsyncAndroidEmulator:
+    """asyncio-native emulator client mirroring AndroidEmulator's API.
+
+    Screencap and hierarchy dump run concurrently, every device operation has
+    a timeout, and cancelling a task closes the underlying adb streams. Parsing,
+    selectors and screen analysis are shared with AndroidEmulator, whose own
+    transport is never used here.
+    """
+
+    def __init__(self, device_id: str = "emulator-5554", project_root: str = None, save_captures: bool = True,
+                 package: str = DEFAULT_APP_PACKAGE, timeout: float = 30.0):
+        self.device_id = device_id
+        self.timeout = timeout
+        self.transport = AsyncAdbTransport(device_id)
+        self.analyzer = AndroidEmulator(device_id=device_id, project_root=project_root,
+                                        save_captures=save_captures, package=package)
+        self.last_capture: Optional[ScreenCapture] = None
+        self.generation = 0
+
+    async def _with_timeout(self, awaitable, timeout: Optional[float] = None):
+        return await asyncio.wait_for(awaitable, timeout if timeout is not None else self.timeout)
+
+    async def _adb_shell(self, command: str, timeout: Optional[float] = None) -> Tuple[int, str]:
+        return await self._with_timeout(self.transport.shell(command), timeout)
+
+    async def _adb_input(self, args: str) -> Tuple[int, str]:
+        try:
+            return await self._adb_shell(f"input {args}")
+        finally:
+            self.invalidate()
+
+    def invalidate(self):
+        """Mark the cached snapshot stale; input actions call this automatically"""
+        self.generation += 1
+
+    async def _capture_frame(self) -> bytes:
+        frame = await self.transport.exec_out("screencap")
+        decode_raw_frame(frame)
+        return frame
+
+    async def _capture_ui(self):
+        parser = UITreeParser()
+        received: List[bytes] = []
+        async for chunk in self.transport.exec_stream("uiautomator dump /dev/tty"):
+            received.append(chunk)
+            if parser.feed(chunk):
+                break
+        return AndroidEmulator._ui_xml_from_output(b"".join(received)), parser.close()
+
+    async def snapshot(self, tree_only: bool = False, timeout: Optional[float] = None) -> ScreenCapture:
+        """Return the current snapshot, capturing screen and hierarchy concurrently when stale"""
+        cached = self.last_capture
+        if cached is not None and cached.generation == self.generation:
+            if cached.frame is None and not tree_only:
+                cached.frame = await self._with_timeout(self._capture_frame(), timeout)
+            return cached
+        generation = self.generation
+        if tree_only:
+            frame, (ui_xml, tree) = None, await self._with_timeout(self._capture_ui(), timeout)
+        else:
+            frame, (ui_xml, tree) = await self._with_timeout(
+                asyncio.gather(self._capture_frame(), self._capture_ui()), timeout)
+        capture = ScreenCapture(frame=frame, ui_xml=ui_xml, captured_at=time.time(),
+                                generation=generation, tree=tree)
+        self.last_capture = capture
+        return capture
+
+    async def screenshot(self, save: Optional[bool] = None, tree_only: bool = False,
+                         timeout: Optional[float] = None) -> ScreenshotResult:
+        """Take screenshot and analyze UI state"""
+        result = ScreenshotResult(success=False, timestamp=self.analyzer._get_timestamp())
+        try:
+            try:
+                capture = await self.snapshot(tree_only=tree_only, timeout=timeout)
+            except asyncio.TimeoutError:
+                result.errors.append("Capture failed: timed out")
+                return result
+            except Exception as e:
+                result.errors.append(f"Capture failed: {e}")
+                return result
+            if save if save is not None else self.analyzer.save_captures:
+                result.screenshot_path = await asyncio.to_thread(self.analyzer._save_capture, capture)
+                result.frame_id = capture.frame_id
+            self.analyzer._analyze_capture(result, capture)
+            result.success = True
+        except Exception as e:
+            result.errors.append(f"Screenshot operation failed: {str(e)}")
+        return result
+
+    async def wait_until_idle(self, timeout: float = 5.0, quiet_period: float = 0.3,
+                              initial_interval: float = 0.05, max_interval: float = 0.5) -> WaitResult:
+        """Wait until the focused window is stable and the app stops rendering frames"""
+        result = WaitResult(success=False, timestamp=self.analyzer._get_timestamp(), condition="idle")
+        start = time.monotonic()
+        interval = initial_interval
+        last_signature = None
+        stable_since = start
+        probe = (
+            "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'; "
+            f"dumpsys gfxinfo {self.analyzer.package} | grep 'Total frames rendered'"
+        )
+        try:
+            while True:
+                _, signature = await self._adb_shell(probe)
+                if "Total frames rendered" not in signature:
+                    self.invalidate()
+                    signature += (await self.snapshot(tree_only=True)).ui_xml
+                    result.tree_captures += 1
+                result.polls += 1
+                now = time.monotonic()
+                if signature != last_signature:
+                    last_signature = signature
+                    stable_since = now
+                elif now - stable_since >= quiet_period:
+                    result.satisfied = True
+                    break
+                if now - start >= timeout:
+                    result.warnings.append(f"UI did not settle within {timeout}s")
+                    break
+                await asyncio.sleep(min(interval, max(timeout - (now - start), 0)))
+                interval = min(interval * 1.5, max_interval)
+            result.success = True
+        except asyncio.TimeoutError:
+            result.errors.append("Wait until idle failed: probe timed out")
+        except Exception as e:
+            result.errors.append(f"Wait until idle failed: {str(e)}")
+        result.elapsed_ms = (time.monotonic() - start) * 1000
+        return result
+
+    async def tap(self, x: int, y: int) -> InteractionResult:
+        """Tap at specific coordinates"""
+        result = InteractionResult(success=False, timestamp=self.analyzer._get_timestamp(),
+                                   action_performed=f"tap({x}, {y})")
+        try:
+            initial_screenshot = await self.screenshot(tree_only=True)
+            if not initial_screenshot.success:
+                result.errors.extend(initial_screenshot.errors)
+                return result
+            initial_tree = self.last_capture.tree
+
+            code, output = await self._adb_input(f"tap {x} {y}")
+            if code != 0:
+                result.errors.append(f"Tap failed: {output.strip()}")
+                return result
+
+            result.settle_time_ms = (await self.wait_until_idle()).elapsed_ms
+            new_screenshot = await self.screenshot(tree_only=True)
+            if new_screenshot.success:
+                result.change = diff_trees(initial_tree, self.last_capture.tree)
+                result.ui_state_changed = (result.change.changed
+                                           or initial_screenshot.current_screen != new_screenshot.current_screen)
+            result.new_screen_state = new_screenshot.current_screen
+
+            tapped = initial_tree.spatial.element_at(x, y, clickable=True)
+            if tapped is not None:
+                result.target_element = initial_tree.element(tapped)
+            result.follow_up_suggestions = new_screenshot.available_actions
+            result.success = new_screenshot.success
+            result.errors.extend(new_screenshot.errors)
+        except asyncio.TimeoutError:
+            result.errors.append("Tap operation failed: timed out")
+        except Exception as e:
+            result.errors.append(f"Tap operation failed: {str(e)}")
+        return result
+
+    async def tap_element(self, selector: str) -> InteractionResult:
+        """Tap element by text, content description or Selector expression"""
+        result = InteractionResult(success=False, timestamp=self.analyzer._get_timestamp(),
+                                   action_performed=f"tap_element('{selector}')")
+        try:
+            capture = await self.snapshot(tree_only=True)
+            target_element = self.analyzer._resolve_target(capture.tree, selector)
+            if not target_element:
+                result.errors.append(f"Element '{selector}' not found or not clickable")
+                return result
+
+            tap_result = await self.tap(target_element.x, target_element.y)
+            result.success = tap_result.success
+            result.errors.extend(tap_result.errors)
+            result.target_element = target_element
+            result.ui_state_changed = tap_result.ui_state_changed
+            result.new_screen_state = tap_result.new_screen_state
+            result.follow_up_suggestions = tap_result.follow_up_suggestions
+            result.settle_time_ms = tap_result.settle_time_ms
+            result.change = tap_result.change
+        except asyncio.TimeoutError:
+            result.errors.append("Tap element operation failed: timed out")
+        except Exception as e:
+            result.errors.append(f"Tap element operation failed: {str(e)}")
+        return result
+
+    async def input_text(self, text: str, method: str = "auto") -> InteractionResult:
+        """Input text into the focused field, focusing the first text field if none is"""
+        result = InteractionResult(success=False, timestamp=self.analyzer._get_timestamp(),
+                                   action_performed=f"input_text('{text}')")
+        try:
+            current = await self.screenshot(tree_only=True)
+            if not current.success:
+                result.errors.extend(current.errors)
+                return result
+            initial_tree = self.last_capture.tree
+            commands = []
+            if current.input_fields and not any(field.focused for field in current.input_fields):
+                commands.append(f"input tap {current.input_fields[0].x} {current.input_fields[0].y}")
+
+            if method == "auto" and self.analyzer._ime_active is None:
+                code, output = await self._adb_shell("settings get secure default_input_method")
+                self.analyzer._ime_active = code == 0 and output.strip() == ADB_KEYBOARD_IME
+            result.input_method, text_commands = self.analyzer._text_commands(text, method)
+            if result.input_method == "input" and not text.isascii():
+                result.warnings.append("Non-ASCII text needs the ADB keyboard IME; `input text` may drop it")
+            commands.extend(text_commands)
+            start = time.monotonic()
+            try:
+                code, output = await self._adb_shell(" && ".join(commands) or "true")
+            finally:
+                self.invalidate()
+            elapsed = time.monotonic() - start
+            if code != 0:
+                result.errors.append(f"Text input failed: {output.strip()}")
+                return result
+            result.chars_per_second = round(len(text) / elapsed, 1) if elapsed > 0 else 0.0
+
+            result.settle_time_ms = (await self.wait_until_idle()).elapsed_ms
+            new_screenshot = await self.screenshot(tree_only=True)
+            if not new_screenshot.success:
+                result.errors.extend(new_screenshot.errors)
+                return result
+            result.change = diff_trees(initial_tree, self.last_capture.tree)
+            result.ui_state_changed = result.change.changed
+            result.new_screen_state = new_screenshot.current_screen
+            result.follow_up_suggestions = new_screenshot.available_actions
+            result.success = True
+        except asyncio.TimeoutError:
+            result.errors.append("Text input operation failed: timed out")
+        except Exception as e:
+            result.errors.append(f"Text input operation failed: {str(e)}")
+        return result
+
+    async def send_message(self, message: str, method: str = "auto") -> MessageResult:
+        """Send a message in chat interface"""
+        result = MessageResult(success=False, timestamp=self.analyzer._get_timestamp(), message_content=message)
+        try:
+            input_result = await self.input_text(message, method=method)
+            result.warnings.extend(input_result.warnings)
+            if not input_result.success:
+                result.errors.extend(input_result.errors)
+                return result
+            result.chars_per_second = input_result.chars_per_second
+
+            send_result = await self.tap_element("Send message")
+            if not send_result.success:
+                result.errors.extend(send_result.errors)
+                return result
+
+            result.settle_time_ms = input_result.settle_time_ms + send_result.settle_time_ms
+            result.message_sent = True
+            result.chat_state = "message_sent"
+            result.success = True
+        except Exception as e:
+            result.errors.append(f"Send message operation failed: {str(e)}")
+        return result
+
+    async def get_ui_state(self) -> UIStateResult:
+        """Get detailed UI state information"""
+        result = UIStateResult(success=False, timestamp=self.analyzer._get_timestamp())
+        screenshot_result = await self.screenshot(tree_only=True)
+        if not screenshot_result.success:
+            result.errors.extend(screenshot_result.errors)
+            return result
+        self.analyzer._summarize_ui_state(result, screenshot_result)
+        result.success = True
+        return result
+
+    async def tail(self, command: str = "logcat -v threadtime") -> AsyncIterator[str]:
+        """Stream lines of a long-running device command such as logcat"""
+        pending = b""
+        async for chunk in self.transport.exec_stream(command):
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", "replace").rstrip("\r")
+        if pending:
+            yield pending.decode("utf-8", "replace")
+
+    async def close(self):
+        await self.transport.close()
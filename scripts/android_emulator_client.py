@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+AndroidEmulator Client
+Thin client for android_emulator_daemon.py: forwards an android_emulator.py command
+line to the warm daemon, starting the daemon on first use. Only the standard
+library's socket and json are imported, so a call costs milliseconds.
+"""
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.environ.get("ANDROID_EMULATOR_SOCKET") or os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or "/tmp", f"android-emulator-{os.getuid()}.sock")
+
+
+class DaemonError(Exception):
+    """JSON-RPC error returned by the daemon"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class DaemonClient:
+    """Newline-delimited JSON-RPC 2.0 over the daemon's Unix socket"""
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: float = None):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._next_id = 0
+
+    def connect(self) -> "DaemonClient":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        return self
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = None
+
+    def stream(self, method: str, **params):
+        """Send a request; yield each notification's params, then return the result"""
+        if self._sock is None:
+            self.connect()
+        self._next_id += 1
+        request_id = self._next_id
+        self._sock.sendall(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method,
+                                       "params": params}).encode() + b"\n")
+        for line in self._reader:
+            message = json.loads(line)
+            if "id" not in message:
+                yield message.get("params")
+                continue
+            if message["id"] != request_id:
+                continue
+            if "error" in message:
+                raise DaemonError(message["error"]["code"], message["error"]["message"])
+            return message.get("result")
+        raise ConnectionError("daemon closed the connection")
+
+    def request(self, method: str, **params):
+        """Send a request and return its result, ignoring notifications"""
+        stream = self.stream(method, **params)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as done:
+                return done.value
+
+
+def start_daemon(path: str = DEFAULT_SOCKET, wait: float = 10.0) -> DaemonClient:
+    """Launch the daemon in the background and connect once its socket accepts"""
+    import subprocess
+    import time
+    daemon = os.path.join(os.path.dirname(os.path.abspath(__file__)), "android_emulator_daemon.py")
+    subprocess.Popen([sys.executable, daemon, "--socket", path], stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return DaemonClient(path).connect()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main(argv=None) -> int:
+    """Forward android_emulator.py arguments to the daemon; `--status`, `--stop` and `watch` talk to it directly"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] in (["--status"], ["--stop"]):
+        try:
+            client = DaemonClient().connect()
+        except OSError:
+            print("Daemon not running")
+            return 1
+        print(json.dumps(client.request("ping" if argv[0] == "--status" else "shutdown"), indent=2))
+        return 0
+    try:
+        client = DaemonClient().connect()
+    except OSError:
+        try:
+            client = start_daemon()
+        except OSError:
+            # No daemon available: run in-process
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            import android_emulator
+            sys.argv = [android_emulator.__file__] + argv
+            return android_emulator.main()
+    if argv[:1] == ["watch"]:
+        options = {"device": "emulator-5554", "timeout": 30.0, "interval": 0.5}
+        for name, value in zip(argv[1::2], argv[2::2]):
+            key = name.lstrip("-")
+            options[key] = value if key == "device" else float(value)
+        stream = client.stream("watch", **options)
+        try:
+            while True:
+                print(json.dumps(next(stream), separators=(",", ":"), ensure_ascii=False), flush=True)
+        except StopIteration as done:
+            print(json.dumps(done.value, separators=(",", ":"), ensure_ascii=False))
+        except KeyboardInterrupt:
+            return 130
+        return 0
+    outcome = client.request("run", argv=argv, cwd=os.getcwd())
+    sys.stdout.write(outcome["stdout"])
+    sys.stderr.write(outcome["stderr"])
+    return outcome["exit_code"]
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+AndroidEmulator Daemon
+Keeps AndroidEmulator instances warm between calls (adb shell session, last snapshot,
+parsed indexes, classifier and compact-encoder state) and serves them as
+newline-delimited JSON-RPC 2.0 on a Unix socket. Use android_emulator_client.py
+to forward ordinary android_emulator.py command lines to it.
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from android_emulator import Action, AndroidEmulator, build_parser, run_cli, target_serials
+from android_emulator_client import DEFAULT_SOCKET
+
+# Emulator methods callable through `call`
+CALLABLE_ACTIONS = {"screenshot", "tap", "tap_element", "input_text", "send_message", "get_ui_state",
+                    "wait_for", "wait_until_idle", "batch", "scroll_benchmark"}
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    """Error reported to the client as a JSON-RPC error object"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class _ArgumentError(Exception):
+    pass
+
+
+class _Parser(argparse.ArgumentParser):
+    """build_parser() without exiting the daemon on bad arguments"""
+
+    def error(self, message):
+        raise _ArgumentError(f"{self.prog}: error: {message}")
+
+    def exit(self, status=0, message=None):
+        raise _ArgumentError(message or "")
+
+
+class EmulatorDaemon:
+    """Long-lived AndroidEmulators, one per serial, each used by one request at a time.
+
+    The last snapshot is reused across requests only while the device's idle
+    signature (focused window and frame count) is unchanged since the previous
+    request finished; otherwise it is invalidated before the next action.
+    """
+
+    def __init__(self, idle_timeout: float = 1800.0):
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.last_activity = time.monotonic()
+        self.active = 0
+        self.calls = 0
+        self.server: Optional[socketserver.BaseServer] = None
+        self._emulators: Dict[str, AndroidEmulator] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._signatures: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._parser = build_parser(_Parser)
+        self._parser.prog = "android_emulator.py"
+
+    def emulator(self, serial: str) -> AndroidEmulator:
+        with self._lock:
+            emulator = self._emulators.get(serial)
+            if emulator is None:
+                emulator = self._emulators[serial] = AndroidEmulator(device_id=serial)
+            return emulator
+
+    def _signature(self, emulator: AndroidEmulator) -> Optional[str]:
+        try:
+            return emulator._idle_signature()
+        except Exception:
+            return None
+
+    @contextlib.contextmanager
+    def using(self, serials: List[str]):
+        """Hold the given devices for one request, refreshing stale snapshots first"""
+        with self._lock:
+            locks = [self._locks.setdefault(serial, threading.Lock()) for serial in sorted(set(serials))]
+            self.active += 1
+            self.calls += 1
+        for lock in locks:
+            lock.acquire()
+        try:
+            for serial in serials:
+                emulator = self.emulator(serial)
+                signature = self._signature(emulator)
+                if signature is None or signature != self._signatures.get(serial):
+                    emulator.invalidate()
+            yield
+        finally:
+            for serial in serials:
+                signature = self._signature(self.emulator(serial))
+                if signature is None:
+                    self._signatures.pop(serial, None)
+                else:
+                    self._signatures[serial] = signature
+            for lock in reversed(locks):
+                lock.release()
+            with self._lock:
+                self.active -= 1
+                self.last_activity = time.monotonic()
+
+    def rpc_ping(self) -> Dict[str, Any]:
+        """Daemon status"""
+        return {"pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1), "calls": self.calls,
+                "devices": sorted(self._emulators), "active": self.active}
+
+    def rpc_run(self, argv: List[str], cwd: Optional[str] = None) -> Dict[str, Any]:
+        """Run an android_emulator.py command line and return its output and exit code"""
+        out, err = io.StringIO(), io.StringIO()
+        if "-h" in argv or "--help" in argv:
+            return {"stdout": self._parser.format_help(), "stderr": "", "exit_code": 0}
+        try:
+            args = self._parser.parse_args(argv)
+        except _ArgumentError as e:
+            return {"stdout": "", "stderr": f"{e}\n", "exit_code": 2}
+        for name in ("messages_file", "profile"):
+            value = getattr(args, name)
+            if value and cwd and not os.path.isabs(value):
+                setattr(args, name, os.path.join(cwd, value))
+        serials = target_serials(args)
+        if args.devices:
+            args.devices = ",".join(serials)
+        with self.using(serials):
+            try:
+                exit_code = run_cli(args, emulator_for=self.emulator, out=out, err=err, persist_delta=False)
+            except Exception as e:
+                print(f"Error: {e}", file=out)
+                exit_code = 1
+        return {"stdout": out.getvalue(), "stderr": err.getvalue(), "exit_code": exit_code}
+
+    def rpc_call(self, action: str, device: str = "emulator-5554", params: Optional[Dict[str, Any]] = None,
+                 compact: bool = True, delta: bool = False) -> Dict[str, Any]:
+        """Call one AndroidEmulator action with keyword params and return the encoded result"""
+        if action not in CALLABLE_ACTIONS:
+            raise RpcError(METHOD_NOT_FOUND, f"Unknown action: {action}")
+        params = dict(params or {})
+        if action == "batch":
+            params["actions"] = [Action.from_spec(spec) for spec in params.get("actions", [])]
+        with self.using([device]):
+            emulator = self.emulator(device)
+            try:
+                result = getattr(emulator, action)(**params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+            return emulator.compact(result, delta=delta) if compact else dataclasses.asdict(result)
+
+    def rpc_watch(self, notify: Callable[[Dict[str, Any]], None], device: str = "emulator-5554",
+                  timeout: float = 30.0, interval: float = 0.5) -> Dict[str, Any]:
+        """Stream a compact delta notification each time the UI tree changes, until `timeout`"""
+        updates = 0
+        deadline = time.monotonic() + timeout
+        with self.using([device]):
+            emulator = self.emulator(device)
+            root_hash = None
+            while True:
+                emulator.invalidate()
+                capture = emulator.snapshot(tree_only=True)
+                current = capture.tree.subtree_hash[0] if len(capture.tree) else 0
+                if current != root_hash:
+                    root_hash = current
+                    screen, actions = emulator.classifier.classify(capture.tree)
+                    encoder = emulator.encoder
+                    notify({"device": device, "current_screen": screen, "available_actions": actions,
+                            **encoder.snapshot(capture.tree, encoder.element_ids(capture.tree), delta=True)})
+                    updates += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(interval, remaining))
+        return {"device": device, "updates": updates}
+
+    def rpc_shutdown(self) -> Dict[str, Any]:
+        """Stop serving once in-flight requests finish"""
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return {"stopping": True}
+
+    def dispatch(self, message: Any, notify: Callable[[Dict[str, Any]], None]) -> Any:
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or not isinstance(message.get("method"), str):
+            raise RpcError(INVALID_REQUEST, "Invalid request")
+        handler = getattr(self, f"rpc_{message['method']}", None)
+        if handler is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+        params = message.get("params") or {}
+        if not isinstance(params, dict):
+            raise RpcError(INVALID_PARAMS, "params must be an object")
+        if handler == self.rpc_watch:
+            params = {**params, "notify": notify}
+        try:
+            return handler(**params)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e))
+
+    def watchdog(self):
+        """Shut the server down after `idle_timeout` seconds without requests"""
+        while True:
+            time.sleep(min(self.idle_timeout, 30.0))
+            with self._lock:
+                idle = self.active == 0 and time.monotonic() - self.last_activity > self.idle_timeout
+            if idle:
+                self.server.shutdown()
+                return
+
+    def close(self):
+        for emulator in self._emulators.values():
+            emulator.transport.close()
+
+
+class _RpcHandler(socketserver.StreamRequestHandler):
+    def _send(self, payload: Dict[str, Any]):
+        self.wfile.write(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        daemon: EmulatorDaemon = self.server.daemon
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self._send({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}})
+                continue
+            request_id = message.get("id") if isinstance(message, dict) else None
+
+            def notify(params):
+                self._send({"jsonrpc": "2.0", "method": "update", "params": params})
+
+            try:
+                result = daemon.dispatch(message, notify)
+            except RpcError as e:
+                response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+            except Exception as e:
+                response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": SERVER_ERROR, "message": str(e)}}
+            else:
+                response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+            if request_id is not None:
+                self._send(response)
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str = DEFAULT_SOCKET, idle_timeout: float = 1800.0):
+    """Serve until shut down over RPC, interrupted, or idle for `idle_timeout` seconds"""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise SystemExit(f"A daemon is already listening on {path}")
+        finally:
+            probe.close()
+    daemon = EmulatorDaemon(idle_timeout=idle_timeout)
+    previous_umask = os.umask(0o077)
+    try:
+        server = _Server(path, _RpcHandler)
+    finally:
+        os.umask(previous_umask)
+    server.daemon = daemon
+    daemon.server = server
+    if idle_timeout > 0:
+        threading.Thread(target=daemon.watchdog, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def main():
+    """Run the daemon in the foreground"""
+    parser = argparse.ArgumentParser(description="Warm AndroidEmulator daemon (JSON-RPC over a Unix socket)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Socket path (or set ANDROID_EMULATOR_SOCKET)")
+    parser.add_argument("--idle-timeout", type=float, default=1800.0,
+                        help="Exit after this many seconds without requests (0 to never exit)")
+    args = parser.parse_args()
+    serve(args.socket, args.idle_timeout)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
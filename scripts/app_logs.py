@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+App Log Ingestion
+Incrementally mirrors the app's FileLogger files from the device into logs/
+and keeps a compact index by level, tag and time for fast queries.
+"""
+
+import argparse
+import bisect
+import calendar
+import json
+import os
+import re
+import struct
+import time
+from array import array
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from android_emulator import DEFAULT_APP_PACKAGE, AdbTransport
+
+LEVELS = ("DEBUG", "INFO", "WARN", "ERROR")
+LOG_TAG_PREFIX = "[AppLog]"
+DEVICE_LOGS_DIR = "files/logs"
+_HEADER_RE = re.compile(rb"\[(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\.(\d{3})\] \[(DEBUG|INFO|WARN|ERROR)\] \[([^\]]*(?:\][^\]\s]*)*)\] ?")
+_ENTRY = struct.Struct("<qQIBI")
+
+
+@dataclass
+class LogRecord:
+    """One FileLogger record; `message` includes any stack trace lines"""
+    timestamp: float
+    time: str
+    level: str
+    tag: str
+    message: str
+    file: str
+    offset: int
+    length: int
+
+
+class LogParser:
+    """Streaming parser for `[yyyy-MM-dd HH:mm:ss.SSS] [LEVEL] [tag] message` records.
+
+    Feed it bytes as they arrive; a record is returned once the next record
+    header shows it is complete. Lines before the first header (the tail of
+    a record that started earlier) are skipped. `utc_offset` is the device's
+    offset in seconds, since FileLogger writes local time without a zone.
+    """
+
+    def __init__(self, file: str = "", offset: int = 0, utc_offset: float = 0.0):
+        self.file = file
+        self.utc_offset = utc_offset
+        self._position = offset
+        self._partial = b""
+        self._current: Optional[Tuple[re.Match, int, List[bytes]]] = None
+        self._seconds: Dict[bytes, float] = {}
+
+    def _epoch(self, match: re.Match) -> float:
+        key = match.group(0)[:20]
+        seconds = self._seconds.get(key)
+        if seconds is None:
+            year, month, day, hour, minute, second = (int(value) for value in match.groups()[:6])
+            seconds = calendar.timegm((year, month, day, hour, minute, second)) - self.utc_offset
+            if len(self._seconds) > 4096:
+                self._seconds.clear()
+            self._seconds[key] = seconds
+        return seconds + int(match.group(7)) / 1000
+
+    @property
+    def position(self) -> int:
+        """File offset just past the last complete line consumed"""
+        return self._position
+
+    def _record(self) -> Optional[LogRecord]:
+        if self._current is None:
+            return None
+        match, start, lines = self._current
+        raw = b"".join(lines)
+        return LogRecord(
+            timestamp=self._epoch(match),
+            time=match.group(0)[1:24].decode(),
+            level=match.group(8).decode(),
+            tag=match.group(9).decode("utf-8", "replace"),
+            message=raw[match.end():].rstrip(b"\n").decode("utf-8", "replace"),
+            file=self.file,
+            offset=start,
+            length=len(raw),
+        )
+
+    def feed(self, data: bytes) -> List[LogRecord]:
+        """Consume bytes and return the records they completed"""
+        records = []
+        data = self._partial + data
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            line = data[start:end + 1]
+            match = _HEADER_RE.match(line)
+            if match is not None:
+                record = self._record()
+                if record is not None:
+                    records.append(record)
+                self._current = (match, self._position, [line])
+            elif self._current is not None:
+                self._current[2].append(line)
+            self._position += len(line)
+            start = end + 1
+        self._partial = data[start:]
+        return records
+
+    def pending(self) -> Optional[LogRecord]:
+        """The last record seen, which later bytes could still extend"""
+        return self._record()
+
+    def close(self) -> List[LogRecord]:
+        record = self._record()
+        self._current = None
+        return [record] if record is not None else []
+
+
+class _Columns:
+    """Index entries of one log file as parallel arrays, in file order.
+
+    FileLogger writes from coroutines, so timestamps are only nearly sorted.
+    `running_max` is sorted, and no entry is more than `disorder` ms below it,
+    which is enough to bisect a time range exactly.
+    """
+
+    def __init__(self, data: bytes = b""):
+        self.timestamps = array("q")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.levels = array("B")
+        self.tags = array("I")
+        self.running_max = array("q")
+        self.disorder = 0
+        highest = None
+        for timestamp, offset, length, level, tag in _ENTRY.iter_unpack(data):
+            self.timestamps.append(timestamp)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.levels.append(level)
+            self.tags.append(tag)
+            highest = timestamp if highest is None or timestamp > highest else highest
+            self.running_max.append(highest)
+            self.disorder = max(self.disorder, highest - timestamp)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def span(self, since_ms: Optional[int], until_ms: Optional[int]) -> Tuple[int, int]:
+        """Index range that holds every entry between since_ms and until_ms"""
+        low = bisect.bisect_left(self.running_max, since_ms) if since_ms is not None else 0
+        high = bisect.bisect_right(self.running_max, until_ms + self.disorder) if until_ms is not None else len(self)
+        return low, high
+
+
+class AppLogs:
+    """Incremental mirror and index of the app's FileLogger files.
+
+    `sync()` lists the device log files, fetches only the bytes past each
+    file's saved offset (via `run-as ... tail -c`), appends them to the local
+    copy in logs/, and appends index entries for the new records. The last
+    record of each file stays open until a later record follows it, since a
+    stack trace may still be being written; the next sync re-parses it from
+    the local copy. Layout under logs/.index: `state.json` (offsets and clock
+    info), `tags.json` (tag table), and one `<log>.idx` of fixed-size entries
+    (timestamp, offset, length, level, tag) per log file.
+    """
+
+    def __init__(self, transport: Optional[AdbTransport] = None, package: str = DEFAULT_APP_PACKAGE,
+                 logs_dir: Optional[str] = None):
+        self.transport = transport
+        self.package = package
+        if logs_dir is None:
+            logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+        self.logs_dir = logs_dir
+        self.index_dir = os.path.join(logs_dir, ".index")
+        self.state = self._load_json("state.json", {"files": {}, "utc_offset": 0.0, "skew": 0.0})
+        self.tags: List[str] = self._load_json("tags.json", [])
+        self._tag_ids = {tag: tag_id for tag_id, tag in enumerate(self.tags)}
+        self._columns: Dict[str, Tuple[float, _Columns]] = {}
+
+    def _load_json(self, name: str, default):
+        try:
+            with open(os.path.join(self.index_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _save_json(self, name: str, value):
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, name)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(value, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _index_path(self, name: str) -> str:
+        return os.path.join(self.index_dir, f"{name}.idx")
+
+    def _run_as(self, command: str) -> str:
+        code, output = self.transport.shell(f"run-as {self.package} {command}")
+        if code != 0:
+            raise RuntimeError(f"run-as {self.package} {command} failed: {output.strip()}")
+        return output
+
+    def _device_clock(self):
+        """Device UTC offset and device-minus-host clock skew, for converting log times"""
+        before = time.time()
+        code, output = self.transport.shell("date '+%s.%N %z'")
+        after = time.time()
+        try:
+            epoch, zone = output.split()
+            seconds, _, fraction = epoch.partition(".")
+            sign = -1 if zone.startswith("-") else 1
+            self.state["utc_offset"] = sign * (int(zone[1:3]) * 3600 + int(zone[3:5]) * 60)
+            self.state["skew"] = int(seconds) + (float(f"0.{fraction}") if fraction.isdigit() else 0.0) \
+                - (before + after) / 2
+        except ValueError:
+            pass
+
+    def device_files(self) -> Dict[str, int]:
+        """Log file names on the device and their sizes"""
+        output = self._run_as(f"find {DEVICE_LOGS_DIR} -name '*.log' -exec stat -c '%s %n' {{}} +")
+        files = {}
+        for line in output.splitlines():
+            size, _, path = line.strip().partition(" ")
+            if size.isdigit():
+                files[os.path.basename(path)] = int(size)
+        return files
+
+    def _tag_id(self, tag: str) -> int:
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return tag_id
+
+    def _entry(self, record: LogRecord) -> bytes:
+        return _ENTRY.pack(round(record.timestamp * 1000), record.offset, record.length,
+                           LEVELS.index(record.level), self._tag_id(record.tag))
+
+    def sync(self) -> Dict[str, int]:
+        """Fetch new log bytes from the device and index them; returns new records per file"""
+        self._device_clock()
+        added = {}
+        tag_count = len(self.tags)
+        for name, size in sorted(self.device_files().items()):
+            added[name] = self._sync_file(name, size)
+        self._save_json("state.json", self.state)
+        if len(self.tags) != tag_count:
+            self._save_json("tags.json", self.tags)
+        return added
+
+    def _sync_file(self, name: str, size: int) -> int:
+        local_path = os.path.join(self.logs_dir, name)
+        state = self.state["files"].get(name)
+        local_size = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+        if state is None or size < state["mirrored"] or local_size != state["mirrored"]:
+            state = {"mirrored": 0, "committed": 0, "closed_entries": 0}
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(local_path, "wb"):
+                pass
+            with open(self._index_path(name), "wb"):
+                pass
+        self.state["files"][name] = state
+        if size > state["mirrored"]:
+            data = self.transport.exec_out(
+                f"run-as {self.package} tail -c +{state['mirrored'] + 1} {DEVICE_LOGS_DIR}/{name}")
+            with open(local_path, "ab") as f:
+                f.write(data)
+            state["mirrored"] += len(data)
+
+        with open(local_path, "rb") as f:
+            f.seek(state["committed"])
+            data = f.read(state["mirrored"] - state["committed"])
+        parser = LogParser(name, state["committed"], self.state["utc_offset"])
+        closed = parser.feed(data)
+        pending = parser.pending()
+
+        with open(self._index_path(name), "r+b" if os.path.exists(self._index_path(name)) else "wb") as f:
+            before = f.seek(0, os.SEEK_END) // _ENTRY.size
+            f.truncate(state["closed_entries"] * _ENTRY.size)
+            f.seek(0, os.SEEK_END)
+            f.write(b"".join(self._entry(record) for record in closed))
+            if pending is not None:
+                f.write(self._entry(pending))
+        state["closed_entries"] += len(closed)
+        state["committed"] = pending.offset if pending is not None else parser.position
+        self._columns.pop(name, None)
+        return state["closed_entries"] + (pending is not None) - before
+
+    def _load_columns(self, name: str) -> _Columns:
+        path = self._index_path(name)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+        cached = self._columns.get(name)
+        if cached is None or cached[0] != mtime:
+            data = b""
+            if mtime:
+                with open(path, "rb") as f:
+                    data = f.read()
+            cached = self._columns[name] = (mtime, _Columns(data))
+        return cached[1]
+
+    def _read(self, name: str, offset: int, length: int) -> LogRecord:
+        with open(os.path.join(self.logs_dir, name), "rb") as f:
+            f.seek(offset)
+            parser = LogParser(name, offset, self.state["utc_offset"])
+            parser.feed(f.read(length))
+        return parser.close()[0]
+
+    def _matching_tags(self, tag: str) -> set:
+        return {tag_id for tag_id, known in enumerate(self.tags)
+                if known == tag or (known.startswith(LOG_TAG_PREFIX) and known[len(LOG_TAG_PREFIX):] == tag)}
+
+    def _files(self, file: Optional[str]) -> List[str]:
+        """Indexed log names, or just `file` (a name or a path to a pulled log) when given"""
+        if file is None:
+            return sorted(self.state["files"])
+        name = os.path.basename(file)
+        return [name] if name in self.state["files"] else []
+
+    def query(self, level: Optional[str] = None, tag: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, contains: Optional[str] = None,
+              limit: Optional[int] = None, file: Optional[str] = None) -> List[LogRecord]:
+        """Records at or above `level`, from `tag` (with or without the [AppLog] prefix),
+        between device-clock epochs `since` and `until`, in `file` if given, oldest first"""
+        min_level = LEVELS.index(level.upper()) if level else 0
+        tag_ids = self._matching_tags(tag) if tag else None
+        if tag_ids is not None and not tag_ids:
+            return []
+        since_ms = round(since * 1000) if since is not None else None
+        until_ms = round(until * 1000) if until is not None else None
+        records: List[LogRecord] = []
+        for name in self._files(file):
+            columns = self._load_columns(name)
+            low, high = columns.span(since_ms, until_ms)
+            for i in range(low, high):
+                if columns.levels[i] < min_level or (tag_ids is not None and columns.tags[i] not in tag_ids):
+                    continue
+                timestamp = columns.timestamps[i]
+                if (since_ms is not None and timestamp < since_ms) or (until_ms is not None and timestamp > until_ms):
+                    continue
+                record = self._read(name, columns.offsets[i], columns.lengths[i])
+                if contains and contains not in record.message:
+                    continue
+                records.append(record)
+                if limit and len(records) >= limit:
+                    return records
+        return records
+
+    def count(self, level: Optional[str] = None, tag: Optional[str] = None, file: Optional[str] = None) -> int:
+        """Number of indexed records at or above `level` (and from `tag`, in `file`), without reading the logs"""
+        min_level = LEVELS.index(level.upper()) if level else 0
+        tag_ids = self._matching_tags(tag) if tag else None
+        total = 0
+        for name in self._files(file):
+            columns = self._load_columns(name)
+            if tag_ids is None:
+                total += sum(1 for value in columns.levels if value >= min_level)
+            else:
+                total += sum(1 for value, tag_id in zip(columns.levels, columns.tags)
+                             if value >= min_level and tag_id in tag_ids)
+        return total
+
+    def around(self, start: float, end: float, slack: float = 2.0, level: Optional[str] = None) -> List[LogRecord]:
+        """Records logged while a host-clock interval was running, plus `slack` seconds after it"""
+        skew = self.state["skew"]
+        return self.query(level=level, since=start + skew, until=end + skew + slack)
+
+    def correlate(self, trace_events: List[dict], wall_origin: float, slack: float = 2.0,
+                  level: Optional[str] = None) -> Dict[str, List[LogRecord]]:
+        """Group records by the emulator action (Tracer spans tagged with `action`) they overlap"""
+        windows: Dict[str, List[float]] = {}
+        for event in trace_events:
+            action_id = event.get("args", {}).get("action")
+            if not action_id:
+                continue
+            start = wall_origin + event["ts"] / 1e6
+            end = start + event["dur"] / 1e6
+            window = windows.setdefault(action_id, [start, end])
+            window[0], window[1] = min(window[0], start), max(window[1], end)
+        return {action_id: self.around(start, end, slack, level) for action_id, (start, end) in windows.items()}
+
+
+def _parse_since(value: str) -> float:
+    """'5m', '90s', '2h' ago, or an absolute epoch"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value and value[-1] in units:
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def main():
+    """CLI interface for app log ingestion"""
+    parser = argparse.ArgumentParser(description="Incremental FileLogger log ingestion and queries")
+    parser.add_argument("action", choices=["sync", "query", "count", "correlate"], help="Action to perform")
+    parser.add_argument("--device", default=os.environ.get("ANDROID_SERIAL", "emulator-5554"), help="Device ID")
+    parser.add_argument("--package", default=DEFAULT_APP_PACKAGE, help="App package to read logs from")
+    parser.add_argument("--level", help="Minimum level: DEBUG, INFO, WARN or ERROR")
+    parser.add_argument("--tag", help="Tag, with or without the [AppLog] prefix")
+    parser.add_argument("--since", help="Start: '5m', '2h' ago, or a device epoch")
+    parser.add_argument("--until", help="End: '1m' ago, or a device epoch")
+    parser.add_argument("--file", help="Only this log file (name or path, e.g. logs/cue-2024-01-31.log)")
+    parser.add_argument("--contains", help="Substring of the message")
+    parser.add_argument("--limit", type=int, help="Maximum records to return")
+    parser.add_argument("--trace", help="correlate: trace file written by android_emulator.py --profile")
+    parser.add_argument("--no-sync", action="store_true", help="Query the existing index without fetching")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    args = parser.parse_args()
+
+    logs = AppLogs(AdbTransport(args.device), package=args.package)
+    if args.action == "sync" or not args.no_sync:
+        try:
+            added = logs.sync()
+        except Exception as e:
+            print(f"Error: log sync failed: {e}")
+            return 1
+        if args.action == "sync":
+            print(json.dumps(added, indent=2) if args.json else
+                  "\n".join(f"{name}: {count} new records" for name, count in added.items()) or "No log files")
+            return 0
+
+    if args.action == "count":
+        total = logs.count(level=args.level, tag=args.tag, file=args.file)
+        print(json.dumps({"count": total}) if args.json else total)
+        return 0
+
+    if args.action == "correlate":
+        if not args.trace:
+            print("Error: --trace is required for correlate action")
+            return 1
+        with open(args.trace) as f:
+            trace = json.load(f)
+        grouped = logs.correlate(trace["traceEvents"], trace.get("otherData", {}).get("wall_origin", 0.0),
+                                 level=args.level)
+        if args.json:
+            print(json.dumps({action_id: [asdict(record) for record in records]
+                              for action_id, records in grouped.items()}, indent=2))
+        else:
+            for action_id, records in grouped.items():
+                print(f"{action_id}: {len(records)} records")
+                for record in records:
+                    print(f"  [{record.time}] [{record.level}] [{record.tag}] {record.message.splitlines()[0] if record.message else ''}")
+        return 0
+
+    records = logs.query(level=args.level, tag=args.tag,
+                         since=_parse_since(args.since) + logs.state["skew"] if args.since else None,
+                         until=_parse_since(args.until) + logs.state["skew"] if args.until else None,
+                         contains=args.contains, limit=args.limit, file=args.file)
+    if args.json:
+        print(json.dumps([asdict(record) for record in records], indent=2))
+    else:
+        for record in records:
+            print(f"[{record.time}] [{record.level}] [{record.tag}] {record.message}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+AndroidEmulator Benchmarks
+Offline benchmarks for the emulator driver: UI dump parsing, hit-testing,
+selector lookup, framestats processing, and end-to-end actions against the fake adb server.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from android_emulator import (AndroidEmulator, FrameStats, ScreenClassifier, SpatialIndex, TextIndex, Tracer,
+                              compile_selector, np, parse_framestats, parse_ui_tree)
+from fake_adb import FakeAdbServer, FakeDevice, Latency, synthetic_dump, synthetic_messages
+
+DUMP_SIZES = {"small": 40, "1k": 1000, "10k": 10000}
+SELECTORS = {
+    "plain": "Send message",
+    "exact": 'desc="Send message"',
+    "substring": 'text*="message 4242 from"',
+    "regex": 'text~="^Message 4\\d{3} "',
+    "flags": "class=EditText focusable !focused",
+    "chained": 'desc="Send message" ^ clickable',
+}
+# Absolute limits on the median, checked on every run; a miss fails like a baseline regression
+BUDGETS_MS = {"hit_test.10k": 1.0}
+
+
+def _measure(fn: Callable[[], Any], repeat: int, number: int = 1) -> List[float]:
+    """Milliseconds per call, one sample per batch of `number` calls"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return samples
+
+
+def _summary(samples: List[float], **extra) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+    return {"median_ms": round(statistics.median(ordered), 4), "p95_ms": round(p95, 4),
+            "min_ms": round(ordered[0], 4), "runs": len(ordered), **extra}
+
+
+def bench_parse(repeat: int) -> Dict[str, Dict[str, Any]]:
+    """parse_ui_tree and the element-list compat path (_parse_ui_dump) at several dump sizes"""
+    emulator = AndroidEmulator(save_captures=False)
+    results = {}
+    for label, nodes in DUMP_SIZES.items():
+        xml = synthetic_dump(synthetic_messages(nodes))
+        data = xml.encode("utf-8")
+        count = len(parse_ui_tree(data))
+        number = max(1, 2000 // count)
+        tree_stats = _summary(_measure(lambda: parse_ui_tree(data), repeat, number), nodes=count)
+        tree_stats["nodes_per_s"] = round(count / tree_stats["median_ms"] * 1000)
+        tree_stats["mb_per_s"] = round(len(data) / tree_stats["median_ms"] / 1000, 2)
+        results[f"parse.{label}"] = tree_stats
+        results[f"parse_ui_dump.{label}"] = _summary(
+            _measure(lambda: emulator._parse_ui_dump(xml), repeat, number), nodes=count)
+    return results
+
+
+def bench_lookup(repeat: int, queries: int = 1000) -> Dict[str, Dict[str, Any]]:
+    """Spatial hit-testing, selector lookups and screen classification on a 10k-node tree"""
+    tree = parse_ui_tree(synthetic_dump(synthetic_messages(DUMP_SIZES["10k"])))
+    rng = random.Random(7)
+    points = [(rng.randrange(1080), rng.randrange(2400)) for _ in range(queries)]
+    results = {
+        "spatial.build.10k": _summary(_measure(lambda: SpatialIndex(tree), repeat)),
+        "text_index.build.10k": _summary(_measure(lambda: TextIndex(tree), repeat)),
+    }
+    spatial = tree.spatial
+
+    def hit_test():
+        for x, y in points:
+            spatial.element_at(x, y, clickable=True)
+
+    hit_stats = _summary([sample / queries for sample in _measure(hit_test, repeat)])
+    results["hit_test.10k"] = hit_stats
+    index = tree.text_index
+    for label, source in SELECTORS.items():
+        selector = compile_selector(source)
+
+        def lookup():
+            index.results.clear()
+            selector.find_all(tree)
+
+        results[f"selector.{label}.10k"] = _summary(_measure(lookup, repeat, 5),
+                                                    matches=len(selector.find_all(tree)))
+    classifier = ScreenClassifier()
+
+    def classify():
+        classifier._cache.clear()
+        classifier.classify(tree)
+
+    results["classify.10k"] = _summary(_measure(classify, repeat, 5), screen=classifier.classify(tree)[0])
+    results["classify.cached.10k"] = _summary(_measure(lambda: classifier.classify(tree), repeat, 1000))
+    return results
+
+
+def bench_frames(repeat: int, swipes: int = 20) -> Dict[str, Dict[str, Any]]:
+    """framestats parsing, merging overlapping dumps and the jank report for a scroll run"""
+    device = FakeDevice(latency=Latency(seed=1))
+    dumps = []
+    for _ in range(swipes):
+        device.swipe(["540", "1800", "540", "600", "200"])
+        dumps.append(device.framestats())
+
+    def merge() -> FrameStats:
+        stats = FrameStats()
+        for dump in dumps:
+            stats.add_dump(dump)
+        return stats
+
+    merged = merge()
+    backend = "numpy" if np is not None else "array"
+    return {
+        "framestats.parse.120": _summary(_measure(lambda: parse_framestats(dumps[-1]), repeat, 20), backend=backend),
+        f"framestats.merge.{swipes}": _summary(_measure(merge, repeat), frames=len(merged)),
+        "framestats.report": _summary(_measure(merged.report, repeat, 20),
+                                      janky_ratio=merged.report()["janky_ratio"]),
+    }
+
+
+def bench_actions(runs: int, latency: Latency, nodes: int) -> Dict[str, Dict[str, Any]]:
+    """End-to-end tap_element and send_message latency and adb round trips per action.
+
+    `send_message_reply` waits for a reply the fake device streams 300ms after the
+    send over 1s, so its time_to_* medians show the measurement error of reply detection.
+    """
+    device = FakeDevice(messages=synthetic_messages(nodes), latency=latency)
+    server = FakeAdbServer([device]).start()
+    previous_port = os.environ.get("ANDROID_ADB_SERVER_PORT")
+    os.environ["ANDROID_ADB_SERVER_PORT"] = str(server.port)
+    results = {}
+    try:
+        for label, action in (("tap_element", lambda emulator, i: emulator.tap_element('desc="Menu" ^ clickable')),
+                              ("send_message", lambda emulator, i: emulator.send_message(f"Benchmark message {i}")),
+                              ("send_message_reply", lambda emulator, i: emulator.send_message(
+                                  f"Benchmark prompt {i}", wait_reply=True, reply_timeout=10, quiet_period=0.3))):
+            device.reply = "Benchmark reply to {message}" if label == "send_message_reply" else ""
+            tracer = Tracer()
+            emulator = AndroidEmulator(device_id=device.serial, save_captures=False, tracer=tracer)
+            samples, round_trips, failures, replies = [], [], 0, {}
+            for i in range(runs):
+                emulator.invalidate()
+                before = emulator.transport.round_trips
+                start = time.perf_counter()
+                outcome = action(emulator, i)
+                samples.append((time.perf_counter() - start) * 1000)
+                round_trips.append(emulator.transport.round_trips - before)
+                failures += not outcome.success
+                for name in ("time_to_first_token_ms", "time_to_complete_ms"):
+                    if getattr(outcome, name, None) is not None:
+                        replies.setdefault(name, []).append(getattr(outcome, name))
+            emulator.transport.close()
+            phases = {name: stats["p50_ms"] for name, stats in tracer.phase_stats().items() if name != label}
+            results[f"action.{label}"] = _summary(samples, adb_calls=statistics.mean(round_trips),
+                                                  failures=failures, phase_p50_ms=phases,
+                                                  **{name: round(statistics.median(values), 1)
+                                                     for name, values in replies.items()})
+    finally:
+        if previous_port is None:
+            os.environ.pop("ANDROID_ADB_SERVER_PORT", None)
+        else:
+            os.environ["ANDROID_ADB_SERVER_PORT"] = previous_port
+        server.close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """Benchmarks whose median got slower than the baseline by more than `threshold`"""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name, {}).get("median_ms")
+        if not before:
+            continue
+        ratio = stats["median_ms"] / before
+        stats["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {before:.3f}ms -> {stats['median_ms']:.3f}ms ({ratio:.2f}x)")
+    return regressions
+
+
+def over_budget(results: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Benchmarks whose median is above their BUDGETS_MS limit"""
+    return [f"{name}: {results[name]['median_ms']:.3f}ms > {limit}ms budget"
+            for name, limit in BUDGETS_MS.items() if name in results and results[name]["median_ms"] > limit]
+
+
+def main():
+    """CLI interface for the benchmarks"""
+    parser = argparse.ArgumentParser(description="Offline AndroidEmulator benchmarks")
+    parser.add_argument("--repeat", type=int, default=15, help="Samples per micro-benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Iterations per end-to-end action")
+    parser.add_argument("--only", choices=["parse", "lookup", "frames", "actions"], action="append",
+                        help="Run only these groups (repeatable)")
+    parser.add_argument("--nodes", type=int, default=200, help="Screen size for end-to-end actions")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Fake adb per-command latency")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="Fake adb per-command jitter")
+    parser.add_argument("--dump-ms", type=float, default=40.0, help="Fake `uiautomator dump` cost")
+    parser.add_argument("--screencap-ms", type=float, default=20.0, help="Fake `screencap` cost")
+    parser.add_argument("--settle-ms", type=float, default=150.0, help="Fake rendering time after input")
+    parser.add_argument("--output", help="Write results as JSON (use as a later --baseline)")
+    parser.add_argument("--baseline", help="JSON from an earlier --output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before flagging, e.g. 0.15")
+    args = parser.parse_args()
+
+    groups = args.only or ["parse", "lookup", "frames", "actions"]
+    results: Dict[str, Dict[str, Any]] = {}
+    if "parse" in groups:
+        results.update(bench_parse(args.repeat))
+    if "lookup" in groups:
+        results.update(bench_lookup(args.repeat))
+    if "frames" in groups:
+        results.update(bench_frames(args.repeat))
+    if "actions" in groups:
+        latency = Latency(args.latency_ms, args.jitter_ms, args.dump_ms, args.screencap_ms, args.settle_ms, seed=1)
+        results.update(bench_actions(args.runs, latency, args.nodes))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+    budget_misses = over_budget(results)
+
+    for name, stats in results.items():
+        extra = " ".join(f"{key}={value}" for key, value in stats.items()
+                         if key not in ("median_ms", "p95_ms", "min_ms", "runs", "phase_p50_ms"))
+        print(f"{name:<28} median={stats['median_ms']:>10.4f}ms p95={stats['p95_ms']:>10.4f}ms {extra}")
+    if regressions:
+        print(f"\nRegressions over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+    if budget_misses:
+        print("\nOver budget:")
+        for line in budget_misses:
+            print(f"  {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                       "python": sys.version.split()[0], "platform": platform.platform(),
+                       "results": results}, f, indent=2)
+    return 1 if regressions or budget_misses else 0
+
+if __name__ == "__main__":
+    exit(main())
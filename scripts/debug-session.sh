@@ -13,8 +13,8 @@ SCREENSHOTS_DIR="$LOGS_DIR/screenshots"
 echo "🐛 Starting debug session..."
 
 # Check if device is connected first
-if ! adb devices | grep -q "device$"; then
-    echo "❌ No Android device connected"
+if [ "$(adb get-state 2>/dev/null)" != "device" ]; then
+    echo "❌ No Android device connected (set ANDROID_SERIAL to choose one when several are attached)"
     echo "💡 Start an emulator or connect a device before debugging"
     exit 1
 fi
@@ -46,8 +46,9 @@ echo "📥 Pulling app logs..."
 echo "🔍 Checking for errors..."
 LATEST_LOG="$LOGS_DIR/cue-$(date +%Y-%m-%d).log"
 if [ -f "$LATEST_LOG" ]; then
-    ERROR_COUNT=$(grep -c "ERROR" "$LATEST_LOG" 2>/dev/null || echo "0")
-    WARN_COUNT=$(grep -c "WARN" "$LATEST_LOG" 2>/dev/null || echo "0")
+    ERROR_COUNT=$(python3 scripts/app_logs.py count --no-sync --file "$LATEST_LOG" --level ERROR 2>/dev/null || echo "0")
+    WARN_AND_ERROR_COUNT=$(python3 scripts/app_logs.py count --no-sync --file "$LATEST_LOG" --level WARN 2>/dev/null || echo "$ERROR_COUNT")
+    WARN_COUNT=$((WARN_AND_ERROR_COUNT - ERROR_COUNT))
     
     echo "📊 Log Summary:"
     echo "   - Errors: $ERROR_COUNT"
@@ -55,7 +56,7 @@ if [ -f "$LATEST_LOG" ]; then
     
     if [ "$ERROR_COUNT" -gt 0 ]; then
         echo "⚠️  Found errors in logs:"
-        grep "ERROR" "$LATEST_LOG" | tail -3
+        python3 scripts/app_logs.py query --no-sync --file "$LATEST_LOG" --level ERROR | grep '^\[' | tail -3
     fi
 fi
 
@@ -70,7 +71,7 @@ echo ""
 echo "🎯 Debug Commands:"
 echo "   View screenshot: open $SCREENSHOTS_DIR/latest.png"
 echo "   View logs: tail -f $LATEST_LOG"
-echo "   Restart app: adb shell am start -n com.example.cue/.MainActivity"
+echo "   Restart app: adb shell am start -n ai.plusonelabs.app.dev.debug/ai.plusonelabs.MainActivity"
 echo "   New screenshot: ./scripts/screenshot.sh"
 
 echo ""
@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Fake adb server
+Speaks the adb smart-socket protocol and emulates just enough of a device
+(shell session, input, dumpsys, screencap, uiautomator dump) to drive
+AndroidEmulator offline, with configurable latency and jitter.
+"""
+
+import argparse
+import base64
+import fnmatch
+import random
+import re
+import shlex
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from android_emulator import encode_png
+
+SCREEN_WIDTH = 1080
+SCREEN_HEIGHT = 2400
+INPUT_BOUNDS = (40, 2200, 880, 2340)
+SEND_BOUNDS = (900, 2200, 1040, 2340)
+MENU_BOUNDS = (0, 80, 140, 220)
+_SHELL_LINE_RE = re.compile(r'^\((.*)\) 2>&1; echo "(__cue_done_\d+__)\$\?"$')
+# `dumpsys gfxinfo <package> framestats` columns on Android 12+
+FRAMESTATS_COLUMNS = ("Flags", "FrameTimelineVsyncId", "IntendedVsync", "Vsync", "InputEventId", "HandleInputStart",
+                      "AnimationStart", "PerformTraversalsStart", "DrawStart", "FrameDeadline", "FrameInterval",
+                      "FrameStartTime", "SyncQueued", "SyncStart", "IssueDrawCommandsStart", "SwapBuffers",
+                      "FrameCompleted", "DequeueBufferDuration", "QueueBufferDuration", "GpuCompleted",
+                      "SwapBuffersCompleted", "DisplayPresentTime", "CommandSubmissionCompleted")
+FRAME_INTERVAL_NS = 16_666_667
+
+
+@dataclass
+class Latency:
+    """Simulated device costs in milliseconds; jitter is applied uniformly in ±jitter_ms"""
+    command_ms: float = 0.0
+    jitter_ms: float = 0.0
+    dump_ms: float = 0.0
+    screencap_ms: float = 0.0
+    settle_ms: float = 0.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, base_ms: float):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        delay = (self.command_ms + base_ms + jitter) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _node(attrs: Dict[str, str], children: str = "") -> str:
+    defaults = {"index": "0", "text": "", "resource-id": "", "class": "android.view.View",
+                "package": "ai.plusonelabs.app.dev.debug", "content-desc": "", "clickable": "false",
+                "focusable": "false", "focused": "false", "scrollable": "false", "enabled": "true",
+                "selected": "false", "checked": "false", "bounds": "[0,0][0,0]"}
+    defaults.update(attrs)
+    rendered = " ".join(f"{key}={quoteattr(value)}" for key, value in defaults.items())
+    return f"<node {rendered}>{children}</node>" if children else f"<node {rendered} />"
+
+
+def _bounds(x1: int, y1: int, x2: int, y2: int) -> str:
+    return f"[{x1},{y1}][{x2},{y2}]"
+
+
+def synthetic_dump(messages: List[str], draft: str = "", focused: bool = False, loading: bool = False) -> str:
+    """A chat screen in the shape of the app's Compose hierarchy: top bar, message list, composer"""
+    rows = []
+    for position, message in enumerate(messages):
+        top = 240 + (position * 120) % 1920
+        rows.append(_node({"index": str(position), "bounds": _bounds(40, top, 1040, top + 110)},
+                          _node({"class": "android.widget.TextView", "text": message,
+                                 "bounds": _bounds(60, top + 10, 1020, top + 100)})))
+    if loading:
+        top = 240 + (len(messages) * 120) % 1920
+        rows.append(_node({"index": str(len(messages)), "class": "android.widget.ProgressBar",
+                           "bounds": _bounds(500, top, 580, top + 80)}))
+    top_bar = _node({"bounds": _bounds(0, 80, SCREEN_WIDTH, 220)},
+                    _node({"clickable": "true", "focusable": "true", "bounds": _bounds(*MENU_BOUNDS)},
+                          _node({"content-desc": "Menu", "bounds": _bounds(35, 115, 105, 185)}))
+                    + _node({"index": "1", "class": "android.widget.TextView", "text": "Chat",
+                             "bounds": _bounds(160, 110, 600, 190)}))
+    message_list = _node({"index": "1", "scrollable": "true", "bounds": _bounds(0, 220, SCREEN_WIDTH, 2180)},
+                         "".join(rows))
+    composer = _node({"index": "2", "class": "android.widget.EditText", "text": draft or "Type a message",
+                      "clickable": "true", "focusable": "true", "focused": "true" if focused else "false",
+                      "bounds": _bounds(*INPUT_BOUNDS)}) + \
+        _node({"index": "3", "clickable": "true", "focusable": "true", "bounds": _bounds(*SEND_BOUNDS)},
+              _node({"content-desc": "Send message", "bounds": _bounds(930, 2230, 1010, 2310)}))
+    root = _node({"class": "android.widget.FrameLayout", "bounds": _bounds(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)},
+                 _node({"class": "androidx.compose.ui.platform.ComposeView",
+                        "bounds": _bounds(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)}, top_bar + message_list + composer))
+    return f"<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation=\"0\">{root}</hierarchy>"
+
+
+def synthetic_messages(nodes: int) -> List[str]:
+    """Enough chat messages for synthetic_dump to produce about `nodes` nodes"""
+    return [f"Message {position} from the synthetic chat fixture" for position in range(max((nodes - 12) // 2, 0))]
+
+
+def synthetic_frame(width: int, height: int, shade: int) -> bytes:
+    """Raw RGBA_8888 `screencap` output: a flat background with a band that moves with `shade`"""
+    background = bytes((shade % 256, 40, 60, 255)) * width
+    band = bytes((255, 255, 255, 255)) * width
+    band_row = (shade * 37) % max(height - 8, 1)
+    pixels = background * band_row + band * 8 + background * (height - band_row - 8)
+    return struct.pack("<III", width, height, 1) + pixels
+
+
+@dataclass
+class FakeDevice:
+    """Device state behind one serial: a chat screen by default, or a fixed recorded dump"""
+    serial: str = "emulator-5554"
+    package: str = "ai.plusonelabs.app.dev.debug"
+    messages: List[str] = field(default_factory=list)
+    dump_xml: Optional[str] = None
+    frame: Optional[bytes] = None
+    width: int = SCREEN_WIDTH
+    height: int = SCREEN_HEIGHT
+    latency: Latency = field(default_factory=Latency)
+    draft: str = ""
+    focused: bool = False
+    generation: int = 0
+    frames_rendered: int = 0
+    busy_until: float = 0.0
+    input_log: List[str] = field(default_factory=list)
+    ime: str = "com.android.inputmethod.latin/.LatinIME"
+    files: Dict[str, bytearray] = field(default_factory=dict)
+    reply: str = ""
+    first_token_ms: float = 300.0
+    stream_ms: float = 1000.0
+    pending_text: str = ""
+    gfxinfo: Optional[str] = None
+    jank_rate: float = 0.1
+
+    def __post_init__(self):
+        self._lock = threading.RLock()
+        self._random = random.Random(self.latency.seed)
+        self._frame_rows: deque = deque(maxlen=120)
+        self._frame_times: List[float] = []
+        self._frame_clock = 0
+        self._rendered: Tuple[int, str] = (-1, "")
+        self._streams: List[Tuple[float, str]] = []
+        self._streamed: Tuple[str, ...] = ()
+
+    def _advance_streams(self) -> Tuple[str, ...]:
+        """Partial texts of replies still streaming; finished replies join `messages`"""
+        now = time.monotonic()
+        visible = []
+        for started, text in list(self._streams):
+            elapsed_ms = (now - started) * 1000 - self.first_token_ms
+            if elapsed_ms >= self.stream_ms:
+                self._streams.remove((started, text))
+                self.messages.append(text)
+                self._changed()
+            elif elapsed_ms >= 0:
+                words = text.split(" ")
+                visible.append(" ".join(words[:1 + int(len(words) * elapsed_ms / self.stream_ms)]))
+            else:
+                visible.append(self.pending_text)
+        if tuple(visible) != self._streamed:
+            self._streamed = tuple(visible)
+            self._changed()
+        return self._streamed
+
+    def _changed(self):
+        self.generation += 1
+        self.frames_rendered += 1
+        self.busy_until = time.monotonic() + self.latency.settle_ms / 1000
+
+    def log(self, level: str, tag: str, message: str, when: Optional[float] = None):
+        """Append a record the way the app's FileLogger writes it"""
+        when = time.time() if when is None else when
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(when)) + f".{int(when * 1000) % 1000:03d}"
+        path = f"files/logs/cue-{stamp[:10]}.log"
+        with self._lock:
+            self.files.setdefault(path, bytearray()).extend(
+                f"[{stamp}] [{level}] [[AppLog]{tag}] {message}\n".encode("utf-8"))
+
+    def ui_dump(self) -> str:
+        with self._lock:
+            if self.dump_xml is not None:
+                return self.dump_xml
+            streamed = self._advance_streams()
+            if self._rendered[0] != self.generation:
+                messages = self.messages + [text for text in streamed if text]
+                self._rendered = (self.generation, synthetic_dump(messages, self.draft, self.focused,
+                                                                  loading=bool(streamed)))
+            return self._rendered[1]
+
+    def screencap(self) -> bytes:
+        with self._lock:
+            if self.frame is not None:
+                return self.frame
+            return synthetic_frame(self.width, self.height, self.generation)
+
+    def gfx_frames(self) -> int:
+        with self._lock:
+            self._advance_streams()
+            if time.monotonic() < self.busy_until:
+                self.frames_rendered += 3
+            return self.frames_rendered
+
+    def tap(self, x: int, y: int):
+        with self._lock:
+            self.input_log.append(f"tap {x} {y}")
+            if _inside(INPUT_BOUNDS, x, y):
+                self.focused = True
+            elif _inside(SEND_BOUNDS, x, y) and self.draft:
+                self.messages.append(self.draft)
+                if self.reply:
+                    self._streams.append((time.monotonic(), self.reply.format(message=self.draft)))
+                self.draft = ""
+            self._changed()
+
+    def swipe(self, args: List[str]):
+        with self._lock:
+            self.input_log.append("swipe " + " ".join(args))
+            self._render_scroll(int(args[4]) if len(args) > 4 else 300)
+            self._changed()
+
+    def _render_scroll(self, duration_ms: int):
+        """Frame timings for a drag of `duration_ms` plus its fling; `jank_rate` of them miss the deadline"""
+        vsync = max(self._frame_clock, time.monotonic_ns())
+        for _ in range(int((duration_ms + 400) * 1e6 / FRAME_INTERVAL_NS)):
+            ui_ns = self._random.uniform(2e6, 7e6)
+            render_ns = self._random.uniform(2e6, 5e6)
+            if self._random.random() < self.jank_rate:
+                ui_ns += self._random.uniform(10e6, 40e6)
+            sync = vsync + int(ui_ns)
+            completed = sync + int(render_ns)
+            stages = {"Flags": 0 if self._frame_rows or self._frame_times else 1, "IntendedVsync": vsync,
+                      "Vsync": vsync, "HandleInputStart": vsync + 200_000, "AnimationStart": vsync + 400_000,
+                      "PerformTraversalsStart": vsync + 600_000, "DrawStart": sync - 1_000_000,
+                      "FrameDeadline": vsync + FRAME_INTERVAL_NS, "FrameInterval": FRAME_INTERVAL_NS,
+                      "FrameStartTime": vsync, "SyncQueued": sync, "SyncStart": sync + 100_000,
+                      "IssueDrawCommandsStart": sync + 300_000, "SwapBuffers": completed - 500_000,
+                      "FrameCompleted": completed, "GpuCompleted": completed, "SwapBuffersCompleted": completed,
+                      "DisplayPresentTime": -1, "CommandSubmissionCompleted": completed - 400_000}
+            self._frame_rows.append([stages.get(name, 0) for name in FRAMESTATS_COLUMNS])
+            self._frame_times.append((completed - vsync) / 1e6)
+            vsync += -(-(completed - vsync) // FRAME_INTERVAL_NS) * FRAME_INTERVAL_NS
+        self._frame_clock = vsync
+        self.frames_rendered += len(self._frame_times)
+
+    def reset_framestats(self):
+        with self._lock:
+            self._frame_rows.clear()
+            self._frame_times = []
+
+    def framestats(self) -> str:
+        """`dumpsys gfxinfo <package> framestats`: summary since the last reset, then the last 120 frames"""
+        with self._lock:
+            if self.gfxinfo is not None:
+                return self.gfxinfo
+            times = sorted(self._frame_times)
+            janky = sum(frame > FRAME_INTERVAL_NS / 1e6 for frame in times)
+            lines = [f"** Graphics info for pid 4242 [{self.package}] **", "",
+                     f"Total frames rendered: {len(times)}",
+                     f"Janky frames: {janky} ({janky / max(len(times), 1):.2%})"]
+            for q in (50, 90, 95, 99):
+                lines.append(f"{q}th percentile: {int(times[min(len(times) * q // 100, len(times) - 1)]) if times else 0}ms")
+            buckets = (5, 10, 16, 24, 32, 50, 100, 250, 700)
+            counts = [sum(1 for frame in times if low < frame <= high) for low, high in zip((0,) + buckets, buckets)]
+            lines.append("HISTOGRAM: " + " ".join(f"{bucket}ms={count}" for bucket, count in zip(buckets, counts)))
+            lines += ["", "---PROFILEDATA---", ",".join(FRAMESTATS_COLUMNS) + ","]
+            lines += [",".join(map(str, row)) + "," for row in self._frame_rows]
+            lines += ["---PROFILEDATA---", ""]
+            return "\n".join(lines)
+
+    def type_text(self, text: str):
+        with self._lock:
+            self.input_log.append(f"text {text}")
+            if self.focused:
+                self.draft += text
+            self._changed()
+
+    def key(self, code: str):
+        with self._lock:
+            self.input_log.append(f"keyevent {code}")
+            if code in ("67", "KEYCODE_DEL"):
+                self.draft = self.draft[:-1]
+            elif code in ("66", "KEYCODE_ENTER") and self.focused:
+                self.draft += "\n"
+            self._changed()
+
+
+def _inside(bounds: Tuple[int, int, int, int], x: int, y: int) -> bool:
+    return bounds[0] <= x < bounds[2] and bounds[1] <= y < bounds[3]
+
+
+class FakeShell:
+    """Interprets the small subset of `sh` the driver sends: `;`, `&&`, `||`, `|` and a few commands"""
+
+    def __init__(self, device: FakeDevice):
+        self.device = device
+
+    def run(self, script: str) -> Tuple[int, str]:
+        lexer = shlex.shlex(script, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        code, output, words, operator = 0, [], [], ";"
+        for token in list(lexer) + [";"]:
+            if token not in (";", "&&", "||"):
+                words.append(token)
+                continue
+            if words and (operator == ";" or (operator == "&&") == (code == 0)):
+                code, text = self._pipeline(words)
+                output.append(text)
+            words, operator = [], token
+        return code, "".join(output)
+
+    def _pipeline(self, words: List[str]) -> Tuple[int, str]:
+        code, text = 0, ""
+        stage: List[str] = []
+        for word in words + ["|"]:
+            if word != "|":
+                stage.append(word)
+                continue
+            code, text = self._command(stage, text)
+            stage = []
+        return code, text
+
+    def _command(self, argv: List[str], stdin: str) -> Tuple[int, str]:
+        device = self.device
+        name, args = argv[0], argv[1:]
+        if name == "run-as" and len(args) > 1:
+            return self._command(args[1:], stdin)
+        if name == "input" and args:
+            if args[0] == "tap":
+                device.tap(int(float(args[1])), int(float(args[2])))
+            elif args[0] == "swipe":
+                device.swipe(args[1:])
+            elif args[0] == "text":
+                device.type_text(args[1].replace("%s", " "))
+            elif args[0] == "keyevent":
+                for code in args[1:]:
+                    device.key(code)
+            return 0, ""
+        if name == "dumpsys" and args[:1] == ["window"]:
+            return 0, (f"  mCurrentFocus=Window{{1a2b u0 {device.package}/{device.package}.MainActivity}}\n"
+                       f"  mFocusedApp=ActivityRecord{{3c4d u0 {device.package}/.MainActivity t12}}\n")
+        if name == "dumpsys" and args[:1] == ["gfxinfo"] and "reset" in args:
+            device.reset_framestats()
+            return 0, ""
+        if name == "dumpsys" and args[:1] == ["gfxinfo"] and "framestats" in args:
+            return 0, device.framestats()
+        if name == "dumpsys" and args[:1] == ["gfxinfo"]:
+            return 0, f"Applications Graphics Acceleration Info:\nTotal frames rendered: {device.gfx_frames()}\n"
+        if name == "settings" and args[:3] == ["get", "secure", "default_input_method"]:
+            return 0, device.ime + "\n"
+        if name == "am" and args[:3] == ["broadcast", "-a", "ADB_INPUT_B64"]:
+            if device.ime == "com.android.adbkeyboard/.AdbIME":
+                device.type_text(base64.b64decode(args[args.index("msg") + 1]).decode("utf-8"))
+            return 0, "Broadcasting: Intent { act=ADB_INPUT_B64 flg=0x400000 }\nBroadcast completed: result=0\n"
+        if name == "date":
+            now = time.time()
+            return 0, f"{now:.9f} +0000\n" if args and "%z" in args[0] else time.strftime("%a %b %d %H:%M:%S UTC %Y\n")
+        if name == "find":
+            pattern = args[args.index("-name") + 1] if "-name" in args else "*"
+            paths = sorted(path for path in device.files
+                           if path.startswith(args[0].rstrip("/") + "/") and fnmatch.fnmatch(path.rsplit("/", 1)[-1], pattern))
+            if "-exec" in args:
+                return 0, "".join(f"{len(device.files[path])} {path}\n" for path in paths)
+            return 0, "".join(f"{path}\n" for path in paths)
+        if name == "tail" and args[:1] == ["-c"] and args[1].startswith("+"):
+            data = device.files.get(args[2])
+            if data is None:
+                return 1, f"tail: {args[2]}: No such file or directory\n"
+            return 0, bytes(data[int(args[1][1:]) - 1:]).decode("utf-8", "surrogateescape")
+        if name == "cat" and args:
+            data = device.files.get(args[0])
+            if data is None:
+                return 1, f"cat: {args[0]}: No such file or directory\n"
+            return 0, bytes(data).decode("utf-8", "surrogateescape")
+        if name == "grep":
+            pattern = args[-1]
+            if "-E" not in args:
+                pattern = re.escape(pattern)
+            lines = [line for line in stdin.splitlines(keepends=True) if re.search(pattern, line)]
+            return (0 if lines else 1), "".join(lines)
+        if name == "echo":
+            return 0, " ".join(args) + "\n"
+        if name == "sleep":
+            time.sleep(float(args[0]))
+            return 0, ""
+        if name in ("true", "cd", "export"):
+            return 0, ""
+        return 127, f"sh: {name}: not found\n"
+
+
+class _AdbHandler(socketserver.BaseRequestHandler):
+    server: "FakeAdbServer"
+
+    def _read_request(self) -> Optional[str]:
+        header = self._recv_exact(4)
+        if header is None:
+            return None
+        payload = self._recv_exact(int(header, 16))
+        return None if payload is None else payload.decode("utf-8")
+
+    def _recv_exact(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _fail(self, message: str):
+        encoded = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(encoded) + encoded)
+
+    def handle(self):
+        device: Optional[FakeDevice] = None
+        while True:
+            request = self._read_request()
+            if request is None:
+                return
+            self.server.requests.append(request)
+            if request == "host:devices":
+                payload = "".join(f"{serial}\tdevice\n" for serial in self.server.devices).encode()
+                self.request.sendall(b"OKAY" + b"%04x" % len(payload) + payload)
+                return
+            if request.startswith("host:transport:"):
+                device = self.server.devices.get(request[len("host:transport:"):])
+                if device is None:
+                    self._fail(f"device '{request[len('host:transport:'):]}' not found")
+                    return
+                self.request.sendall(b"OKAY")
+                continue
+            if device is None:
+                self._fail("no device selected")
+                return
+            if request == "exec:sh":
+                self.request.sendall(b"OKAY")
+                self._serve_shell(device)
+                return
+            if request.startswith("exec:"):
+                self.request.sendall(b"OKAY")
+                self.request.sendall(self._exec(device, request[len("exec:"):]))
+                return
+            self._fail(f"unsupported service {request}")
+            return
+
+    def _exec(self, device: FakeDevice, command: str) -> bytes:
+        argv = shlex.split(command)
+        if argv[:1] == ["screencap"]:
+            device.latency.sleep(device.latency.screencap_ms)
+            frame = device.screencap()
+            return encode_png(frame) if "-p" in argv else frame
+        if argv[:2] == ["uiautomator", "dump"]:
+            device.latency.sleep(device.latency.dump_ms)
+            return (device.ui_dump() + "UI hierchary dumped to: /dev/tty\n").encode("utf-8")
+        device.latency.sleep(0)
+        return FakeShell(device).run(command)[1].encode("utf-8", "surrogateescape")
+
+    def _serve_shell(self, device: FakeDevice):
+        shell = FakeShell(device)
+        buffer = b""
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                match = _SHELL_LINE_RE.match(line.decode("utf-8"))
+                if match is None:
+                    code, output = shell.run(line.decode("utf-8"))
+                    self.request.sendall(output.encode("utf-8", "surrogateescape"))
+                    continue
+                device.latency.sleep(0)
+                code, output = shell.run(match.group(1))
+                self.request.sendall(f"{output}{match.group(2)}{code}\n".encode("utf-8", "surrogateescape"))
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """adb server stand-in on localhost; port 0 picks a free port"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, devices: Optional[List[FakeDevice]] = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), _AdbHandler)
+        self.devices: Dict[str, FakeDevice] = {device.serial: device for device in devices or [FakeDevice()]}
+        self.requests: List[str] = []
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeAdbServer":
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    """Run a fake adb server until interrupted"""
+    parser = argparse.ArgumentParser(description="Fake adb server for offline runs of android_emulator.py")
+    parser.add_argument("--port", type=int, default=5038, help="Port to listen on (point ANDROID_ADB_SERVER_PORT here)")
+    parser.add_argument("--devices", default="emulator-5554", help="Comma-separated serials to emulate")
+    parser.add_argument("--nodes", type=int, default=200, help="Approximate node count of the synthetic chat screen")
+    parser.add_argument("--dump", help="Serve this recorded UI dump XML instead of the synthetic screen")
+    parser.add_argument("--frame", help="Serve this raw `screencap` framebuffer instead of a synthetic one")
+    parser.add_argument("--gfxinfo", help="Serve this recorded `dumpsys gfxinfo <package> framestats` output")
+    parser.add_argument("--jank-rate", type=float, default=0.1, help="Share of synthetic scroll frames that miss the deadline")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every command")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform ± jitter on every command")
+    parser.add_argument("--dump-ms", type=float, default=0.0, help="Extra cost of `uiautomator dump`")
+    parser.add_argument("--screencap-ms", type=float, default=0.0, help="Extra cost of `screencap`")
+    parser.add_argument("--settle-ms", type=float, default=150.0, help="How long the app keeps rendering after input")
+    parser.add_argument("--seed", type=int, help="Seed for the jitter")
+    parser.add_argument("--reply", default="", help="Stream this assistant reply after each send, e.g. 'Echo: {message}'")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="Delay before the reply's first words")
+    parser.add_argument("--stream-ms", type=float, default=1000.0, help="How long the reply takes to stream in")
+    parser.add_argument("--pending-text", default="", help="Status bubble shown until the reply starts, e.g. 'Sending…'")
+    args = parser.parse_args()
+
+    dump_xml = open(args.dump, encoding="utf-8").read() if args.dump else None
+    frame = open(args.frame, "rb").read() if args.frame else None
+    gfxinfo = open(args.gfxinfo, encoding="utf-8").read() if args.gfxinfo else None
+    devices = [
+        FakeDevice(serial=serial, messages=synthetic_messages(args.nodes), dump_xml=dump_xml, frame=frame,
+                   latency=Latency(args.latency_ms, args.jitter_ms, args.dump_ms, args.screencap_ms,
+                                   args.settle_ms, args.seed),
+                   reply=args.reply, first_token_ms=args.first_token_ms, stream_ms=args.stream_ms,
+                   pending_text=args.pending_text, gfxinfo=gfxinfo, jank_rate=args.jank_rate)
+        for serial in args.devices.split(",")
+    ]
+    server = FakeAdbServer(devices, port=args.port)
+    print(f"Fake adb server on 127.0.0.1:{server.port} serving {', '.join(server.devices)}")
+    print(f"Use: ANDROID_ADB_SERVER_PORT={server.port} python3 scripts/android_emulator.py screenshot --no-save")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -34,8 +34,8 @@ usage() {
 
 # Check if device is connected
 check_device() {
-    if ! adb devices | grep -q "device$"; then
-        echo "❌ No Android device connected"
+    if [ "$(adb get-state 2>/dev/null)" != "device" ]; then
+        echo "❌ No Android device connected (set ANDROID_SERIAL to choose one when several are attached)"
         exit 1
     fi
 }
@@ -80,39 +80,9 @@ case "$1" in
             usage
         fi
         echo "⌨️  Typing: $2"
-        # First find and focus the text field
-        echo "🎯 Finding text input field..."
-        adb shell uiautomator dump /sdcard/window_dump.xml > /dev/null 2>&1
-        adb pull /sdcard/window_dump.xml /tmp/ui_dump.xml > /dev/null 2>&1
-        
-        # Look for EditText element
-        EDITTEXT=$(grep -o 'class="android.widget.EditText"[^>]*bounds="\[[0-9,]*\]\[[0-9,]*\]"' /tmp/ui_dump.xml | head -1)
-        
-        if [ -n "$EDITTEXT" ]; then
-            # Extract bounds and calculate center
-            BOUNDS=$(echo "$EDITTEXT" | grep -o 'bounds="\[[0-9,]*\]\[[0-9,]*\]"' | sed 's/bounds="\[\([0-9]*\),\([0-9]*\)\]\[\([0-9]*\),\([0-9]*\)\]"/\1 \2 \3 \4/')
-            X1=$(echo $BOUNDS | cut -d' ' -f1)
-            Y1=$(echo $BOUNDS | cut -d' ' -f2)
-            X2=$(echo $BOUNDS | cut -d' ' -f3)
-            Y2=$(echo $BOUNDS | cut -d' ' -f4)
-            CENTER_X=$(( (X1 + X2) / 2 ))
-            CENTER_Y=$(( (Y1 + Y2) / 2 ))
-            
-            echo "📍 Tapping text field at ($CENTER_X, $CENTER_Y)"
-            adb shell input tap "$CENTER_X" "$CENTER_Y"
-            sleep 0.5
-        fi
-        
-        # Clear existing text and input new text
-        adb shell input keyevent KEYCODE_CTRL_A > /dev/null 2>&1 || true
-        sleep 0.2
-        ESCAPED_TEXT=$(echo "$2" | sed 's/ /\\ /g')
-        adb shell input text "$ESCAPED_TEXT"
+        # Focuses the first text field unless one is focused, then types in one round trip
+        python3 "$PROJECT_ROOT/scripts/android_emulator.py" input-text --text "$2" --device "$(adb get-serialno)" --no-save
         echo "✅ Text entered: $2"
-        
-        # Cleanup
-        adb shell rm /sdcard/window_dump.xml > /dev/null 2>&1
-        rm -f /tmp/ui_dump.xml
         ;;
         
     send)
@@ -155,51 +125,8 @@ case "$1" in
         fi
         echo "💬 Sending complete message: $2"
         
-        # Input text
-        echo "⌨️  Entering text..."
-        adb shell uiautomator dump /sdcard/window_dump.xml > /dev/null 2>&1
-        adb pull /sdcard/window_dump.xml /tmp/ui_dump.xml > /dev/null 2>&1
-        
-        EDITTEXT=$(grep -o 'class="android.widget.EditText"[^>]*bounds="\[[0-9,]*\]\[[0-9,]*\]"' /tmp/ui_dump.xml | head -1)
-        
-        if [ -n "$EDITTEXT" ]; then
-            BOUNDS=$(echo "$EDITTEXT" | grep -o 'bounds="\[[0-9,]*\]\[[0-9,]*\]"' | sed 's/bounds="\[\([0-9]*\),\([0-9]*\)\]\[\([0-9]*\),\([0-9]*\)\]"/\1 \2 \3 \4/')
-            X1=$(echo $BOUNDS | cut -d' ' -f1)
-            Y1=$(echo $BOUNDS | cut -d' ' -f2)
-            X2=$(echo $BOUNDS | cut -d' ' -f3)
-            Y2=$(echo $BOUNDS | cut -d' ' -f4)
-            CENTER_X=$(( (X1 + X2) / 2 ))
-            CENTER_Y=$(( (Y1 + Y2) / 2 ))
-            
-            adb shell input tap "$CENTER_X" "$CENTER_Y"
-            sleep 0.5
-        fi
-        
-        ESCAPED_TEXT=$(echo "$2" | sed 's/ /\\ /g')
-        adb shell input text "$ESCAPED_TEXT"
-        
-        # Send message
-        echo "📤 Sending message..."
-        sleep 0.5
-        SEND_BTN=$(grep -o 'content-desc="Send message"[^>]*bounds="\[[0-9,]*\]\[[0-9,]*\]"' /tmp/ui_dump.xml | head -1)
-        
-        if [ -n "$SEND_BTN" ]; then
-            BOUNDS=$(echo "$SEND_BTN" | grep -o 'bounds="\[[0-9,]*\]\[[0-9,]*\]"' | sed 's/bounds="\[\([0-9]*\),\([0-9]*\)\]\[\([0-9]*\),\([0-9]*\)\]"/\1 \2 \3 \4/')
-            X1=$(echo $BOUNDS | cut -d' ' -f1)
-            Y1=$(echo $BOUNDS | cut -d' ' -f2)
-            X2=$(echo $BOUNDS | cut -d' ' -f3)
-            Y2=$(echo $BOUNDS | cut -d' ' -f4)
-            CENTER_X=$(( (X1 + X2) / 2 ))
-            CENTER_Y=$(( (Y1 + Y2) / 2 ))
-            
-            adb shell input tap "$CENTER_X" "$CENTER_Y"
-            echo "✅ Message sent: $2"
-        else
-            echo "❌ Send button not found"
-        fi
-        
-        adb shell rm /sdcard/window_dump.xml > /dev/null 2>&1
-        rm -f /tmp/ui_dump.xml
+        python3 "$PROJECT_ROOT/scripts/android_emulator.py" send-message --text "$2" --device "$(adb get-serialno)" --no-save
+        echo "✅ Message sent: $2"
         ;;
         
     back)
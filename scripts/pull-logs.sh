@@ -14,25 +14,15 @@ echo "📥 Pulling logs from Android device..."
 # Create local logs directory if it doesn't exist
 mkdir -p "$LOGS_DIR"
 
-# Get the app's internal storage path
-APP_PACKAGE="com.example.cue"
-DEVICE_LOGS_PATH="/data/data/$APP_PACKAGE/files/logs"
-
 # Check if device is connected
-if ! adb devices | grep -q "device$"; then
-    echo "❌ No Android device connected"
+if [ "$(adb get-state 2>/dev/null)" != "device" ]; then
+    echo "❌ No Android device connected (set ANDROID_SERIAL to choose one when several are attached)"
     exit 1
 fi
 
-# Pull all log files from device
-echo "🔄 Pulling log files from device storage..."
-adb shell "run-as $APP_PACKAGE find files/logs -name '*.log' 2>/dev/null" | while read -r file; do
-    if [ -n "$file" ]; then
-        filename=$(basename "$file")
-        echo "   📄 Pulling $filename"
-        adb shell "run-as $APP_PACKAGE cat $file" > "$LOGS_DIR/$filename"
-    fi
-done
+# Fetch only the bytes appended since the last pull and index the new records
+echo "🔄 Syncing log files from device storage..."
+python3 "$PROJECT_ROOT/scripts/app_logs.py" sync --device "$(adb get-serialno)" | sed 's/^/   📄 /'
 
 # List pulled logs
 echo ""
@@ -43,3 +33,4 @@ echo ""
 echo "📋 View logs with:"
 echo "   tail -f $LOGS_DIR/cue-$(date +%Y-%m-%d).log"
 echo "   cat $LOGS_DIR/cue-$(date +%Y-%m-%d).log"
+echo "   python3 scripts/app_logs.py query --level ERROR --tag WebSocketService --since 5m"
@@ -12,28 +12,25 @@ SCREENSHOTS_DIR="$PROJECT_ROOT/logs/screenshots"
 echo "📸 Capturing app screenshot..."
 
 # Check if device is connected
-if ! adb devices | grep -q "device$"; then
-    echo "❌ No Android device connected"
+if [ "$(adb get-state 2>/dev/null)" != "device" ]; then
+    echo "❌ No Android device connected (set ANDROID_SERIAL to choose one when several are attached)"
     exit 1
 fi
 
-# Create screenshots directory
-mkdir -p "$SCREENSHOTS_DIR"
-
-# Capture screenshot
-TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
-SCREENSHOT_FILE="screenshot_${TIMESTAMP}.png"
-
+# Capture into the content-addressed store (deduplicated, bounded retention)
 echo "🔄 Taking screenshot..."
-adb shell screencap -p /sdcard/temp_screenshot.png
-adb pull /sdcard/temp_screenshot.png "$SCREENSHOTS_DIR/$SCREENSHOT_FILE"
-adb shell rm /sdcard/temp_screenshot.png
+SCREENSHOT_FILE=$(python3 "$PROJECT_ROOT/scripts/android_emulator.py" screenshot --device "$(adb get-serialno)" --json \
+    | python3 -c 'import json, sys; print(json.load(sys.stdin)["screenshot_path"])')
+
+if [ -z "$SCREENSHOT_FILE" ]; then
+    echo "❌ Screenshot capture failed"
+    exit 1
+fi
 
-echo "✅ Screenshot saved: $SCREENSHOTS_DIR/$SCREENSHOT_FILE"
+echo "✅ Screenshot saved: $SCREENSHOT_FILE"
 echo "📱 Current app screen captured for debugging"
 
 # Also create a "latest" symlink for easy access
-cd "$SCREENSHOTS_DIR"
-ln -sf "$SCREENSHOT_FILE" latest.png
+ln -sf "$SCREENSHOT_FILE" "$SCREENSHOTS_DIR/latest.png"
 
 echo "💡 View with: open $SCREENSHOTS_DIR/latest.png"
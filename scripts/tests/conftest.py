@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from android_emulator import AndroidEmulator  # noqa: E402
+from fake_adb import FakeAdbServer, FakeDevice, Latency  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def device() -> FakeDevice:
+    return FakeDevice(latency=Latency(settle_ms=50.0, seed=1))
+
+
+@pytest.fixture
+def server(device, monkeypatch):
+    """Fake adb server on a free port, with ANDROID_ADB_SERVER_PORT pointing at it"""
+    fake = FakeAdbServer([device]).start()
+    monkeypatch.setenv("ANDROID_ADB_SERVER_PORT", str(fake.port))
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def emulator(server, device, tmp_path):
+    emulator = AndroidEmulator(device_id=device.serial, project_root=str(tmp_path), save_captures=False,
+                               package=device.package)
+    yield emulator
+    emulator.transport.close()
@@ -0,0 +1,62 @@
+import calendar
+
+from android_emulator import AdbTransport
+from app_logs import AppLogs, LogParser
+
+LOG = (b"tail of an earlier record\n"
+       b"[2025-01-02 03:04:05.100] [INFO] [[AppLog]Chat] sent\n"
+       b"[2025-01-02 03:04:05.250] [ERROR] [[AppLog]Net] request failed\n"
+       b"java.io.IOException: timeout\n"
+       b"    at ai.plusonelabs.Net.call(Net.kt:42)\n"
+       b"[2025-01-02 03:04:06.000] [DEBUG] [[AppLog]Chat] done\n")
+
+
+def test_parser_handles_chunks_stack_traces_and_open_records():
+    parser = LogParser("cue.log")
+    records = []
+    for start in range(0, len(LOG), 7):
+        records.extend(parser.feed(LOG[start:start + 7]))
+    assert [(record.level, record.tag) for record in records] == [("INFO", "[AppLog]Chat"), ("ERROR", "[AppLog]Net")]
+    failed = records[1]
+    assert failed.message.splitlines() == ["request failed", "java.io.IOException: timeout",
+                                           "    at ai.plusonelabs.Net.call(Net.kt:42)"]
+    assert failed.timestamp == calendar.timegm((2025, 1, 2, 3, 4, 5)) + 0.25
+    assert LOG[failed.offset:failed.offset + failed.length].startswith(b"[2025-01-02 03:04:05.250]")
+    assert parser.pending().message == "done"
+    assert parser.position == len(LOG)
+
+
+def test_sync_is_incremental_and_queries_use_the_index(server, device, tmp_path):
+    logs = AppLogs(AdbTransport(device.serial), package=device.package, logs_dir=str(tmp_path))
+    device.log("INFO", "Chat", "first", when=1_700_000_000.0)
+    device.log("ERROR", "Net", "boom\n  at Net.kt:1", when=1_700_000_001.0)
+    assert sum(logs.sync().values()) == 2
+    device.log("WARN", "Chat", "slow", when=1_700_000_002.0)
+    assert sum(logs.sync().values()) == 1
+    assert sum(logs.sync().values()) == 0
+
+    assert [record.message for record in logs.query()] == ["first", "boom\n  at Net.kt:1", "slow"]
+    assert [record.message for record in logs.query(level="WARN")] == ["boom\n  at Net.kt:1", "slow"]
+    assert [record.message for record in logs.query(tag="Chat")] == ["first", "slow"]
+    assert [record.message for record in logs.query(since=1_700_000_000.5, until=1_700_000_001.5)] == \
+        ["boom\n  at Net.kt:1"]
+    assert logs.count(level="ERROR") == 1 and logs.count(tag="Chat") == 2
+
+    reopened = AppLogs(None, package=device.package, logs_dir=str(tmp_path))
+    assert [record.level for record in reopened.query(contains="slow")] == ["WARN"]
+    logs.transport.close()
+
+
+def test_file_filter_limits_counts_to_one_log(server, device, tmp_path):
+    logs = AppLogs(AdbTransport(device.serial), package=device.package, logs_dir=str(tmp_path))
+    device.log("ERROR", "Net", "yesterday", when=1_700_000_000.0)
+    device.log("ERROR", "Net", "today", when=1_700_000_000.0 + 86400)
+    device.log("INFO", "Chat", "hello", when=1_700_000_000.0 + 86401)
+    logs.sync()
+    latest = str(tmp_path / sorted(logs.state["files"])[-1])
+
+    assert logs.count(level="ERROR") == 2
+    assert logs.count(level="ERROR", file=latest) == 1 and logs.count(file=latest) == 2
+    assert [record.message for record in logs.query(level="ERROR", file=latest)] == ["today"]
+    assert logs.count(file=str(tmp_path / "cue-1999-01-01.log")) == 0
+    logs.transport.close()
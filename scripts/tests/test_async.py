@@ -0,0 +1,48 @@
+import asyncio
+
+from android_emulator_async import AsyncAndroidEmulator
+
+
+def run(device, tmp_path, scenario):
+    async def main():
+        emulator = AsyncAndroidEmulator(device_id=device.serial, project_root=str(tmp_path), save_captures=False,
+                                        package=device.package, timeout=10.0)
+        try:
+            return await scenario(emulator)
+        finally:
+            await emulator.close()
+
+    return asyncio.run(main())
+
+
+def test_input_and_send_report_tree_changes_on_the_same_screen(server, device, tmp_path):
+    async def scenario(emulator):
+        return await emulator.input_text("hello"), await emulator.tap_element("Send message")
+
+    typed, sent = run(device, tmp_path, scenario)
+    assert device.messages[-1] == "hello"
+    assert typed.new_screen_state == sent.new_screen_state
+    assert typed.ui_state_changed and typed.change.nodes_changed
+    assert sent.ui_state_changed and sent.change.nodes_added
+    assert sent.change.region is not None
+
+
+def test_tap_on_static_area_reports_no_change(server, device, tmp_path):
+    async def scenario(emulator):
+        return await emulator.tap(540, 50)
+
+    result = run(device, tmp_path, scenario)
+    assert result.success
+    assert result.change is not None and not result.change.changed
+    assert not result.ui_state_changed
+
+
+def test_async_change_matches_sync(server, device, emulator, tmp_path):
+    expected = emulator.input_text("abc").change
+    device.draft, device.focused = "", False
+    device._changed()
+
+    async def scenario(async_emulator):
+        return await async_emulator.input_text("abc")
+
+    assert run(device, tmp_path, scenario).change == expected
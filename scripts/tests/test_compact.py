@@ -0,0 +1,73 @@
+import json
+
+from android_emulator import CompactEncoder, InteractionResult, parse_ui_tree
+from fake_adb import synthetic_dump
+
+
+def test_ids_are_stable_across_snapshots():
+    encoder = CompactEncoder()
+    before = parse_ui_tree(synthetic_dump(["hello"]))
+    after = parse_ui_tree(synthetic_dump(["hello", "world"], draft="typing", focused=True))
+    first, second = encoder.element_ids(before), encoder.element_ids(after)
+    hello = before.text.index("hello")
+    assert first[hello] == second[after.text.index("hello")]
+    assert first[before.text.index("Type a message")] == second[after.text.index("typing")]
+    assert len(set(second.values())) == len(second)
+
+
+def test_delta_reports_added_removed_and_changed():
+    encoder = CompactEncoder()
+    before = parse_ui_tree(synthetic_dump(["hello", "old"]))
+    after = parse_ui_tree(synthetic_dump(["hello", "new"], draft="hi", focused=True))
+    full = encoder.snapshot(before, encoder.element_ids(before), delta=True)
+    assert full["snapshot"] == 1 and "elements" in full
+    ids = encoder.element_ids(after)
+    delta = encoder.snapshot(after, ids, delta=True)["delta"]
+    assert delta["base"] == 1
+    assert [element["text"] for element in delta["added"]] == ["new"]
+    assert len(delta["removed"]) == 1
+    field = ids[after.text.index("hi")]
+    assert {"id": field, "text": "hi", "flags": ["clickable", "focused"]} in delta["changed"]
+    assert encoder.snapshot(after, encoder.element_ids(after), delta=True)["delta"] == {"base": 2}
+
+
+def test_state_round_trips_through_json():
+    encoder = CompactEncoder()
+    tree = parse_ui_tree(synthetic_dump(["hello"]))
+    ids = encoder.element_ids(tree)
+    encoder.snapshot(tree, ids, delta=True)
+    restored = CompactEncoder(json.loads(json.dumps(encoder.state())))
+    assert restored.element_ids(tree) == ids
+    assert restored.snapshot(tree, ids, delta=True)["delta"] == {"base": 1}
+
+
+def test_encode_refers_to_elements_by_id_and_drops_defaults():
+    encoder = CompactEncoder()
+    tree = parse_ui_tree(synthetic_dump(["hello"]))
+    send = tree.element(tree.content_desc.index("Send message"))
+    result = InteractionResult(success=True, timestamp="t", action_performed="tap", target_element=send)
+    encoded = encoder.encode(result, tree)
+    assert encoded["target_element"] == encoder.element_ids(tree)[send.node_id]
+    assert "errors" not in encoded and "ui_state_changed" not in encoded
+    assert encoded["snapshot"] == 1 and encoded["elements"]
+
+
+def test_id_table_is_capped_without_breaking_deltas():
+    encoder = CompactEncoder(max_ids=12)
+    first = parse_ui_tree(synthetic_dump(["m0"]))
+    first_ids = encoder.element_ids(first)
+    encoder.snapshot(first, first_ids, delta=True)
+    for step in range(1, 30):
+        tree = parse_ui_tree(synthetic_dump([f"m{step}"]))
+        ids = encoder.element_ids(tree)
+        delta = encoder.snapshot(tree, ids, delta=True)["delta"]
+        assert len(encoder.ids) <= 12
+        assert [element["text"] for element in delta["added"]] == [f"m{step}"]
+        assert len(delta["removed"]) == 1
+        assert set(encoder.previous) == set(ids.values())
+    send = first.content_desc.index("Send message")
+    assert ids[tree.content_desc.index("Send message")] == first_ids[send]
+
+    again = encoder.element_ids(first)
+    assert again[first.text.index("m0")] not in set(first_ids.values()) | set(ids.values())
+    assert CompactEncoder(json.loads(json.dumps(encoder.state())), max_ids=12).ids == encoder.ids
@@ -0,0 +1,125 @@
+import json
+import struct
+import threading
+import time
+
+from android_emulator import Action, AndroidEmulator, build_parser, decode_raw_frame, parse_ui_tree, run_cli
+from conftest import fixture_path
+from fake_adb import synthetic_dump
+
+
+def load_login(device):
+    with open(fixture_path("login_screen.xml"), encoding="utf-8") as f:
+        device.dump_xml = f.read()
+    with open(fixture_path("login_screen.raw"), "rb") as f:
+        device.frame = f.read()
+
+
+def test_screenshot_of_recorded_dump_and_frame(emulator, device):
+    load_login(device)
+    emulator.save_captures = True
+    result = emulator.screenshot()
+    assert result.success and result.current_screen == "login"
+    assert {"login", "sign_up", "input_text"} <= set(result.available_actions)
+    assert [field.text for field in result.input_fields] == ["Email", "Password"]
+    with open(result.screenshot_path, "rb") as f:
+        png = f.read()
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    assert struct.unpack(">II", png[16:24]) == decode_raw_frame(device.frame)[:2] == (54, 120)
+    assert emulator.store.by_action(result.action_id)["frame"] == result.frame_id
+
+
+def test_tap_element_hits_the_clickable_container(emulator, device):
+    load_login(device)
+    result = emulator.tap_element("Sign In")
+    assert result.success
+    assert result.target_element.class_name == "android.widget.Button"
+    assert device.input_log == ["tap 540 1529"]
+    assert not emulator.tap_element('text="Register"').success
+
+
+def test_input_and_send_update_the_chat(emulator, device):
+    result = emulator.send_message("hello there")
+    assert result.success and result.message_sent
+    assert device.messages == ["hello there"] and device.draft == ""
+    assert emulator.find_elements('text="hello there"')
+
+
+def test_send_message_waits_for_a_streamed_reply(emulator, device):
+    device.reply, device.first_token_ms, device.stream_ms = "Echo: {message} and more words", 200.0, 300.0
+    result = emulator.send_message("ping", wait_reply=True, reply_timeout=10.0, quiet_period=0.3)
+    assert result.success and result.conversation_state == "reply_complete"
+    assert result.backend_response == "Echo: ping and more words"
+    assert 150 <= result.time_to_first_token_ms < result.time_to_complete_ms
+
+
+def test_reply_timer_ignores_the_sent_bubble_and_status_nodes(emulator, device):
+    device.reply, device.first_token_ms, device.stream_ms = "Echo: {message}", 600.0, 200.0
+    device.pending_text = "Sending…"
+    result = emulator.send_message("ping", wait_reply=True, reply_timeout=10.0, quiet_period=0.3)
+    assert result.backend_response == "Echo: ping"
+    assert result.time_to_first_token_ms >= 550
+
+
+def test_reply_text_skips_reformatted_sent_bubbles_and_metadata():
+    long_message = "please summarise " + "the quarterly report " * 5
+    baseline = AndroidEmulator._conversation_texts(parse_ui_tree(synthetic_dump(["hello"], draft="x")))
+    for sent, shown in ((" see   https://example.com ", "see https://example.com"),
+                        (long_message, long_message[:40] + "…")):
+        tree = parse_ui_tree(synthetic_dump(["hello", shown, "12:04", "Sent", "⚙️ Executing command"]))
+        assert AndroidEmulator._reply_text(tree, baseline, sent) == ""
+        tree = parse_ui_tree(synthetic_dump(["hello", shown, "Sure, working on it", "12:05"]))
+        assert AndroidEmulator._reply_text(tree, baseline, sent) == "Sure, working on it"
+    echoed = parse_ui_tree(synthetic_dump(["hello", "ping", "ping"]))
+    assert AndroidEmulator._reply_text(echoed, baseline, "ping") == "ping"
+
+
+def test_batch_sends_all_inputs_in_one_round_trip(emulator, device, monkeypatch):
+    emulator.snapshot(tree_only=True)
+    sent = []
+    shell = emulator.transport.shell
+    monkeypatch.setattr(emulator.transport, "shell", lambda command: sent.append(command) or shell(command))
+    result = emulator.batch([Action.tap_element("Type a message"), Action.text("hi"), Action.key("DEL")])
+    assert result.success and result.commands[0] == "input tap 460 2270"
+    assert device.input_log == ["tap 460 2270", "text hi", "keyevent KEYCODE_DEL"] and device.draft == "h"
+    assert len([command for command in sent if "input " in command]) == 1
+
+
+def test_wait_for_sees_a_late_change(emulator, device):
+    def later():
+        time.sleep(0.3)
+        with device._lock:
+            device.messages.append("arrived")
+            device._changed()
+
+    threading.Thread(target=later).start()
+    result = emulator.wait_for('text="arrived"', timeout=5.0)
+    assert result.satisfied and result.matched_element.text == "arrived"
+    assert not emulator.wait_for('text="never"', timeout=0.3).satisfied
+
+
+def test_cli_compact_delta_output(server, device, tmp_path, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    args = build_parser().parse_args(["screenshot", "--tree-only", "--no-save", "--delta", "--device", device.serial])
+    assert run_cli(args, persist_delta=False) == 0
+    first = json.loads(capsys.readouterr().out)
+    assert first["current_screen"] == "assistant_chat" and first["elements"]
+    args = build_parser().parse_args(["input-text", "--text", "abc", "--no-save", "--compact",
+                                      "--device", device.serial])
+    assert run_cli(args) == 0
+    typed = json.loads(capsys.readouterr().out)
+    assert typed["change"]["changed"] and device.draft == "abc"
+
+
+def test_cli_load_test_compact_output(server, device, tmp_path, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    device.reply, device.first_token_ms, device.stream_ms = "Echo: {message}", 100.0, 100.0
+    prompts = tmp_path / "prompts.txt"
+    prompts.write_text("ping\n")
+    command = ["load-test", "--messages-file", str(prompts), "--count", "1", "--no-save", "--device", device.serial]
+    assert run_cli(build_parser().parse_args(command + ["--compact"])) == 0
+    encoded = json.loads(capsys.readouterr().out)
+    assert encoded["success"] and encoded["prompts"] == 1 and encoded["completed"] == 1
+    assert encoded["latency_ms"]["first_token"]["count"] == 1
+    assert run_cli(build_parser().parse_args(command + ["--delta"])) == 1
+    assert capsys.readouterr().out.startswith("Error: --delta")
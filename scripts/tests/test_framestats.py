@@ -0,0 +1,86 @@
+import pytest
+
+import android_emulator
+from android_emulator import FrameStats, parse_framestats, parse_gfxinfo_summary
+from conftest import fixture_path
+
+# Hand-computed from the fixture rows: nearest-rank percentiles of FrameCompleted - IntendedVsync over
+# Flags == 0 frames; janky against FrameDeadline when the dump has it, else 16.67ms
+EXPECTED = {
+    "framestats_legacy.txt": {
+        "columns": 16, "rows": 21, "frames": 20, "janky_frames": 6, "frozen_frames": 1, "deadline_ms": 16.67,
+        "frame_time_ms": {"p50": 11.0, "p90": 45.0, "p95": 120.0, "p99": 800.0},
+        "janky_by_stage": {"ui_thread": 3, "render_thread": 3},
+        "histogram_ms": {"<=8": 6, "8-16": 8, "16-24": 2, "24-32": 1, "32-50": 1, "50-100": 0, "100-250": 1,
+                         "250-700": 0, ">700": 1},
+        "summary": {"total_frames_rendered": 21, "janky_frames": 6, "p50_ms": 11, "p90_ms": 45, "p95_ms": 125,
+                    "p99_ms": 800},
+    },
+    "framestats_android12.txt": {
+        "columns": 23, "rows": 17, "frames": 16, "janky_frames": 5, "frozen_frames": 0, "deadline_ms": 8.33,
+        "frame_time_ms": {"p50": 6.5, "p90": 25.0, "p95": 60.0, "p99": 60.0},
+        "janky_by_stage": {"ui_thread": 2, "render_thread": 3},
+        "histogram_ms": {"<=8": 11, "8-16": 3, "16-24": 0, "24-32": 1, "32-50": 0, "50-100": 1, "100-250": 0,
+                         "250-700": 0, ">700": 0},
+        "summary": {"total_frames_rendered": 17, "janky_frames": 6, "p50_ms": 7, "p90_ms": 25, "p95_ms": 61,
+                    "p99_ms": 61},
+    },
+}
+
+
+def read(name: str) -> str:
+    with open(fixture_path(name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(params=["numpy", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "numpy" and android_emulator.np is None:
+        pytest.skip("NumPy is not installed")
+    if request.param == "fallback":
+        monkeypatch.setattr(android_emulator, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_report_matches_recorded_dump(name, backend):
+    expected, text = EXPECTED[name], read(name)
+    columns = parse_framestats(text)
+    assert len(columns) == expected["columns"] and len(columns["IntendedVsync"]) == expected["rows"]
+    stats = FrameStats()
+    stats.add_dump(text)
+    report = stats.report()
+    for key in ("frames", "janky_frames", "frozen_frames", "deadline_ms", "janky_by_stage", "histogram_ms"):
+        assert report[key] == expected[key], key
+    assert {q: report["frame_time_ms"][q] for q in expected["frame_time_ms"]} == expected["frame_time_ms"]
+    summary = parse_gfxinfo_summary(text)
+    assert {key: summary[key] for key in expected["summary"]} == expected["summary"]
+    assert summary["histogram"]["800ms" if "legacy" in name else "61ms"] == 1
+
+
+def test_overlapping_dumps_count_each_frame_once(backend):
+    text = read("framestats_legacy.txt")
+    stats = FrameStats()
+    stats.add_dump(text)
+    stats.add_dump(text)
+    assert len(stats) == 21 and stats.gaps == 0
+    assert stats.report()["frames"] == 20
+
+
+def test_scroll_benchmark_reports_the_dump(emulator, device):
+    device.gfxinfo = read("framestats_android12.txt")
+    result = emulator.scroll_benchmark(swipes=3, duration_ms=50, pause_ms=0)
+    assert result.success and result.swipes == 3
+    assert (result.frames, result.janky_frames, result.frame_time_ms["p95"]) == (16, 5, 60.0)
+    assert result.reported["p95_ms"] == 61
+    assert [entry.split()[0] for entry in device.input_log] == ["swipe"] * 3
+
+
+def test_failed_swipe_still_invalidates_the_snapshot(emulator, device, monkeypatch):
+    emulator.snapshot(tree_only=True)
+    shell = emulator.transport.shell
+    monkeypatch.setattr(emulator.transport, "shell",
+                        lambda command: (1, "input: injection failed") if "input swipe" in command else shell(command))
+    result = emulator.scroll_benchmark(swipes=2)
+    assert not result.success and result.errors[0].startswith("Swipe 1 failed")
+    assert emulator.last_capture.generation != emulator.generation
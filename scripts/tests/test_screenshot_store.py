@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+
+from android_emulator import ScreenshotStore
+from fake_adb import synthetic_frame
+
+
+def frame(shade: int) -> bytes:
+    return synthetic_frame(16, 16, shade)
+
+
+def assert_consistent(store: ScreenshotStore):
+    index = store._load_index()
+    refs = {}
+    for entry in index["entries"]:
+        refs[entry["frame"]] = refs.get(entry["frame"], 0) + 1
+        assert os.path.exists(store._object_path(entry["frame"]))
+    assert {frame_id: stored["refs"] for frame_id, stored in index["objects"].items()} == refs
+    assert sorted(os.listdir(os.path.join(store.root, "objects"))) == sorted(f"{frame_id}.raw.z" for frame_id in refs)
+    png_dir = os.path.join(store.root, "png")
+    assert sorted(os.listdir(png_dir) if os.path.isdir(png_dir) else []) == \
+        sorted(f"{frame_id}.png" for frame_id, stored in index["objects"].items() if stored["png_bytes"])
+
+
+def test_ring_buffer_evicts_oldest_and_dedupes(tmp_path):
+    store = ScreenshotStore(str(tmp_path), max_frames=3)
+    first = store.put(frame(1), action_id="a1")
+    store.put(frame(1), action_id="a2")
+    assert store.index["objects"][first["frame"]]["refs"] == 2
+    for shade in (2, 3, 4):
+        store.put(frame(shade), action_id=f"b{shade}")
+    assert [entry["action"] for entry in store.index["entries"]] == ["b2", "b3", "b4"]
+    assert store.by_action("a1") is None and store.by_action("b4") == store.latest()
+    assert not os.path.exists(store._object_path(first["frame"]))
+    assert store.frame(store.latest()["frame"]) == frame(4)
+    assert_consistent(store)
+
+
+def test_stores_sharing_a_root_see_each_others_captures(tmp_path):
+    one, two = ScreenshotStore(str(tmp_path), max_frames=4), ScreenshotStore(str(tmp_path), max_frames=4)
+    for shade in range(6):
+        (one if shade % 2 else two).put(frame(shade), action_id=f"s{shade}")
+    assert one.latest()["action"] == "s5" and two.latest()["action"] == "s5"
+    assert two.by_action("s3") is not None
+    assert [entry["id"] for entry in one.index["entries"]] == [2, 3, 4, 5]
+    assert_consistent(one)
+
+
+def _writer(root: str, worker: int, count: int):
+    store = ScreenshotStore(root, max_frames=10)
+    for position in range(count):
+        store.put(frame(worker * 1000 + position % 7), action_id=f"w{worker}-{position}", with_png=position % 5 == 0)
+
+
+def test_concurrent_processes_keep_the_index_consistent(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_writer, args=(str(tmp_path), worker, 25)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+    store = ScreenshotStore(str(tmp_path), max_frames=10)
+    assert store.index["next_id"] == 100
+    assert len(store.index["entries"]) == 10
+    assert_consistent(store)
@@ -0,0 +1,51 @@
+import pytest
+
+from android_emulator import compile_selector, parse_ui_tree, quote_selector_value
+from fake_adb import synthetic_dump
+
+
+@pytest.fixture(scope="module")
+def tree():
+    messages = ["Session 12 started", "Path C:\\logs", 'She said "hi"', "Message 4242 from the fixture"]
+    return parse_ui_tree(synthetic_dump(messages, focused=False))
+
+
+def texts(tree, selector):
+    return [tree.text[node_id] for node_id in compile_selector(selector).find_all(tree)]
+
+
+@pytest.mark.parametrize("selector", [r'text~="^Session \d+"', r"text~='^Session\s\d+ started$'",
+                                      r"text~=Session\s\d+"])
+def test_regex_escapes_are_kept(tree, selector):
+    assert texts(tree, selector) == ["Session 12 started"]
+
+
+def test_regex_with_digit_class_matches_bench_query(tree):
+    assert texts(tree, r'text~="^Message 4\d{3} "') == ["Message 4242 from the fixture"]
+
+
+def test_literal_values_unescape_quotes_and_backslashes(tree):
+    assert texts(tree, r'text="She said \"hi\""') == ['She said "hi"']
+    assert texts(tree, r'text="Path C:\\logs"') == ["Path C:\\logs"]
+
+
+@pytest.mark.parametrize("value", ['She said "hi"', "Path C:\\logs"])
+def test_quote_selector_value_round_trips(tree, value):
+    assert texts(tree, f"text={quote_selector_value(value)}") == [value]
+
+
+def test_chained_step_resolves_clickable_ancestor(tree):
+    node_id = compile_selector('desc="Send message" ^ clickable').first(tree)
+    assert tree.element(node_id).clickable
+    assert tree.element(node_id).content_desc == ""
+
+
+def test_flags_and_class(tree):
+    assert texts(tree, "class=EditText focusable !focused") == ["Type a message"]
+    assert texts(tree, "class=EditText focused") == []
+
+
+def test_unparseable_selector_is_a_plain_substring(tree):
+    selector = compile_selector("session 12")
+    assert selector.is_plain
+    assert [tree.text[node_id] for node_id in selector.find_all(tree)] == ["Session 12 started"]
@@ -0,0 +1,61 @@
+import asyncio
+import socket
+
+import pytest
+
+from android_emulator import AdbError, AdbTransport
+from android_emulator_async import AsyncAdbTransport
+from fake_adb import FakeShell
+
+
+@pytest.fixture
+def drop_after_tap(monkeypatch):
+    """Close the shell session after running any `input tap`, before its exit marker is sent"""
+    run = FakeShell.run
+
+    def run_then_drop(self, script):
+        result = run(self, script)
+        if "input tap" in script:
+            raise ConnectionResetError("session lost before the exit marker")
+        return result
+
+    monkeypatch.setattr(FakeShell, "run", run_then_drop)
+
+
+def test_shell_reuses_one_session(server, device):
+    transport = AdbTransport(device.serial)
+    assert transport.shell("echo one") == (0, "one\n")
+    assert transport.shell("echo two") == (0, "two\n")
+    assert server.requests.count("exec:sh") == 1
+    transport.close()
+
+
+def test_command_is_not_resent_when_the_session_drops_after_writing(server, device, drop_after_tap):
+    transport = AdbTransport(device.serial)
+    with pytest.raises(AdbError):
+        transport.shell("input tap 10 20")
+    assert device.input_log == ["tap 10 20"]
+    assert transport.shell("echo again") == (0, "again\n")
+    assert server.requests.count("exec:sh") == 2
+    transport.close()
+
+
+def test_closed_idle_session_is_detected_before_writing():
+    transport = AdbTransport("emulator-5554")
+    transport._shell_sock, peer = socket.socketpair()
+    assert not transport._shell_closed()
+    peer.close()
+    assert transport._shell_closed()
+    transport.close()
+
+
+def test_async_command_is_not_resent_when_the_session_drops_after_writing(server, device, drop_after_tap):
+    async def scenario():
+        transport = AsyncAdbTransport(device.serial)
+        with pytest.raises(AdbError):
+            await transport.shell("input tap 10 20")
+        assert await transport.shell("echo again") == (0, "again\n")
+        await transport.close()
+
+    asyncio.run(scenario())
+    assert device.input_log == ["tap 10 20"]
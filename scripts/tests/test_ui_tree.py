@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from android_emulator import (FLAG_CLICKABLE, ScreenClassifier, UIParseError, UITreeParser, diff_trees,
+                              parse_ui_tree)
+from conftest import fixture_path
+from fake_adb import synthetic_dump, synthetic_messages
+
+
+@pytest.fixture(scope="module")
+def login_xml() -> bytes:
+    with open(fixture_path("login_screen.xml"), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def login(login_xml):
+    return parse_ui_tree(login_xml)
+
+
+def node(tree, text):
+    return tree.text.index(text)
+
+
+def test_parses_nodes_attributes_and_structure(login):
+    assert len(login) == 14
+    email = node(login, "Email")
+    assert login.class_name[email] == "android.widget.EditText"
+    assert login.rect(email) == (63, 986, 1017, 1163)
+    assert login.has_flag(email, FLAG_CLICKABLE)
+    assert login.resource_id[2] == "android:id/content"
+    element = login.element(node(login, "Sign In"))
+    assert element.class_name == "android.widget.Button" and element.clickable
+    assert (element.x, element.y, element.width, element.height) == (540, 1529, 954, 126)
+
+
+def test_chunked_feed_matches_whole_parse(login_xml, login):
+    parser = UITreeParser()
+    done = False
+    for start in range(0, len(login_xml), 97):
+        done = parser.feed(login_xml[start:start + 97])
+    assert done
+    tree = parser.close()
+    assert tree.text == login.text and tree.subtree_hash == login.subtree_hash
+
+
+def test_truncated_dump_is_an_error(login_xml):
+    with pytest.raises(UIParseError):
+        parse_ui_tree(login_xml[:len(login_xml) // 2])
+
+
+def test_spatial_hit_testing(login):
+    spatial = login.spatial
+    assert spatial.element_at(540, 1529, clickable=True) == node(login, "Sign In")
+    assert spatial.element_at(100, 1000) == node(login, "Email")
+    assert spatial.clickable_container(node(login, "Sign Up")) == node(login, "Sign Up")
+    assert spatial.clickable_container(node(login, "Welcome Back!")) is None
+    assert spatial.element_at(540, 760, clickable=True) is None
+    assert node(login, "Welcome Back!") in spatial.intersecting(300, 800, 400, 850)
+
+
+def test_spatial_index_matches_a_linear_scan_on_a_dense_tree():
+    tree = parse_ui_tree(synthetic_dump(synthetic_messages(3000), draft="hi", focused=True))
+    spatial = tree.spatial
+    rng = random.Random(3)
+    for _ in range(200):
+        x, y = rng.randrange(1080), rng.randrange(2400)
+        expected = [i for i in range(len(tree)) if tree.x1[i] <= x < tree.x2[i] and tree.y1[i] <= y < tree.y2[i]]
+        hits = spatial.at_point(x, y)
+        assert sorted(hits) == expected
+        assert hits == sorted(expected, key=lambda i: (tree.depth[i], i), reverse=True)
+        clickable = [i for i in hits if tree.flags[i] & FLAG_CLICKABLE]
+        assert spatial.element_at(x, y, clickable=True) == (clickable[0] if clickable else None)
+        # Each query looks at a few cells, not at every wide row in the list
+        assert sum(1 for _ in spatial._candidates(x, y)) < len(tree) // 5
+    region = [i for i in range(len(tree))
+              if tree.x1[i] < 500 and 100 < tree.x2[i] and tree.y1[i] < 900 and 700 < tree.y2[i]]
+    assert spatial.intersecting(100, 700, 500, 900) == region
+
+
+def test_diff_of_identical_trees_is_empty(login, login_xml):
+    summary = diff_trees(login, parse_ui_tree(login_xml))
+    assert not summary.changed and summary.region is None and summary.magnitude == 0.0
+
+
+def test_diff_reports_changed_node_and_region(login, login_xml):
+    edited = parse_ui_tree(login_xml.replace(b'text="Email"', b'text="me@example.com"'))
+    summary = diff_trees(login, edited)
+    assert (summary.nodes_changed, summary.nodes_added, summary.nodes_removed) == (1, 0, 0)
+    assert summary.region == [63, 986, 1017, 1163]
+
+
+def test_diff_reports_inserted_bubble_as_one_added_subtree():
+    before = parse_ui_tree(synthetic_dump(["first", "second"]))
+    after = parse_ui_tree(synthetic_dump(["first", "second", "third"]))
+    summary = diff_trees(before, after)
+    assert summary.nodes_added == 2 and summary.nodes_removed == 0
+    assert summary.region == [40, 480, 1040, 590]
+
+
+def test_classifier_recognizes_the_login_screen(login):
+    screen, actions = ScreenClassifier().classify(login)
+    assert screen == "login"
+    assert {"login", "sign_up", "input_text"} <= set(actions)
+    assert ScreenClassifier().classify(parse_ui_tree(synthetic_dump(["Welcome Back!"])))[0] != "login"
+
+
+def test_classifier_counts_the_chat_screens_placeholder():
+    with open(fixture_path("anthropic_chat.xml"), "rb") as f:
+        chat = parse_ui_tree(f.read())
+    classifier = ScreenClassifier()
+    present, _ = classifier._present(chat)
+    assert "Type a message..." in present
+    screen, actions = classifier.classify(chat)
+    assert screen == "chat" and {"send_message", "open_menu", "input_text"} <= set(actions)